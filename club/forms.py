@@ -39,7 +39,7 @@ from club.models import (
     MailingSubscription,
     Membership,
 )
-from core.models import User
+from core.models import User, UserGroupsSnapshot
 from core.views.forms import SelectDateTime
 from core.views.widgets.ajax_select import (
     AutoCompleteSelectMultipleUser,
@@ -435,19 +435,28 @@ class ClubRoleForm(forms.ModelForm):
             # that role to the club board group.
             group_id = instance.club.board_group_id
             if self.cleaned_data["is_board"]:
+                user_ids = list(
+                    Membership.objects.ongoing()
+                    .filter(role=instance)
+                    .values_list("user_id", flat=True)
+                )
                 User.groups.through.objects.bulk_create(
                     [
                         User.groups.through(user_id=u, group_id=group_id)
-                        for u in Membership.objects.ongoing()
-                        .filter(role=instance)
-                        .values_list("user_id", flat=True)
+                        for u in user_ids
                     ],
                     ignore_conflicts=True,
                 )
             else:
+                user_ids = list(
+                    Membership.objects.filter(role=instance).values_list(
+                        "user_id", flat=True
+                    )
+                )
                 User.groups.through.objects.filter(
                     user__memberships__role=instance, group_id=group_id
                 ).delete()
+            UserGroupsSnapshot.invalidate(user_ids)
         return instance
 
 
@@ -39,7 +39,15 @@ from django.utils.translation import gettext_lazy as _
 from ordered_model.models import OrderedModel
 
 from core.fields import ResizedImageField
-from core.models import Group, Notification, Page, SithFile, User
+from core.models import (
+    Group,
+    Notification,
+    Page,
+    SithFile,
+    User,
+    UserGroupsSnapshot,
+)
+from core.notifications import send_notifications
 
 
 class ClubQuerySet(models.QuerySet):
@@ -553,6 +561,7 @@ class Membership(models.Model):
         clubs = {m.club_id for m in memberships}
         users = {m.user_id for m in memberships}
         groups = Group.objects.filter(Q(club__in=clubs) | Q(club_board__in=clubs))
+        UserGroupsSnapshot.invalidate(users)
         return User.groups.through.objects.filter(
             Q(group__in=groups) & Q(user__in=users)
         ).delete()
@@ -607,6 +616,7 @@ class Membership(models.Model):
                         group_id=membership.club.board_group_id,
                     )
                 )
+        UserGroupsSnapshot.invalidate(m.user_id for m in memberships)
         return User.groups.through.objects.bulk_create(
             club_groups, ignore_conflicts=True
         )
@@ -654,18 +664,19 @@ class Mailing(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.is_moderated:
-            unread_notif_subquery = Notification.objects.filter(
-                user=OuterRef("pk"), type="MAILING_MODERATION", viewed=False
+            send_notifications(
+                (
+                    Notification(
+                        user=user,
+                        url=reverse("com:mailing_admin"),
+                        type="MAILING_MODERATION",
+                    )
+                    for user in User.objects.filter(
+                        groups__id__in=[settings.SITH_GROUP_COM_ADMIN_ID]
+                    )
+                ),
+                unless_unread=True,
             )
-            for user in User.objects.filter(
-                ~Exists(unread_notif_subquery),
-                groups__id__in=[settings.SITH_GROUP_COM_ADMIN_ID],
-            ):
-                Notification(
-                    user=user,
-                    url=reverse("com:mailing_admin"),
-                    type="MAILING_MODERATION",
-                ).save(*args, **kwargs)
         super().save(*args, **kwargs)
 
     def clean(self):
@@ -36,6 +36,7 @@ from django.utils.translation import gettext_lazy as _
 
 from club.models import Club
 from core.models import Notification, Preferences, User
+from core.notifications import send_notifications
 
 
 class Sith(models.Model):
@@ -398,12 +399,14 @@ class Poster(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.is_moderated:
-            for user in User.objects.filter(
-                groups__id__in=[settings.SITH_GROUP_COM_ADMIN_ID]
-            ):
-                Notification.objects.create(
+            send_notifications(
+                Notification(
                     user=user, url=reverse("com:poster_list"), type="POSTER_MODERATION"
                 )
+                for user in User.objects.filter(
+                    groups__id__in=[settings.SITH_GROUP_COM_ADMIN_ID]
+                )
+            )
         return super().save(*args, **kwargs)
 
     def clean(self, *args, **kwargs):
@@ -1,13 +1,13 @@
 from datetime import datetime
 from typing import Annotated
 
-from aemark import markdown
 from ninja import FilterLookup, FilterSchema, ModelSchema
 from ninja_extra import service_resolver
 from ninja_extra.context import RouteContext
 
 from club.schemas import ClubProfileSchema
 from com.models import News, NewsDate
+from core.markdown import render_markdown
 
 
 class NewsDateFilterSchema(FilterSchema):
@@ -34,7 +34,7 @@ class NewsSchema(ModelSchema):
         # and the user chose "html", convert the markdown to html
         context: RouteContext = service_resolver(RouteContext)
         if context.kwargs.get("text_format", "") == "html":
-            return markdown(obj.summary)
+            return render_markdown(obj.summary)
         return obj.summary
 
     @staticmethod
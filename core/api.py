@@ -14,10 +14,12 @@ from ninja_extra.schemas import PaginatedResponseSchema
 from api.auth import ApiKeyAuth
 from api.permissions import CanAccessLookup, CanView, HasPerm
 from club.models import Mailing
+from core.markdown import render_markdown_many
 from core.models import Group, QuickUploadImage, SithFile, User
 from core.schemas import (
     FamilyGodfatherSchema,
     GroupSchema,
+    MarkdownBatchSchema,
     MarkdownSchema,
     SithFileSchema,
     UploadedFileSchema,
@@ -38,6 +40,17 @@ class MarkdownController(ControllerBase):
         """Convert the markdown text into html."""
         return HttpResponse(markdown(body.text), content_type="text/html")
 
+    @route.post("/batch", response=list[str], url_name="markdown_batch")
+    def render_markdown_batch(self, body: MarkdownBatchSchema):
+        """Convert many markdown texts into html at once.
+
+        The rendered texts are returned in the same order as the given ones.
+        """
+        # the texts are fetched from the cache all at once,
+        # instead of one by one with the `markdown` filter
+        rendered = render_markdown_many(body.texts)
+        return [f'<div class="markdown">{rendered[text]}</div>' for text in body.texts]
+
 
 @api_controller("/upload")
 class UploadController(ControllerBase):
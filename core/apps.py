@@ -24,7 +24,7 @@ import logging
 
 from django.apps import AppConfig
 from django.core.cache import cache
-from django.core.signals import request_started
+from django.core.signals import request_finished, request_started
 
 
 class SithConfig(AppConfig):
@@ -32,6 +32,8 @@ class SithConfig(AppConfig):
     verbose_name = "Core app of the Sith"
 
     def ready(self):
+        import core.signals  # noqa F401
+        from core.models import UserGroupsSnapshot
         from forum.models import Forum
 
         cache.clear()
@@ -45,3 +47,13 @@ class SithConfig(AppConfig):
             weak=False,
             dispatch_uid="clear_cached_memberships",
         )
+        request_started.connect(
+            UserGroupsSnapshot.start_request,
+            weak=False,
+            dispatch_uid="start_user_snapshots",
+        )
+        request_finished.connect(
+            UserGroupsSnapshot.end_request,
+            weak=False,
+            dispatch_uid="end_user_snapshots",
+        )
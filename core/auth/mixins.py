@@ -24,7 +24,7 @@
 from __future__ import annotations
 
 import types
-from typing import TYPE_CHECKING, Any, LiteralString
+from typing import TYPE_CHECKING, Any, ClassVar, LiteralString
 
 from django.contrib.auth.mixins import AccessMixin, PermissionRequiredMixin
 from django.core.exceptions import ImproperlyConfigured, PermissionDenied
@@ -109,11 +109,21 @@ class GenericContentPermissionMixinBuilder(View):
     This view protect any child view that would be showing an object that is restricted based
       on two properties.
 
+    On list views, if the queryset of the view implements the method
+    named by `queryset_permission_method` (e.g. `viewable_by` or `editable_by`),
+    this method is used to filter the objects directly in the database.
+    It must take the user as argument and return the queryset of the objects
+    allowed by `permission_function`.
+    Else, `permission_function` is called on every object of the list.
+
     Attributes:
         raised_error: permission to be raised
+        queryset_permission_method: the name of the queryset method
+            used to filter list views
     """
 
     raised_error = PermissionDenied
+    queryset_permission_method: ClassVar[str | None] = None
 
     @staticmethod
     def permission_function(obj: Any, user: User) -> bool:
@@ -134,6 +144,21 @@ class GenericContentPermissionMixinBuilder(View):
         # If we get here, it's a ListView
 
         queryset = self.get_queryset()
+        if self.queryset_permission_method and hasattr(
+            queryset, self.queryset_permission_method
+        ):
+            method_name = self.queryset_permission_method
+            user = request.user
+            if not getattr(queryset, method_name)(user).exists() and queryset.exists():
+                raise self.raised_error
+            self._get_queryset = self.get_queryset
+
+            def get_filtered_qs(self2):
+                return getattr(self2._get_queryset(), method_name)(user)
+
+            self.get_queryset = types.MethodType(get_filtered_qs, self)
+            return super().dispatch(request, *arg, **kwargs)
+
         l_id = [o.id for o in queryset if self.get_permission_function(o, request.user)]
         if not l_id and queryset.count() != 0:
             raise self.raised_error
@@ -158,6 +183,7 @@ class CanEditPropMixin(GenericContentPermissionMixinBuilder):
     """
 
     permission_function = can_edit_prop
+    queryset_permission_method = "owned_by"
 
 
 class CanEditMixin(GenericContentPermissionMixinBuilder):
@@ -168,6 +194,7 @@ class CanEditMixin(GenericContentPermissionMixinBuilder):
     """
 
     permission_function = can_edit
+    queryset_permission_method = "editable_by"
 
 
 class CanViewMixin(GenericContentPermissionMixinBuilder):
@@ -178,6 +205,7 @@ class CanViewMixin(GenericContentPermissionMixinBuilder):
     """
 
     permission_function = can_view
+    queryset_permission_method = "viewable_by"
 
 
 class FormerSubscriberMixin(AccessMixin):
@@ -307,7 +335,6 @@ class PermissionOrClubBoardRequiredMixin(PermissionRequiredMixin):
             return False
         if super().has_permission():
             return True
-        return (
-            self.club is not None
-            and self.club.board_group_id in self.request.user.all_groups
+        return self.club is not None and self.request.user.is_in_group(
+            pk=self.club.board_group_id
         )
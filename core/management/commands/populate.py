@@ -52,7 +52,7 @@ from counter.models import (
     StudentCard,
 )
 from election.models import Candidature, Election, ElectionList, Role, Vote
-from forum.models import Forum
+from forum.models import Forum, ForumClosure
 from pedagogy.models import UE
 from sas.models import Album, PeoplePictureRelation, Picture
 from subscription.models import Subscription
@@ -397,6 +397,7 @@ class Command(BaseCommand):
                 ),
             ]
         )
+        ForumClosure.rebuild()
 
         # News
         friday = self.now
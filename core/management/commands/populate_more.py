@@ -7,7 +7,7 @@ from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
-from django.db.models import Count, Exists, Min, OuterRef, Subquery
+from django.db.models import Exists, Min, OuterRef, Subquery
 from django.utils.timezone import localdate, make_aware, now
 from faker import Faker
 
@@ -16,6 +16,8 @@ from core.models import Group, User, UserBan
 from counter.models import (
     Counter,
     Customer,
+    DailyPermanency,
+    DailySales,
     Permanency,
     Price,
     Product,
@@ -23,7 +25,7 @@ from counter.models import (
     Refilling,
     Selling,
 )
-from forum.models import Forum, ForumMessage, ForumTopic
+from forum.models import Forum, ForumClosure, ForumMessage, ForumTopic
 from pedagogy.models import UE
 from subscription.models import Subscription
 
@@ -84,6 +86,9 @@ class Command(BaseCommand):
         self.create_sales(sellers)
         self.stdout.write("Creating permanences...")
         self.create_permanences(sellers)
+        self.stdout.write("Computing the daily statistics...")
+        DailySales.update_from_sales()
+        DailyPermanency.update_from_permanencies()
         self.stdout.write("Filling the forum...")
         self.create_forums()
 
@@ -464,21 +469,5 @@ class Command(BaseCommand):
                 ]
             )
         ForumMessage.objects.bulk_create(messages)
-        ForumTopic.objects.update(
-            _message_number=Subquery(
-                ForumMessage.objects.filter(topic_id=OuterRef("pk"))
-                .values("topic_id")
-                .annotate(res=Count("*"))
-                .values("res")
-            ),
-            _last_message_id=Subquery(
-                ForumMessage.objects.order_by("-date").values("id")[:1]
-            ),
-        )
-        for f in Forum.objects.filter(parent__isnull=False):
-            # this is a N+1 queries, but it's ok,
-            # since there are quite a few forums
-            # and trying to do it with a single query
-            # would result in a big whibbly-woobly hacky queryset
-            f.set_last_message()
-            f.set_topic_number()
+        ForumClosure.rebuild()
+        Forum.rebuild_counters()
@@ -0,0 +1,65 @@
+import itertools
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from com.models import News, WeekmailArticle
+from core.markdown import render_markdown_many
+from core.models import PageRev
+from forum.models import ForumMessage
+from pedagogy.models import UEComment
+
+
+class Command(BaseCommand):
+    """Render the most recent markdown texts, in order to put them in cache.
+
+    This is meant to be run after the cache has been cleared
+    (for example after a deployment), so that the first visitors
+    don't have to wait for all the texts to be rendered.
+    """
+
+    help = "Put in cache the html of the most recent markdown texts"
+
+    BATCH_SIZE = 100
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=1000,
+            help="Maximum number of texts of each kind to render",
+        )
+
+    def handle(self, *args, **options):
+        limit = options["limit"]
+        last_revisions = PageRev.objects.filter(
+            ~Exists(
+                PageRev.objects.filter(
+                    page=OuterRef("page"), revision__gt=OuterRef("revision")
+                )
+            )
+        )
+        sources = {
+            "forum messages": ForumMessage.objects.filter(_deleted=False)
+            .order_by("-date")
+            .values_list("message", flat=True),
+            "pages": last_revisions.order_by("-date").values_list("content", flat=True),
+            "news summaries": News.objects.filter(is_published=True)
+            .order_by("-id")
+            .values_list("summary", flat=True),
+            "news contents": News.objects.filter(is_published=True)
+            .order_by("-id")
+            .values_list("content", flat=True),
+            "weekmail articles": WeekmailArticle.objects.order_by("-id").values_list(
+                "content", flat=True
+            ),
+            "UE comments": UEComment.objects.order_by("-publish_date").values_list(
+                "comment", flat=True
+            ),
+        }
+        for name, texts in sources.items():
+            for batch in itertools.batched(texts[:limit], self.BATCH_SIZE):
+                render_markdown_many(batch)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{name} rendered")
+        self.stdout.write("The markdown cache is warm")
@@ -0,0 +1,54 @@
+"""Rendering of the markdown texts written by the users.
+
+Rendering markdown is quite expensive,
+and the same texts (forum messages, wiki pages, news...)
+are rendered again and again each time they are displayed.
+Thus, the rendered html is cached.
+
+The cache key is a hash of the markdown text itself,
+so that an edited text never gets the html of its previous version,
+without any need to invalidate anything.
+The texts which are not rendered anymore are simply evicted
+by the cache backend, once they expire or once the cache is full.
+"""
+
+import hashlib
+from collections.abc import Iterable
+from importlib.metadata import version
+
+from aemark import markdown
+from django.conf import settings
+from django.core.cache import cache
+
+from core.utils import cache_set_many_small
+
+_CACHE_PREFIX = f"markdown:{version('aemark')}"
+
+
+def _get_cache_key(text: str) -> str:
+    return f"{_CACHE_PREFIX}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+
+def render_markdown(text: str) -> str:
+    """Render the given markdown text to html, using the cache if possible."""
+    return render_markdown_many([text])[text]
+
+
+def render_markdown_many(texts: Iterable[str]) -> dict[str, str]:
+    """Render the given markdown texts to html, using the cache if possible.
+
+    All the cached texts are fetched at once,
+    and all the newly rendered ones are cached at once.
+
+    Returns:
+        A dict mapping each given text to its rendered html.
+    """
+    keys = {_get_cache_key(text): text for text in texts}
+    cached: dict[str, str] = cache.get_many(keys.keys())
+    rendered = {key: markdown(text) for key, text in keys.items() if key not in cached}
+    cache_set_many_small(
+        rendered,
+        max_size=settings.SITH_MARKDOWN_CACHE_MAX_SIZE,
+        timeout=settings.SITH_MARKDOWN_CACHE_TIMEOUT.total_seconds(),
+    )
+    return {keys[key]: html for key, html in (cached | rendered).items()}
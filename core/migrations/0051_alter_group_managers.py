@@ -0,0 +1,20 @@
+# Generated by Django 5.2.15 on 2026-10-18 03:01
+
+from django.db import migrations
+
+import core.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0050_alter_sithfile_moderator"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="group",
+            managers=[
+                ("objects", core.models.CustomGroupManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.15 on 2026-10-18 03:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.migrations.state import StateApps
+
+
+def build_closures(apps: StateApps, schema_editor):
+    for node_name, closure_name in [
+        ("SithFile", "SithFileClosure"),
+        ("Page", "PageClosure"),
+    ]:
+        Node = apps.get_model("core", node_name)
+        Closure = apps.get_model("core", closure_name)
+        parents = dict(Node.objects.values_list("id", "parent_id"))
+        links = []
+        for node_id in parents:
+            current, depth = node_id, 0
+            while current is not None and depth <= len(parents):
+                links.append(
+                    Closure(ancestor_id=current, descendant_id=node_id, depth=depth)
+                )
+                current, depth = parents.get(current), depth + 1
+        Closure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0051_alter_group_managers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PageClosure",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField(verbose_name="depth")),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="core.page",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="core.page",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ancestor", "descendant"), name="page_closure_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="SithFileClosure",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField(verbose_name="depth")),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="core.sithfile",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="core.sithfile",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ancestor", "descendant"),
+                        name="sith_file_closure_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_closures, reverse_code=migrations.RunPython.noop),
+    ]
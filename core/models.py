@@ -26,21 +26,23 @@ from __future__ import annotations
 import difflib
 import string
 import unicodedata
-from datetime import timedelta
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
 from io import BytesIO
 from pathlib import Path
-from typing import TYPE_CHECKING, Final, Self
+from typing import TYPE_CHECKING, ClassVar, Final, Self
 from uuid import uuid4
 
 from django.conf import settings
-from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.auth.models import AbstractUser, GroupManager, UserManager
 from django.contrib.auth.models import AnonymousUser as AuthAnonymousUser
 from django.contrib.auth.models import Group as AuthGroup
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.core import validators
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.core.files import File
-from django.core.files.base import ContentFile
 from django.core.mail import send_mail
 from django.db import models, transaction
 from django.db.models import Exists, F, OuterRef, Q
@@ -52,17 +54,40 @@ from django.utils.module_loading import import_string
 from django.utils.timezone import localdate, now
 from django.utils.translation import gettext_lazy as _
 from phonenumber_field.modelfields import PhoneNumberField
-from PIL import Image, ImageOps
+from PIL import Image
 
-from core.utils import get_last_promo
+from core.utils import (
+    cache_set_many_if_committed,
+    get_last_promo,
+    invalidate_now_and_on_commit,
+    resize_image,
+)
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from django.core.files.base import ContentFile
     from django.core.files.uploadedfile import UploadedFile
     from pydantic import NonNegativeInt
 
     from club.models import Club
 
 
+class GroupQuerySet(models.QuerySet):
+    def editable_by(self, user: User) -> Self:
+        """Filter the groups this user can edit.
+
+        Only root users can edit groups.
+        """
+        if user.is_root:
+            return self.all()
+        return self.none()
+
+
+class CustomGroupManager(GroupManager.from_queryset(GroupQuerySet)):
+    pass
+
+
 class Group(AuthGroup):
     """Wrapper around django.auth.Group"""
 
@@ -73,9 +98,26 @@ class Group(AuthGroup):
     )
     description = models.TextField(_("description"))
 
+    objects = CustomGroupManager()
+
+    GROUP_IDS_CACHE_KEY: ClassVar[str] = "core:group_ids_by_name"
+
     def get_absolute_url(self) -> str:
         return reverse("core:group_list")
 
+    @classmethod
+    def get_id_by_name(cls, name: str) -> int | None:
+        """Get the id of the group with the given name, if it exists.
+
+        The mapping between group names and ids is cached,
+        and invalidated each time a group is saved or deleted.
+        """
+        ids: dict[str, int] | None = cache.get(cls.GROUP_IDS_CACHE_KEY)
+        if ids is None:
+            ids = dict(cls.objects.values_list("name", "id"))
+            cache.set(cls.GROUP_IDS_CACHE_KEY, ids, timeout=None)
+        return ids.get(name)
+
 
 def validate_promo(value: int) -> None:
     last_promo = get_last_promo()
@@ -316,6 +358,10 @@ class User(AbstractUser):
                 # All users are in the public group.
                 self.groups.add(settings.SITH_GROUP_PUBLIC_ID)
 
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.clear_groups_snapshot()
+
     def get_absolute_url(self) -> str:
         return reverse("core:user_profile", kwargs={"user_id": self.pk})
 
@@ -325,22 +371,33 @@ class User(AbstractUser):
         ).exists()
 
     @cached_property
-    def was_subscribed(self) -> bool:
-        if "is_subscribed" in self.__dict__ and self.is_subscribed:
-            # if the user is currently subscribed, he is an old subscriber too
-            # if the property has already been cached, avoid another request
-            return True
-        return self.subscriptions.exists()
+    def groups_snapshot(self) -> UserGroupsSnapshot:
+        """The groups, bans and subscription status of this user.
+
+        See [UserGroupsSnapshot][core.models.UserGroupsSnapshot].
+        """
+        return UserGroupsSnapshot.get_many([self])[self.pk]
 
     @cached_property
+    def notification_summary(self) -> NotificationSummary:
+        """The unread notifications of this user.
+
+        See [NotificationSummary][core.models.NotificationSummary].
+        """
+        return NotificationSummary.get(self)
+
+    def clear_groups_snapshot(self):
+        """Forget the groups snapshot loaded on this instance."""
+        self.__dict__.pop("groups_snapshot", None)
+        self.__dict__.pop("all_groups", None)
+
+    @property
+    def was_subscribed(self) -> bool:
+        return self.groups_snapshot.was_subscribed
+
+    @property
     def is_subscribed(self) -> bool:
-        if "was_subscribed" in self.__dict__ and not self.was_subscribed:
-            # if the user never subscribed, he cannot be a subscriber now.
-            # if the property has already been cached, avoid another request
-            return False
-        return self.subscriptions.filter(
-            subscription_start__lte=timezone.now(), subscription_end__gte=timezone.now()
-        ).exists()
+        return self.groups_snapshot.is_subscribed
 
     @cached_property
     def account_balance(self):
@@ -363,44 +420,39 @@ class User(AbstractUser):
         """
         if not pk and not name:
             raise ValueError("You must either provide the id or the name of the group")
-        group_id: int | None = (
-            pk or Group.objects.filter(name=name).values_list("id", flat=True).first()
-        )
+        group_id: int | None = pk or Group.get_id_by_name(name)
         if group_id is None:
             return False
-        return group_id in self.all_groups
+        return group_id in self.groups_snapshot.group_ids
 
     @cached_property
     def all_groups(self) -> dict[int, Group]:
         """Get the list of groups this user is in."""
-        additional_groups = []
-        if self.is_subscribed:
-            additional_groups.append(settings.SITH_GROUP_SUBSCRIBERS_ID)
-        if self.is_superuser:
-            additional_groups.append(settings.SITH_GROUP_ROOT_ID)
-        qs = self.groups.all()
-        if additional_groups:
-            # This is somewhat counter-intuitive, but this query runs way faster with
-            # a UNION rather than a OR (in average, 0.25ms vs 14ms).
-            # For the why, cf. https://dba.stackexchange.com/questions/293836/why-is-an-or-statement-slower-than-union
-            qs = qs.union(Group.objects.filter(id__in=additional_groups))
-        return {g.id: g for g in qs}
+        snapshot = self.groups_snapshot
+        groups = dict(snapshot.groups)
+        if implicit_ids := snapshot.group_ids - groups.keys():
+            # the subscribers and root groups aren't fetched with the snapshot
+            groups |= Group.objects.in_bulk(implicit_ids)
+        return groups
 
-    @cached_property
+    @property
     def is_root(self) -> bool:
-        return self.is_superuser or settings.SITH_GROUP_ROOT_ID in self.all_groups
+        return (
+            self.is_superuser
+            or settings.SITH_GROUP_ROOT_ID in self.groups_snapshot.group_ids
+        )
 
-    @cached_property
+    @property
     def is_board_member(self) -> bool:
-        return self.groups.filter(club_board=settings.SITH_MAIN_CLUB_ID).exists()
+        return self.groups_snapshot.is_board_member
 
-    @cached_property
+    @property
     def is_banned_alcohol(self) -> bool:
-        return self.ban_groups.filter(id=settings.SITH_GROUP_BANNED_ALCOHOL_ID).exists()
+        return self.groups_snapshot.is_banned_alcohol
 
-    @cached_property
+    @property
     def is_banned_counter(self) -> bool:
-        return self.ban_groups.filter(id=settings.SITH_GROUP_BANNED_COUNTER_ID).exists()
+        return self.groups_snapshot.is_banned_counter
 
     @cached_property
     def age(self) -> int:
@@ -647,6 +699,222 @@ class User(AbstractUser):
         return self.is_in_group(pk=settings.SITH_GROUP_COM_ADMIN_ID)
 
 
+_request_snapshots: ContextVar[dict[int, UserGroupsSnapshot] | None] = ContextVar(
+    "request_snapshots", default=None
+)
+"""The snapshots loaded during the current request."""
+
+
+@dataclass(frozen=True)
+class UserGroupsSnapshot:
+    """The groups, bans and subscription status of a user.
+
+    Computing those informations requires several queries for each user.
+    Snapshots are computed for many users at once with a constant number
+    of queries (see [get_many][core.models.UserGroupsSnapshot.get_many]),
+    then kept for the duration of the current request, and in the cache
+    until they are invalidated (or until the next midnight, as subscriptions
+    are given by dates).
+
+    Warning:
+        Snapshots are invalidated by signals (see `core/signals.py`)
+        when the groups, the bans or the subscriptions of a user change.
+        If you change them with a bulk operation
+        (`bulk_create`, `update`, `delete` on the m2m tables...),
+        call [invalidate][core.models.UserGroupsSnapshot.invalidate] yourself.
+    """
+
+    groups: dict[int, Group]
+    """The groups the user explicitly belongs to."""
+    group_ids: frozenset[int] = frozenset()
+    """The ids of all the groups of the user,
+    including the subscribers and root groups it implicitly belongs to."""
+    is_subscribed: bool = False
+    was_subscribed: bool = False
+    is_board_member: bool = False
+    is_banned_alcohol: bool = False
+    is_banned_counter: bool = False
+
+    CACHE_TIMEOUT: ClassVar[int] = 60 * 60
+    """How long (in seconds) a snapshot may be cached."""
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"core:user:{user_id}:snapshot_version"
+
+    @classmethod
+    def _cache_timeout(cls) -> int:
+        tomorrow = localdate() + timedelta(days=1)
+        midnight = timezone.make_aware(datetime.combine(tomorrow, time()))
+        return min(cls.CACHE_TIMEOUT, int((midnight - now()).total_seconds()) + 1)
+
+    @classmethod
+    def get_many(cls, users: Iterable[User]) -> dict[int, UserGroupsSnapshot]:
+        """Get the snapshots of the given users.
+
+        The snapshots are first looked up in the ones of the current request,
+        then in the cache, and the remaining ones are computed
+        with a constant number of queries.
+
+        Returns:
+            The snapshots, indexed by user id.
+        """
+        users = {u.pk: u for u in users}
+        res = {pk: cls(groups={}) for pk in users if pk is None}
+        users.pop(None, None)
+        request_snapshots = _request_snapshots.get()
+        if request_snapshots is not None:
+            res |= {
+                pk: request_snapshots[pk] for pk in users if pk in request_snapshots
+            }
+        missing = [pk for pk in users if pk not in res]
+        if not missing:
+            return res
+        versions = cache.get_many([cls._version_key(pk) for pk in missing])
+        new_versions = {
+            cls._version_key(pk): uuid4().hex
+            for pk in missing
+            if cls._version_key(pk) not in versions
+        }
+        if new_versions:
+            cache.set_many(new_versions, timeout=None)
+            versions |= new_versions
+        keys = {
+            pk: f"core:user:{pk}:snapshot:{versions[cls._version_key(pk)]}"
+            for pk in missing
+        }
+        cached = cache.get_many(list(keys.values()))
+        loaded = {pk: cached[key] for pk, key in keys.items() if key in cached}
+        computed = cls._compute([users[pk] for pk in missing if pk not in loaded])
+        cache_set_many_if_committed(
+            {keys[pk]: snapshot for pk, snapshot in computed.items()},
+            timeout=cls._cache_timeout(),
+        )
+        loaded |= computed
+        if request_snapshots is not None:
+            request_snapshots |= loaded
+        return res | loaded
+
+    @staticmethod
+    def _flags_annotations(user_ref: OuterRef) -> dict[str, Exists]:
+        from subscription.models import Subscription
+
+        today = localdate()
+        subscriptions = Subscription.objects.filter(member=user_ref)
+        bans = UserBan.objects.filter(user=user_ref)
+        return {
+            "_was_subscribed": Exists(subscriptions),
+            "_is_subscribed": Exists(
+                subscriptions.filter(
+                    subscription_start__lte=today, subscription_end__gte=today
+                )
+            ),
+            "_is_board_member": Exists(
+                User.groups.through.objects.filter(
+                    user=user_ref, group__club_board=settings.SITH_MAIN_CLUB_ID
+                )
+            ),
+            "_is_banned_alcohol": Exists(
+                bans.filter(ban_group=settings.SITH_GROUP_BANNED_ALCOHOL_ID)
+            ),
+            "_is_banned_counter": Exists(
+                bans.filter(ban_group=settings.SITH_GROUP_BANNED_COUNTER_ID)
+            ),
+        }
+
+    @classmethod
+    def _compute(cls, users: list[User]) -> dict[int, UserGroupsSnapshot]:
+        """Compute the snapshots of the given users.
+
+        As every user is in the public group, the groups and the flags
+        of the users are usually fetched with a single query.
+        """
+        if not users:
+            return {}
+        flag_names = list(cls._flags_annotations(OuterRef("pk")).keys())
+        groups: dict[int, dict[int, Group]] = {u.pk: {} for u in users}
+        flags: dict[int, tuple[bool, ...]] = {}
+        for user_group in (
+            User.groups.through.objects.filter(user_id__in=groups.keys())
+            .select_related("group")
+            .annotate(**cls._flags_annotations(OuterRef("user_id")))
+        ):
+            groups[user_group.user_id][user_group.group_id] = user_group.group
+            flags[user_group.user_id] = tuple(
+                getattr(user_group, name) for name in flag_names
+            )
+        if missing := [pk for pk in groups if pk not in flags]:
+            flags |= {
+                row[0]: row[1:]
+                for row in User.objects.filter(pk__in=missing)
+                .annotate(**cls._flags_annotations(OuterRef("pk")))
+                .values_list("pk", *flag_names)
+            }
+        superusers = {u.pk for u in users if u.is_superuser}
+        snapshots = {}
+        for pk, user_flags in flags.items():
+            implicit_ids = {
+                *([settings.SITH_GROUP_SUBSCRIBERS_ID] if user_flags[1] else []),
+                *([settings.SITH_GROUP_ROOT_ID] if pk in superusers else []),
+            }
+            snapshots[pk] = cls(
+                groups=groups[pk],
+                group_ids=frozenset(groups[pk].keys() | implicit_ids),
+                was_subscribed=user_flags[0],
+                is_subscribed=user_flags[1],
+                is_board_member=user_flags[2],
+                is_banned_alcohol=user_flags[3],
+                is_banned_counter=user_flags[4],
+            )
+        return snapshots
+
+    @classmethod
+    def prefetch(cls, users: Iterable[User]):
+        """Load the snapshots of all the given users at once.
+
+        Use this before checking the groups, bans or subscriptions
+        of many users, to avoid doing queries for each one of them.
+
+        Example:
+            ```python
+            users = list(User.objects.filter(...))
+            UserGroupsSnapshot.prefetch(users)
+            # no more query is made here
+            subscribers = [u for u in users if u.is_subscribed]
+            ```
+        """
+        users = [u for u in users if "groups_snapshot" not in u.__dict__]
+        snapshots = cls.get_many(users)
+        for user in users:
+            user.__dict__["groups_snapshot"] = snapshots[user.pk]
+
+    @classmethod
+    def invalidate(cls, user_ids: Iterable[int]):
+        """Invalidate the snapshots of the given users."""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        request_snapshots = _request_snapshots.get()
+        if request_snapshots is not None:
+            for user_id in user_ids:
+                request_snapshots.pop(user_id, None)
+
+        def renew_versions():
+            cache.set_many(
+                {cls._version_key(pk): uuid4().hex for pk in user_ids}, timeout=None
+            )
+
+        invalidate_now_and_on_commit(renew_versions)
+
+    @staticmethod
+    def start_request(**kwargs):
+        _request_snapshots.set({})
+
+    @staticmethod
+    def end_request(**kwargs):
+        _request_snapshots.set(None)
+
+
 class AnonymousUser(AuthAnonymousUser):
     @property
     def was_subscribed(self):
@@ -806,6 +1074,174 @@ class Preferences(models.Model):
         return self.user.get_display_name()
 
 
+class TreeQuerySet(models.QuerySet):
+    """Queryset of the nodes of a tree indexed by a closure table.
+
+    See [TreeClosure][core.models.TreeClosure].
+    """
+
+    def ancestors_of(self, node_id: int, *, include_self: bool = True) -> Self:
+        """Filter the ancestors of the given node."""
+        qs = self.filter(descendant_links__descendant_id=node_id)
+        if not include_self:
+            qs = qs.exclude(pk=node_id)
+        return qs
+
+    def descendants_of(self, node_id: int, *, include_self: bool = True) -> Self:
+        """Filter the descendants of the given node."""
+        qs = self.filter(ancestor_links__ancestor_id=node_id)
+        if not include_self:
+            qs = qs.exclude(pk=node_id)
+        return qs
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        closure = self.model._meta.get_field("ancestor_links").related_model
+        closure.link_new(objs)
+        return objs
+
+
+class TreeClosure(models.Model):
+    """The closure table of a tree.
+
+    There is a row for each node of the tree and each one of its ancestors,
+    plus a row linking each node to itself, with a depth of 0.
+    Thus, all the ancestors or all the descendants of a node
+    can be fetched with a single query.
+
+    Concrete subclasses must define the `ancestor` and `descendant`
+    foreign keys to the model of the nodes, with `descendant_links`
+    and `ancestor_links` as related names.
+    The model of the nodes must have a `parent` foreign key,
+    and a manager using a [TreeQuerySet][core.models.TreeQuerySet].
+
+    Warning:
+        The closure table is updated when nodes are created
+        with `save()` or with `Model.objects.bulk_create()`,
+        and when they are moved with `save()`.
+        If you create or move nodes another way, rebuild the closure
+        table with [rebuild][core.models.TreeClosure.rebuild].
+    """
+
+    depth = models.PositiveIntegerField(_("depth"))
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def _node_model(cls) -> type[models.Model]:
+        return cls._meta.get_field("ancestor").related_model
+
+    @classmethod
+    def get_ancestors(cls, node_id: int | None) -> list[models.Model]:
+        """Return the given node and its ancestors, from the closest to the root."""
+        if node_id is None:
+            return []
+        return [
+            link.ancestor
+            for link in cls.objects.filter(descendant_id=node_id)
+            .select_related("ancestor")
+            .order_by("depth")
+        ]
+
+    @classmethod
+    def has_loop(cls, node: models.Model) -> bool:
+        """Check if the parent of the given node is the node or one of its descendants."""
+        if node.pk is None or node.parent_id is None:
+            return False
+        return cls.objects.filter(
+            ancestor_id=node.pk, descendant_id=node.parent_id
+        ).exists()
+
+    @classmethod
+    def link_new(cls, nodes: Iterable[models.Model]):
+        """Insert the links of nodes which have just been created.
+
+        The nodes may be the parents of one another.
+        """
+        nodes = {n.pk: n for n in nodes if n.pk is not None}
+        parent_ids = {n.parent_id for n in nodes.values()} - {None} - nodes.keys()
+        ancestors: dict[int, list[tuple[int, int]]] = {pk: [] for pk in parent_ids}
+        for descendant_id, ancestor_id, depth in cls.objects.filter(
+            descendant_id__in=parent_ids
+        ).values_list("descendant_id", "ancestor_id", "depth"):
+            ancestors[descendant_id].append((ancestor_id, depth))
+
+        def get_ancestors(pk: int) -> list[tuple[int, int]]:
+            if pk not in ancestors:
+                parent_id = nodes[pk].parent_id
+                ancestors[pk] = [(pk, 0)] + (
+                    []
+                    if parent_id is None
+                    else [(a, d + 1) for a, d in get_ancestors(parent_id)]
+                )
+            return ancestors[pk]
+
+        cls.objects.bulk_create(
+            [
+                cls(ancestor_id=ancestor_id, descendant_id=pk, depth=depth)
+                for pk in nodes
+                for ancestor_id, depth in get_ancestors(pk)
+            ],
+            batch_size=1000,
+        )
+
+    @classmethod
+    def move(cls, node: models.Model):
+        """Move the given node and its descendants under the current node parent.
+
+        Raises:
+            ValueError: if the parent of the node is one of its descendants.
+        """
+        if cls.has_loop(node):
+            raise ValueError("A node cannot be moved under one of its descendants")
+        subtree = list(
+            cls.objects.filter(ancestor_id=node.pk).values_list(
+                "descendant_id", "depth"
+            )
+        )
+        subtree_ids = [pk for pk, _depth in subtree]
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(
+            ancestor_id__in=subtree_ids
+        ).delete()
+        if node.parent_id is None:
+            return
+        ancestors = cls.objects.filter(descendant_id=node.parent_id).values_list(
+            "ancestor_id", "depth"
+        )
+        cls.objects.bulk_create(
+            [
+                cls(
+                    ancestor_id=ancestor_id,
+                    descendant_id=descendant_id,
+                    depth=ancestor_depth + descendant_depth + 1,
+                )
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, descendant_depth in subtree
+            ],
+            batch_size=1000,
+        )
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the whole closure table from the parents of the nodes."""
+        parents = dict(cls._node_model().objects.values_list("pk", "parent_id"))
+        links = []
+        for node_id in parents:
+            current, depth = node_id, 0
+            while current is not None and depth <= len(parents):
+                links.append(
+                    cls(ancestor_id=current, descendant_id=node_id, depth=depth)
+                )
+                current, depth = parents.get(current), depth + 1
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(links, batch_size=1000)
+
+
 def get_directory(instance, filename):
     return ".{0}/{1}".format(instance.get_parent_path(), filename)
 
@@ -880,6 +1316,8 @@ class SithFile(models.Model):
         _("is in the SAS"), default=False, db_index=True
     )  # Allows to query this flag, updated at each call to save()
 
+    objects = TreeQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("file")
 
@@ -887,24 +1325,46 @@ class SithFile(models.Model):
         return self.get_parent_path() + "/" + self.name
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        old_parent_id = (
+            None
+            if adding
+            else SithFile.objects.filter(id=self.id)
+            .values_list("parent_id", flat=True)
+            .first()
+        )
         sas_id = settings.SITH_SAS_ROOT_DIR_ID
-        self.is_in_sas = self.id == sas_id or any(
-            p.id == sas_id for p in self.get_parent_list()
+        self.is_in_sas = self.id == sas_id or (
+            self.parent_id is not None
+            and SithFileClosure.objects.filter(
+                ancestor_id=sas_id, descendant_id=self.parent_id
+            ).exists()
         )
-        adding = self._state.adding
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                SithFileClosure.link_new([self])
+            elif old_parent_id != self.parent_id:
+                SithFileClosure.move(self)
+                SithFile.objects.descendants_of(self.id, include_self=False).update(
+                    is_in_sas=self.is_in_sas
+                )
         if adding:
             self.copy_rights()
         if self.is_in_sas:
-            for user in User.objects.filter(
-                groups__id__in=[settings.SITH_GROUP_SAS_ADMIN_ID]
-            ):
+            from core.notifications import send_notifications
+
+            send_notifications(
                 Notification(
                     user=user,
                     url=reverse("sas:moderation"),
                     type="SAS_MODERATION",
                     param="1",
-                ).save()
+                )
+                for user in User.objects.filter(
+                    groups__id__in=[settings.SITH_GROUP_SAS_ADMIN_ID]
+                )
+            )
 
     def is_owned_by(self, user: User) -> bool:
         if user.is_anonymous:
@@ -945,11 +1405,7 @@ class SithFile(models.Model):
         super().clean()
         if "/" in self.name:
             raise ValidationError(_("Character '/' not authorized in name"))
-        if self == self.parent:
-            raise ValidationError(_("Loop in folder tree"), code="loop")
-        if self == self.parent or (
-            self.parent is not None and self in self.get_parent_list()
-        ):
+        if self == self.parent or SithFileClosure.has_loop(self):
             raise ValidationError(_("Loop in folder tree"), code="loop")
         if self.parent and self.parent.is_file:
             raise ValidationError(
@@ -983,14 +1439,10 @@ class SithFile(models.Model):
         Args:
             only_folders: If True, only apply the rights to SithFiles that are folders.
         """
-        file_ids = []
-        explored_ids = [self.id]
-        while len(explored_ids) > 0:  # find all children recursively
-            file_ids.extend(explored_ids)
-            next_level = SithFile.objects.filter(parent_id__in=explored_ids)
-            if only_folders:
-                next_level = next_level.filter(is_folder=True)
-            explored_ids = list(next_level.values_list("id", flat=True))
+        descendants = SithFile.objects.descendants_of(self.id)
+        if only_folders:
+            descendants = descendants.filter(is_folder=True)
+        file_ids = list(descendants.values_list("id", flat=True))
         for through in (SithFile.view_groups.through, SithFile.edit_groups.through):
             # force evaluation. Without this, the iterator yields nothing
             groups = list(
@@ -1039,13 +1491,9 @@ class SithFile(models.Model):
 
         return Album.objects.filter(id=self.id).first()
 
-    def get_parent_list(self):
-        parents = []
-        current = self.parent
-        while current is not None:
-            parents.append(current)
-            current = current.parent
-        return parents
+    def get_parent_list(self) -> list[SithFile]:
+        """Return the ancestors of this file, from its parent to the root."""
+        return SithFileClosure.get_ancestors(self.parent_id)
 
     def get_parent_path(self):
         return "/" + "/".join([p.name for p in self.get_parent_list()[::-1]])
@@ -1060,6 +1508,24 @@ class SithFile(models.Model):
         return reverse("core:download", kwargs={"file_id": self.id})
 
 
+class SithFileClosure(TreeClosure):
+    """The closure table of the file tree."""
+
+    ancestor = models.ForeignKey(
+        SithFile, related_name="descendant_links", on_delete=models.CASCADE
+    )
+    descendant = models.ForeignKey(
+        SithFile, related_name="ancestor_links", on_delete=models.CASCADE
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"], name="sith_file_closure_unique"
+            )
+        ]
+
+
 class QuickUploadImage(models.Model):
     """Images uploaded by user outside of the SithFile mechanism"""
 
@@ -1097,12 +1563,8 @@ class QuickUploadImage(models.Model):
         cls, image: UploadedFile, uploader: User | None = None
     ) -> Self:
         def convert_image(file: UploadedFile) -> ContentFile:
-            content = BytesIO()
             image = Image.open(BytesIO(file.read()))
-            if image.width > cls.MAX_IMAGE_SIZE or image.height > cls.MAX_IMAGE_SIZE:
-                image = ImageOps.contain(image, (600, 600))
-            image.save(fp=content, format="webp", optimize=True)
-            return ContentFile(content.getvalue())
+            return resize_image(image, min(max(image.size), cls.MAX_IMAGE_SIZE), "webp")
 
         identifier = str(uuid4())
         name = Path(image.name).stem[: cls.IMAGE_NAME_SIZE - 1]
@@ -1138,13 +1600,13 @@ class NotLocked(LockError):
     pass
 
 
-class PageQuerySet(models.QuerySet):
+class PageQuerySet(TreeQuerySet):
     def viewable_by(self, user: User) -> Self:
         if user.is_anonymous:
             return self.filter(view_groups=settings.SITH_GROUP_PUBLIC_ID)
         if user.has_perm("core.view_page"):
             return self.all()
-        return self.filter(view_groups__in=user.all_groups)
+        return self.filter(view_groups__in=user.groups_snapshot.group_ids)
 
 
 # This function prevents generating migration upon settings change
@@ -1236,6 +1698,15 @@ class Page(models.Model):
             super().save(
                 *args, **kwargs
             )  # Save a first time to correctly set _full_name
+            PageClosure.link_new([self])
+        else:
+            old_parent_id = (
+                Page.objects.filter(id=self.id)
+                .values_list("parent_id", flat=True)
+                .first()
+            )
+            if old_parent_id != self.parent_id:
+                PageClosure.move(self)
         # This reset the _full_name just before saving to maintain a coherent field quicker for queries than the
         # recursive method
         # It also update all the children to maintain correct names
@@ -1257,6 +1728,9 @@ class Page(models.Model):
         """Cleans up only the name for the moment, but this can be used to make any treatment before saving the object."""
         if "/" in self.name:
             self.name = self.name.split("/")[-1]
+        # check loops first, because the full name of a page in a loop is infinite
+        if self == self.parent or PageClosure.has_loop(self):
+            raise ValidationError(_("Loop in page tree"), code="loop")
         if (
             Page.objects.exclude(pk=self.pk)
             .filter(_full_name=self.get_full_name())
@@ -1264,8 +1738,6 @@ class Page(models.Model):
         ):
             raise ValidationError(_("Duplicate page"), code="duplicate")
         super().clean()
-        if self.parent is not None and self in self.get_parent_list():
-            raise ValidationError(_("Loop in page tree"), code="loop")
 
     def can_be_edited_by(self, user):
         if hasattr(self, "club") and self.club.can_be_edited_by(user):
@@ -1276,13 +1748,9 @@ class Page(models.Model):
     def can_be_viewed_by(self, user):
         return self.is_club_page
 
-    def get_parent_list(self):
-        parents = []
-        current = self.parent
-        while current is not None:
-            parents.append(current)
-            current = current.parent
-        return parents
+    def get_parent_list(self) -> list[Page]:
+        """Return the ancestors of this page, from its parent to the root."""
+        return PageClosure.get_ancestors(self.parent_id)
 
     def is_locked(self):
         """Is True if the page is locked, False otherwise.
@@ -1367,6 +1835,24 @@ class Page(models.Model):
         return super().delete(*args, **kwargs)
 
 
+class PageClosure(TreeClosure):
+    """The closure table of the page tree."""
+
+    ancestor = models.ForeignKey(
+        Page, related_name="descendant_links", on_delete=models.CASCADE
+    )
+    descendant = models.ForeignKey(
+        Page, related_name="ancestor_links", on_delete=models.CASCADE
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"], name="page_closure_unique"
+            )
+        ]
+
+
 class PageRev(models.Model):
     """True content of the page.
 
@@ -1418,7 +1904,7 @@ class PageRev(models.Model):
         return self.page.can_be_edited_by(user)
 
     def is_owned_by(self, user: User) -> bool:
-        return self.page.owner_group_id in user.all_groups
+        return user.is_in_group(pk=self.page.owner_group_id)
 
     def similarity_ratio(self, text: str) -> float:
         """Similarity ratio between this revision's content and the given text.
@@ -1451,6 +1937,24 @@ def get_notification_types():
     return settings.SITH_NOTIFICATIONS
 
 
+class NotificationQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        NotificationSummary.invalidate(n.user_id for n in objs)
+        return objs
+
+    def update(self, **kwargs) -> int:
+        """Update the notifications and invalidate the summaries of their users.
+
+        Be aware that this adds a db query, to retrieve the users
+        of the updated notifications.
+        """
+        user_ids = set(self.values_list("user_id", flat=True).distinct())
+        nb_rows = super().update(**kwargs)
+        NotificationSummary.invalidate(user_ids)
+        return nb_rows
+
+
 class Notification(models.Model):
     user = models.ForeignKey(
         User, related_name="notifications", on_delete=models.CASCADE
@@ -1463,6 +1967,8 @@ class Notification(models.Model):
     date = models.DateTimeField(_("date"), auto_now=True)
     viewed = models.BooleanField(_("viewed"), default=False, db_index=True)
 
+    objects = NotificationQuerySet.as_manager()
+
     def __str__(self):
         if self.param:
             return self.get_type_display() % self.param
@@ -1489,6 +1995,59 @@ class Notification(models.Model):
         import_string(func_name)(self)
 
 
+@dataclass(frozen=True)
+class NotificationSummary:
+    """The unread notifications of a user, as displayed in the header of every page.
+
+    Summaries are cached, so that displaying the header
+    usually doesn't query the notifications,
+    and only the most recent notifications are loaded,
+    so that a user with thousands of unread notifications
+    doesn't get a slow page.
+
+    Warning:
+        Summaries are invalidated by signals (see `core/signals.py`)
+        and by `Notification.objects.bulk_create()` and `update()`.
+        If you change notifications with another bulk operation,
+        call [invalidate][core.models.NotificationSummary.invalidate] yourself.
+    """
+
+    count: int
+    """The number of unread notifications."""
+    last: list[Notification]
+    """The most recent unread notifications."""
+
+    SIZE: ClassVar[int] = 20
+    """The maximum number of notifications in a summary."""
+    CACHE_TIMEOUT: ClassVar[int] = 60 * 60 * 24
+    """How long (in seconds) a summary may be cached."""
+
+    @staticmethod
+    def _cache_key(user_id: int) -> str:
+        return f"core:user:{user_id}:notifications"
+
+    @classmethod
+    def get(cls, user: User) -> NotificationSummary:
+        """Get the summary of the unread notifications of the given user."""
+        key = cls._cache_key(user.id)
+        summary = cache.get(key)
+        if summary is not None:
+            return summary
+        unread = user.notifications.filter(viewed=False)
+        last = list(unread.order_by("-date")[: cls.SIZE])
+        count = len(last) if len(last) < cls.SIZE else unread.count()
+        summary = cls(count=count, last=last)
+        cache_set_many_if_committed({key: summary}, timeout=cls.CACHE_TIMEOUT)
+        return summary
+
+    @classmethod
+    def invalidate(cls, user_ids: Iterable[int]):
+        """Invalidate the summaries of the given users."""
+        keys = [cls._cache_key(user_id) for user_id in set(user_ids)]
+        if keys:
+            invalidate_now_and_on_commit(lambda: cache.delete_many(keys))
+
+
 class Gift(models.Model):
     label = models.CharField(_("label"), max_length=255)
     date = models.DateTimeField(_("date"), default=timezone.now)
@@ -1512,6 +2071,17 @@ class Gift(models.Model):
         return user.is_board_member or user.is_root
 
 
+class OperationLogQuerySet(models.QuerySet):
+    def owned_by(self, user: User) -> Self:
+        """Filter the logs this user owns.
+
+        Only root users own the logs.
+        """
+        if user.is_root:
+            return self.all()
+        return self.none()
+
+
 class OperationLog(models.Model):
     """General purpose log object to register operations."""
 
@@ -1524,6 +2094,8 @@ class OperationLog(models.Model):
         _("operation type"), max_length=40, choices=settings.SITH_LOG_OPERATION_TYPE
     )
 
+    objects = OperationLogQuerySet.as_manager()
+
     def __str__(self):
         return "%s - %s - %s" % (self.operation_type, self.label, self.operator)
 
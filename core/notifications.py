@@ -0,0 +1,122 @@
+"""Sending of the notifications to the users.
+
+Some events notify a lot of users at once
+(all the admins of a group, all the people identified on a picture...),
+and creating the notifications one by one costs several queries per user.
+
+Thus, the notifications are sent by batches with
+[send_notifications][core.notifications.send_notifications] :
+each batch is created all at once, with a constant number of queries,
+when the current transaction is committed.
+If the transaction is rolled back, the notifications are not sent.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from functools import partial
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from core.models import Notification
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+def _merge_permanent(
+    notif_type: str, notifications: list[Notification]
+) -> list[Notification]:
+    """Merge permanent notifications with the existing ones of their users.
+
+    A user has a single notification of each permanent type :
+    the existing notifications are updated with a single query,
+    and the notifications of the users who had none are returned,
+    in order to be created.
+
+    The callback of the type is called only once,
+    and the `viewed` and `param` fields it computes
+    are given to all the notifications.
+    """
+    notifications[0].callback()
+    changes = {"date": now()}
+    if settings.SITH_PERMANENT_NOTIFICATIONS[notif_type]:
+        changes |= {
+            "viewed": notifications[0].viewed,
+            "param": notifications[0].param,
+        }
+    existing = Notification.objects.filter(
+        type=notif_type, user_id__in={n.user_id for n in notifications}
+    )
+    existing_users = set(existing.values_list("user_id", flat=True))
+    if existing_users:
+        existing.update(**changes)
+    new = {}
+    for notif in notifications:
+        if notif.user_id not in existing_users and notif.user_id not in new:
+            for field, value in changes.items():
+                setattr(notif, field, value)
+            new[notif.user_id] = notif
+    return list(new.values())
+
+
+def _flush(pending: Iterable[tuple[Notification, bool]]):
+    by_type: dict[str, list[tuple[Notification, bool]]] = defaultdict(list)
+    for notif, unless_unread in pending:
+        by_type[notif.type].append((notif, unless_unread))
+    to_create = []
+    for notif_type, entries in by_type.items():
+        if notif_type in settings.SITH_PERMANENT_NOTIFICATIONS:
+            to_create.extend(_merge_permanent(notif_type, [n for n, _u in entries]))
+            continue
+        unread_users = set()
+        if any(unless_unread for _n, unless_unread in entries):
+            unread_users = set(
+                Notification.objects.filter(
+                    type=notif_type,
+                    viewed=False,
+                    user_id__in={n.user_id for n, _u in entries},
+                ).values_list("user_id", flat=True)
+            )
+        created = set()
+        for notif, unless_unread in entries:
+            key = (notif.user_id, notif.url, notif.param)
+            if key in created or (unless_unread and notif.user_id in unread_users):
+                continue
+            created.add(key)
+            if not notif.viewed:
+                unread_users.add(notif.user_id)
+            to_create.append(notif)
+    Notification.objects.bulk_create(to_create)
+
+
+def send_notifications(
+    notifications: Iterable[Notification], *, unless_unread: bool = False
+):
+    """Send the given notifications, once the current transaction is committed.
+
+    All the given notifications are created together,
+    and the duplicates among them are sent only once.
+    The notifications of a permanent type (see `SITH_PERMANENT_NOTIFICATIONS`)
+    are merged with the existing notification of the same type of their user.
+    Outside of a transaction, the notifications are sent right away.
+
+    Args:
+        notifications: the notifications to send (which must not be saved yet).
+        unless_unread: if True, the users who already have
+            an unread notification of the same type don't get a new one.
+
+    Example:
+        ```python
+        send_notifications(
+            Notification(user=user, url=url, type="POSTER_MODERATION")
+            for user in User.objects.filter(groups__id=settings.SITH_GROUP_COM_ADMIN_ID)
+        )
+        ```
+    """
+    entries = [(notif, unless_unread) for notif in notifications]
+    if entries:
+        transaction.on_commit(partial(_flush, entries))
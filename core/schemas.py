@@ -2,7 +2,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Annotated, Any
 
-from annotated_types import MinLen
+from annotated_types import MaxLen, MinLen
+from django.conf import settings
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.db.models import Q
 from django.urls import reverse
@@ -155,6 +156,10 @@ class MarkdownSchema(Schema):
     text: str
 
 
+class MarkdownBatchSchema(Schema):
+    texts: Annotated[list[str], MaxLen(settings.SITH_MARKDOWN_BATCH_MAX_SIZE)]
+
+
 class FamilyGodfatherSchema(Schema):
     godfather: int
     godchild: int
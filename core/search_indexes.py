@@ -22,11 +22,26 @@
 #
 #
 
+from __future__ import annotations
+
+import operator
+from functools import reduce
+from typing import TYPE_CHECKING, Self
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from haystack import indexes, signals
+from haystack.exceptions import NotHandled
+from haystack.query import SQ, RelatedSearchQuerySet
 
+from club.models import Membership
 from core.models import User
-from forum.models import ForumMessage, ForumMessageMeta
+from forum.models import Forum, ForumMessage, ForumMessageMeta, ForumTopic
+from forum.signals import forum_rights_changed
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
 
 
 class UserIndex(indexes.SearchIndex, indexes.Indexable):
@@ -69,6 +84,15 @@ class IndexSignalProcessor(signals.BaseSignalProcessor):
             self.handle_forum_message_meta_delete, sender=ForumMessageMeta
         )
 
+        # The rights of the forums are indexed with their messages
+        models.signals.post_save.connect(self.handle_forum_save, sender=Forum)
+        models.signals.post_save.connect(self.handle_topic_save, sender=ForumTopic)
+        for through in (Forum.view_groups.through, Forum.edit_groups.through):
+            models.signals.m2m_changed.connect(
+                self.handle_forum_groups_change, sender=through
+            )
+        forum_rights_changed.connect(self.handle_forum_rights_change, sender=Forum)
+
     def teardown(self):
         # Disconnect only for the ``User`` model.
         models.signals.post_save.disconnect(self.handle_save, sender=User)
@@ -86,12 +110,55 @@ class IndexSignalProcessor(signals.BaseSignalProcessor):
             self.handle_forum_message_meta_delete, sender=ForumMessageMeta
         )
 
+        models.signals.post_save.disconnect(self.handle_forum_save, sender=Forum)
+        models.signals.post_save.disconnect(self.handle_topic_save, sender=ForumTopic)
+        for through in (Forum.view_groups.through, Forum.edit_groups.through):
+            models.signals.m2m_changed.disconnect(
+                self.handle_forum_groups_change, sender=through
+            )
+        forum_rights_changed.disconnect(self.handle_forum_rights_change, sender=Forum)
+
     def handle_forum_message_meta_save(self, sender, instance, **kwargs):
         super().handle_save(ForumMessage, instance.message, **kwargs)
 
     def handle_forum_message_meta_delete(self, sender, instance, **kwargs):
         super().handle_delete(ForumMessage, instance.message, **kwargs)
 
+    def handle_forum_save(self, sender, instance: Forum, **kwargs):
+        if not kwargs["created"]:
+            self.update_forum_messages(Q(topic__forum_id=instance.id))
+
+    def handle_topic_save(self, sender, instance: ForumTopic, **kwargs):
+        # the topic may have been moved to a forum with other rights
+        if not kwargs["created"]:
+            self.update_forum_messages(Q(topic_id=instance.id))
+
+    def handle_forum_groups_change(self, sender, instance, action: str, **kwargs):
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        # When the forums are changed from the group side, `pk_set` contains
+        # the ids of the forums (it is None when the group is cleared).
+        forum_ids = (kwargs["pk_set"] or []) if kwargs["reverse"] else [instance.id]
+        self.handle_forum_rights_change(sender=Forum, forum_ids=forum_ids)
+
+    def handle_forum_rights_change(self, sender, forum_ids: Iterable[int], **kwargs):
+        self.update_forum_messages(Q(topic__forum_id__in=forum_ids))
+
+    def update_forum_messages(self, condition: Q):
+        """Update the index of the messages matching the given condition
+        in all the search backends.
+        """
+        for using in self.connection_router.for_write(models=[ForumMessage]):
+            try:
+                index = (
+                    self.connections[using].get_unified_index().get_index(ForumMessage)
+                )
+            except NotHandled:
+                continue
+            queryset = index.index_queryset(using=using).filter(condition)
+            if queryset.exists():
+                self.connections[using].get_backend().update(index, queryset)
+
 
 class BigCharFieldIndex(indexes.CharField):
     """Workaround to avoid xapian.InvalidArgument: Term too long (> 245).
@@ -110,5 +177,62 @@ class ForumMessageIndex(indexes.SearchIndex, indexes.Indexable):
     auto = indexes.EdgeNgramField(use_template=True)
     date = indexes.DateTimeField(model_attr="date")
 
+    # The fields below are the rights on the message,
+    # used to filter the messages a user can see directly in the search backend.
+    author = indexes.IntegerField(model_attr="author_id")
+    deleted = indexes.BooleanField(model_attr="_deleted")
+    owner_club = indexes.IntegerField(model_attr="topic__forum__owner_club_id")
+    view_groups = indexes.MultiValueField()
+    edit_groups = indexes.MultiValueField()
+
     def get_model(self):
         return ForumMessage
+
+    def index_queryset(self, using=None):
+        return (
+            self.get_model()
+            .objects.select_related("topic__forum")
+            .prefetch_related("topic__forum__view_groups", "topic__forum__edit_groups")
+        )
+
+    def prepare_view_groups(self, obj: ForumMessage) -> list[int]:
+        return [g.id for g in obj.topic.forum.view_groups.all()]
+
+    def prepare_edit_groups(self, obj: ForumMessage) -> list[int]:
+        return [g.id for g in obj.topic.forum.edit_groups.all()]
+
+
+class ForumMessageSearchQuerySet(RelatedSearchQuerySet):
+    def viewable_by(self, user: User) -> Self:
+        """Filter the forum messages that this user can see.
+
+        A message can be seen by the users who can view its forum.
+        Deleted messages can only be seen by their author
+        and by the users who can edit the forum.
+
+        The filtering is done by the search backend,
+        thanks to the rights indexed by
+        [ForumMessageIndex][core.search_indexes.ForumMessageIndex].
+        """
+        if user.is_anonymous:
+            return self.filter(view_groups=settings.SITH_GROUP_PUBLIC_ID, deleted=False)
+        if user.is_root or user.is_in_group(pk=settings.SITH_GROUP_FORUM_ADMIN_ID):
+            return self.all()
+        group_ids = list(user.groups_snapshot.group_ids)
+        club_ids = list(
+            Membership.objects.ongoing()
+            .board()
+            .filter(user=user)
+            .values_list("club_id", flat=True)
+        )
+        # the users who own a forum are those in the board of its club
+        can_edit = [
+            *([SQ(edit_groups__in=group_ids)] if group_ids else []),
+            *([SQ(owner_club__in=club_ids)] if club_ids else []),
+        ]
+        can_view = [*can_edit, *([SQ(view_groups__in=group_ids)] if group_ids else [])]
+        if not can_view:
+            return self.none()
+        return self.filter(reduce(operator.or_, can_view)).filter(
+            reduce(operator.or_, [SQ(deleted=False), SQ(author=user.id), *can_edit])
+        )
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.models import (
+    Group,
+    Notification,
+    NotificationSummary,
+    User,
+    UserBan,
+    UserGroupsSnapshot,
+)
+from subscription.models import Subscription
+
+
+def _invalidate_user(user: User):
+    UserGroupsSnapshot.invalidate([user.pk])
+    user.clear_groups_snapshot()
+
+
+@receiver(m2m_changed, sender=User.groups.through, dispatch_uid="user_groups_changed")
+@receiver(m2m_changed, sender=User.ban_groups.through, dispatch_uid="user_bans_changed")
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate the snapshots of the users whose groups or bans changed."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        _invalidate_user(instance)
+    elif action == "pre_clear":
+        UserGroupsSnapshot.invalidate(instance.users.values_list("id", flat=True))
+    else:
+        UserGroupsSnapshot.invalidate(pk_set)
+
+
+@receiver(post_save, sender=UserBan, dispatch_uid="user_ban_saved")
+@receiver(post_delete, sender=UserBan, dispatch_uid="user_ban_deleted")
+def user_ban_changed(sender, instance: UserBan, **kwargs):
+    UserGroupsSnapshot.invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=Subscription, dispatch_uid="subscription_saved")
+@receiver(post_delete, sender=Subscription, dispatch_uid="subscription_deleted")
+def subscription_changed(sender, instance: Subscription, **kwargs):
+    if Subscription.member.is_cached(instance):
+        _invalidate_user(instance.member)
+    else:
+        UserGroupsSnapshot.invalidate([instance.member_id])
+
+
+@receiver(post_save, sender=User, dispatch_uid="user_saved")
+def user_saved(sender, instance: User, **kwargs):
+    # `is_superuser` is a part of the snapshot
+    _invalidate_user(instance)
+
+
+@receiver(pre_delete, sender=Group, dispatch_uid="group_deleted")
+def group_deleted(sender, instance: Group, **kwargs):
+    UserGroupsSnapshot.invalidate(instance.users.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Group, dispatch_uid="group_saved_clear_ids")
+@receiver(post_delete, sender=Group, dispatch_uid="group_deleted_clear_ids")
+def clear_group_ids_cache(sender, **kwargs):
+    cache.delete(Group.GROUP_IDS_CACHE_KEY)
+
+
+@receiver(post_save, sender=Notification, dispatch_uid="notification_saved")
+@receiver(post_delete, sender=Notification, dispatch_uid="notification_deleted")
+def notification_changed(sender, instance: Notification, **kwargs):
+    NotificationSummary.invalidate([instance.user_id])
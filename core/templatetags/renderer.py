@@ -25,20 +25,21 @@
 import datetime
 
 import phonenumbers
-from aemark import markdown as md
 from django import template
 from django.forms import BoundField
 from django.template.defaultfilters import stringfilter
 from django.utils.safestring import mark_safe
 from django.utils.translation import ngettext
 
+from core.markdown import render_markdown
+
 register = template.Library()
 
 
 @register.filter(is_safe=False)
 @stringfilter
 def markdown(text):
-    return mark_safe('<div class="markdown">%s</div>' % md(text))
+    return mark_safe('<div class="markdown">%s</div>' % render_markdown(text))
 
 
 @register.filter(name="phonenumber")
@@ -14,18 +14,23 @@
 #
 
 from datetime import date, timedelta
+from io import BytesIO
 from smtplib import SMTPException
+from unittest.mock import patch
 
 import freezegun
+import PIL.Image
 import pytest
 from aemark import markdown
 from bs4 import BeautifulSoup
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import Permission
 from django.core import mail
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.mail import EmailMessage
-from django.test import Client, RequestFactory, TestCase
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.views.generic import View
 from django.views.generic.base import ContextMixin
@@ -35,10 +40,17 @@ from pytest_django.asserts import assertInHTML, assertRedirects
 from antispam.models import ToxicDomain
 from club.models import Club
 from core.baker_recipes import subscriber_user
+from core.markdown import render_markdown, render_markdown_many
 from core.models import AnonymousUser, Group, Page, User, validate_promo
-from core.utils import get_last_promo, get_semester_code, get_start_of_semester
+from core.utils import (
+    get_last_promo,
+    get_semester_code,
+    get_start_of_semester,
+    resize_image_many,
+)
 from core.views import AllowFragment
 from counter.models import Customer
+from forum.models import ForumMessage
 from sith import settings
 
 
@@ -241,6 +253,54 @@ def test_full_markdown_syntax():
     assert result == html
 
 
+class TestMarkdownCache:
+    def test_render_once(self):
+        cache.clear()
+        with patch("core.markdown.markdown", wraps=markdown) as mocked:
+            assert render_markdown("**hello**") == "<p><strong>hello</strong></p>\n"
+            assert render_markdown("**hello**") == "<p><strong>hello</strong></p>\n"
+            assert render_markdown_many(["**hello**", "*world*"]) == {
+                "**hello**": "<p><strong>hello</strong></p>\n",
+                "*world*": "<p><em>world</em></p>\n",
+            }
+        assert [c.args for c in mocked.call_args_list] == [("**hello**",), ("*world*",)]
+
+    @override_settings(SITH_MARKDOWN_CACHE_MAX_SIZE=10)
+    def test_too_long_not_cached(self):
+        cache.clear()
+        with patch("core.markdown.markdown", wraps=markdown) as mocked:
+            render_markdown("**hello world**")
+            render_markdown("**hello world**")
+        assert mocked.call_count == 2
+
+    @pytest.mark.django_db
+    def test_warm_up_command(self):
+        cache.clear()
+        message = baker.make(ForumMessage, message="**hello**")
+        call_command("warm_markdown_cache")
+        with patch("core.markdown.markdown") as mocked:
+            render_markdown(message.message)
+        mocked.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_render_markdown_batch(client: Client):
+    client.force_login(baker.make(User))
+    url = reverse("api:markdown_batch")
+    res = client.post(
+        url, {"texts": ["**hello**", "*world*", "**hello**"]}, "application/json"
+    )
+    assert res.status_code == 200
+    assert res.json() == [
+        '<div class="markdown"><p><strong>hello</strong></p>\n</div>',
+        '<div class="markdown"><p><em>world</em></p>\n</div>',
+        '<div class="markdown"><p><strong>hello</strong></p>\n</div>',
+    ]
+    texts = ["a"] * (settings.SITH_MARKDOWN_BATCH_MAX_SIZE + 1)
+    res = client.post(url, {"texts": texts}, "application/json")
+    assert res.status_code == 422
+
+
 class TestPageHandling(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -415,16 +475,16 @@ class TestUserIsInGroup(TestCase):
         group_in = baker.make(Group)
         self.public_user.groups.add(group_in)
 
-        # clear the cached property `User.all_groups`
-        self.public_user.__dict__.pop("all_groups", None)
+        # clear the snapshot of the user groups
+        self.public_user.clear_groups_snapshot()
         # Test when the user is in the group
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(1):
             self.public_user.is_in_group(pk=group_in.id)
         with self.assertNumQueries(0):
             self.public_user.is_in_group(pk=group_in.id)
 
         group_not_in = baker.make(Group)
-        self.public_user.__dict__.pop("all_groups", None)
+        self.public_user.clear_groups_snapshot()
         # Test when the user is not in the group
         with self.assertNumQueries(1):
             self.public_user.is_in_group(pk=group_not_in.id)
@@ -511,6 +571,20 @@ def test_get_last_promo(current_date: str, promo: int):
         assert get_last_promo() == promo
 
 
+def test_resize_image_many():
+    """Test that an image is resized to several sizes from a single decoding."""
+    content = BytesIO()
+    PIL.Image.new("RGB", (2000, 1000), "red").save(content, format="JPEG")
+    im = PIL.Image.open(content)
+    compressed, thumbnail, same = resize_image_many(im, [800, 200, 800], "webp")
+    # the JPEG has been decoded at a lower resolution
+    assert im.size == (1000, 500)
+    assert PIL.Image.open(compressed).size == (800, 400)
+    assert PIL.Image.open(thumbnail).size == (200, 100)
+    assert PIL.Image.open(thumbnail).format == "WEBP"
+    assert same.read() == compressed.read()
+
+
 @pytest.mark.parametrize("promo", [0, 24])
 def test_promo_validator(promo: int):
     with freezegun.freeze_time("2021-10-01"), pytest.raises(ValidationError):
@@ -6,6 +6,7 @@ from uuid import uuid4
 
 import pytest
 from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
 from django.test import Client, TestCase
 from django.urls import reverse
@@ -15,7 +16,7 @@ from PIL import Image
 from pytest_django.asserts import assertNumQueries
 
 from core.baker_recipes import board_user, old_subscriber_user, subscriber_user
-from core.models import Group, QuickUploadImage, SithFile, User
+from core.models import Group, QuickUploadImage, SithFile, SithFileClosure, User
 from core.utils import RED_PIXEL_PNG
 from sas.models import Picture
 from sith import settings
@@ -227,6 +228,36 @@ class TestUserProfilePicture:
         assert Image.open(user.profile_pict.file).format == "WEBP"
 
 
+@pytest.mark.django_db
+class TestFileTree:
+    @pytest.fixture
+    def files(self) -> list[SithFile]:
+        """A chain of three folders, each one the parent of the next."""
+        files = [baker.make(SithFile)]
+        for _i in range(2):
+            files.append(baker.make(SithFile, parent=files[-1]))
+        return files
+
+    def test_parent_list(self, files: list[SithFile], django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert files[2].get_parent_list() == [files[1], files[0]]
+
+    def test_loop(self, files: list[SithFile]):
+        files[0].parent = files[2]
+        with pytest.raises(ValidationError):
+            files[0].clean()
+
+    def test_move_to_sas(self, files: list[SithFile]):
+        sas = SithFile.objects.get(id=settings.SITH_SAS_ROOT_DIR_ID)
+        files[1].move_to(sas)
+        assert set(
+            SithFile.objects.descendants_of(sas.id).values_list("id", flat=True)
+        ) >= {files[1].id, files[2].id}
+        files[2].refresh_from_db()
+        assert files[2].is_in_sas
+        assert files[2].get_parent_list() == [files[1], sas]
+
+
 @pytest.mark.django_db
 def test_apply_rights_recursively():
     """Test that the apply_rights_recursively method works as intended."""
@@ -238,6 +269,8 @@ def test_apply_rights_recursively():
     files.extend(
         baker.make(SithFile, _quantity=6, parent=cycle(files[4:7]), _bulk_create=True)
     )
+    # baker bulk creation bypasses the closure table
+    SithFileClosure.rebuild()
 
     groups = list(baker.make(Group, _quantity=7))
     files[0].view_groups.set(groups[:3])
@@ -246,8 +279,8 @@ def test_apply_rights_recursively():
     # those groups should be erased after the function call
     files[1].view_groups.set(groups[6:])
 
-    with assertNumQueries(10):
-        # 1 query for each level of depth (here 4)
+    with assertNumQueries(7):
+        # 1 query to get all the descendants, whatever the depth
         # 1 query to get the view_groups of the first file
         # 1 query to delete the previous view_groups
         # 1 query apply the new view_groups
@@ -1,8 +1,10 @@
 from datetime import timedelta
 from operator import attrgetter
+from unittest.mock import patch
 
 import pytest
 from bs4 import BeautifulSoup
+from django.db import transaction
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.utils.timezone import now
@@ -10,7 +12,9 @@ from model_bakery import baker, seq
 from pytest_django.asserts import assertRedirects
 
 from core.baker_recipes import subscriber_user
-from core.models import Notification
+from core.models import Notification, NotificationSummary, User
+from core.notifications import send_notifications
+from sas.models import Picture
 
 
 @pytest.mark.django_db
@@ -62,3 +66,126 @@ def test_notification_redirect(client: Client):
     assertRedirects(response, url)
     notif.refresh_from_db()
     assert notif.viewed is True
+
+
+@pytest.mark.django_db
+class TestNotificationSummary:
+    def test_summary(self):
+        user = subscriber_user.make()
+        notifs = baker.make(
+            Notification,
+            user=user,
+            viewed=False,
+            date=seq(now() - timedelta(days=1), timedelta(hours=1)),
+            _quantity=NotificationSummary.SIZE + 5,
+            _bulk_create=True,
+        )
+        baker.make(Notification, user=user, viewed=True)
+        summary = NotificationSummary.get(user)
+        assert summary.count == len(notifs)
+        assert summary.last == notifs[::-1][: NotificationSummary.SIZE]
+
+    def test_invalidation(self, django_assert_num_queries):
+        user = subscriber_user.make()
+        baker.make(Notification, user=user, viewed=False, _quantity=2)
+
+        def get_count() -> int:
+            # the cache is disabled inside transactions,
+            # which is the case of every test
+            connection = transaction.get_connection()
+            with patch.object(connection, "in_atomic_block", new=False):
+                return NotificationSummary.get(user).count
+
+        assert get_count() == 2
+        with django_assert_num_queries(0):
+            assert get_count() == 2
+        baker.make(Notification, user=user, viewed=False)
+        assert get_count() == 3
+        Notification.objects.bulk_create([Notification(user=user, url="/")])
+        assert get_count() == 4
+        user.notifications.update(viewed=True)
+        assert get_count() == 0
+
+    def test_header(self, client: Client):
+        user = subscriber_user.make()
+        baker.make(Notification, user=user, viewed=False, _quantity=3)
+        client.force_login(user)
+        response = client.get(reverse("core:index"))
+        soup = BeautifulSoup(response.text, "lxml")
+        assert soup.select_one(".notification span").text.strip() == "3"
+        assert len(soup.select("#header_notif li")) == 3
+
+
+@pytest.mark.django_db
+class TestSendNotifications:
+    def test_sent_on_commit(
+        self, django_capture_on_commit_callbacks, django_assert_num_queries
+    ):
+        users = baker.make(User, _quantity=20, _bulk_create=True)
+        with django_capture_on_commit_callbacks(execute=True):
+            send_notifications(
+                Notification(user=u, url="/", type="POSTER_MODERATION")
+                # sent twice in the same batch, but created once
+                for u in [*users, users[0]]
+            )
+            assert not Notification.objects.filter(user__in=users).exists()
+            with django_assert_num_queries(0):
+                # nothing is queried until the transaction is committed
+                send_notifications(
+                    [Notification(user=users[1], url="/", type="GENERIC")]
+                )
+                send_notifications(
+                    [Notification(user=users[2], url="/", type="GENERIC")]
+                )
+        assert Notification.objects.filter(user__in=users).count() == 22
+
+    def test_rolled_back(self, django_capture_on_commit_callbacks):
+        user = baker.make(User)
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(ValueError), transaction.atomic():
+                send_notifications([Notification(user=user, url="/")])
+                raise ValueError
+            send_notifications([Notification(user=user, url="/", param="kept")])
+        assert list(user.notifications.values_list("param", flat=True)) == ["kept"]
+
+    def test_unless_unread(self, django_capture_on_commit_callbacks):
+        users = baker.make(User, _quantity=3)
+        baker.make(Notification, user=users[0], type="FILE_MODERATION", viewed=False)
+        baker.make(Notification, user=users[1], type="FILE_MODERATION", viewed=True)
+        with django_capture_on_commit_callbacks(execute=True):
+            send_notifications(
+                (Notification(user=u, url="/", type="FILE_MODERATION") for u in users),
+                unless_unread=True,
+            )
+        notifs = Notification.objects.filter(user__in=users, type="FILE_MODERATION")
+        assert sorted(notifs.values_list("user_id", flat=True)) == [
+            users[0].id,
+            users[1].id,
+            users[1].id,
+            users[2].id,
+        ]
+
+    def test_permanent(
+        self, django_capture_on_commit_callbacks, django_assert_num_queries
+    ):
+        """Test that permanent notifications are merged with the existing ones."""
+        users = baker.make(User, _quantity=10)
+        old = baker.make(
+            Notification, user=users[0], type="SAS_MODERATION", param="1", viewed=True
+        )
+        nb_pictures = Picture.objects.filter(is_moderated=False).count()
+        # the callback, the existing notifications,
+        # their update (which fetches their users first) and the creation
+        with (
+            django_assert_num_queries(5),
+            django_capture_on_commit_callbacks(execute=True),
+        ):
+            send_notifications(
+                Notification(user=u, url="/", type="SAS_MODERATION") for u in users
+            )
+        notifs = Notification.objects.filter(user__in=users, type="SAS_MODERATION")
+        assert notifs.count() == len(users)
+        old.refresh_from_db()
+        assert old.param == str(nb_pictures)
+        assert old.viewed == (nb_pictures == 0)
+        assert set(notifs.values_list("param", flat=True)) == {str(nb_pictures)}
@@ -6,6 +6,7 @@ from aemark import markdown
 from bs4 import BeautifulSoup
 from django.conf import settings
 from django.contrib.auth.models import Permission
+from django.core.exceptions import ValidationError
 from django.test import Client
 from django.urls import reverse
 from django.utils.timezone import now
@@ -157,3 +158,35 @@ def test_page_list_view(client: Client):
     client.force_login(subscriber_user.make())
     res = client.get(reverse("core:page_list"))
     assert res.status_code == 200
+
+
+@pytest.mark.django_db
+class TestPageTree:
+    @pytest.fixture
+    def pages(self) -> list[Page]:
+        """A chain of three pages, each one the parent of the next."""
+        pages = []
+        for i in range(3):
+            page = Page(name=f"page{i}", parent=pages[-1] if pages else None)
+            page.save(force_lock=True)
+            pages.append(page)
+        return pages
+
+    def test_parent_list(self, pages: list[Page], django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert pages[2].get_parent_list() == [pages[1], pages[0]]
+        assert list(Page.objects.descendants_of(pages[0].id)) == pages
+
+    def test_move(self, pages: list[Page]):
+        other_page = baker.prepare(Page, name="other")
+        other_page.save(force_lock=True)
+        pages[1].parent = other_page
+        pages[1].save(force_lock=True)
+        assert pages[2].get_parent_list() == [pages[1], other_page]
+        pages[2].refresh_from_db()
+        assert pages[2]._full_name == "other/page1/page2"
+
+    def test_loop(self, pages: list[Page]):
+        pages[0].parent = pages[2]
+        with pytest.raises(ValidationError):
+            pages[0].save(force_lock=True)
@@ -21,7 +21,14 @@ from core.baker_recipes import (
     subscriber_user,
     very_old_subscriber_user,
 )
-from core.models import AnonymousUser, Group, SithFile, User
+from core.models import (
+    AnonymousUser,
+    BanGroup,
+    Group,
+    SithFile,
+    User,
+    UserGroupsSnapshot,
+)
 from core.views import UserTabsMixin
 from counter.baker_recipes import sale_recipe
 from counter.models import Counter, Customer, Permanency, Refilling, Selling
@@ -546,3 +553,73 @@ class TestUserGodfather:
             response, reverse("core:user_godfathers", kwargs={"user_id": user.id})
         )
         assert not user.godfathers.contains(other_user)
+
+
+@pytest.mark.django_db
+class TestUserGroupsSnapshot:
+    def test_prefetch_number_queries(self, django_assert_num_queries):
+        group = baker.make(Group)
+        users = [
+            *subscriber_user.make(_quantity=5),
+            *old_subscriber_user.make(_quantity=5),
+        ]
+        for user in users:
+            user.groups.add(group)
+        users = list(User.objects.filter(id__in=[u.id for u in users]))
+        with django_assert_num_queries(1):
+            UserGroupsSnapshot.prefetch(users)
+        with django_assert_num_queries(0):
+            assert all(u.is_in_group(pk=group.id) for u in users)
+            assert [u.is_subscribed for u in users] == [True] * 5 + [False] * 5
+            assert all(u.was_subscribed for u in users)
+
+    def test_invalidated_by_signals(self):
+        user = baker.make(User)
+        group = baker.make(Group)
+        assert not user.is_in_group(pk=group.id)
+        assert not user.is_subscribed
+        assert not user.is_banned_alcohol
+
+        user.groups.add(group)
+        assert user.is_in_group(pk=group.id)
+        baker.make(
+            "subscription.Subscription",
+            member=user,
+            subscription_start=now().date() - timedelta(days=1),
+            subscription_end=now().date() + timedelta(days=1),
+        )
+        assert user.is_subscribed
+        user.ban_groups.add(
+            BanGroup.objects.get(id=settings.SITH_GROUP_BANNED_ALCOHOL_ID),
+            through_defaults={"reason": "test"},
+        )
+        assert user.is_banned_alcohol
+
+    def test_invalidated_by_renewal(self):
+        """Test that the snapshot of a former subscriber is cleared on renewal."""
+        user = old_subscriber_user.make()
+        assert user.was_subscribed
+        assert not user.is_subscribed
+        baker.make(
+            "subscription.Subscription",
+            member=user,
+            subscription_start=now().date() - timedelta(days=1),
+            subscription_end=now().date() + timedelta(days=1),
+        )
+        assert user.is_subscribed
+
+    def test_request_snapshots(self, django_assert_num_queries):
+        user = baker.make(User)
+        group = baker.make(Group)
+        UserGroupsSnapshot.start_request()
+        try:
+            UserGroupsSnapshot.get_many([user])
+            # another instance of the same user reuses the snapshot of the request
+            other_instance = User.objects.get(id=user.id)
+            with django_assert_num_queries(0):
+                assert not other_instance.is_in_group(pk=group.id)
+            group.users.add(user)
+            other_instance = User.objects.get(id=user.id)
+            assert other_instance.is_in_group(pk=group.id)
+        finally:
+            UserGroupsSnapshot.end_request()
@@ -13,18 +13,23 @@
 #
 #
 
-from datetime import date, timedelta
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 
 # Image utils
-from io import BytesIO
-from typing import Final
+from io import BytesIO, RawIOBase
+from typing import Any, Final
+from zipfile import ZIP_STORED, ZipFile, ZipInfo
 
 import PIL
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
 from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 from django.http import HttpRequest
-from django.utils.timezone import localdate
+from django.utils.timezone import localdate, localtime
 from PIL.Image import Image, Resampling
 
 RED_PIXEL_PNG: Final[bytes] = (
@@ -133,6 +138,27 @@ def is_image(file: UploadedFile):
     return True
 
 
+def _fit_size(size: tuple[int, int], edge: int) -> tuple[int, int]:
+    """Get the size of an image of the given size scaled to the given edge length."""
+    (w, h) = size
+    ratio = edge / max(w, h)
+    return max(int(w * ratio), 1), max(int(h * ratio), 1)
+
+
+def _save_image(im: Image, img_format: str, *, optimize: bool) -> ContentFile:
+    img_format = img_format.upper()
+    content = BytesIO()
+    if img_format == "JPEG":
+        # converting an image with an alpha channel to jpeg would cause a crash
+        im = im.convert("RGB")
+    try:
+        im.save(fp=content, format=img_format, optimize=optimize)
+    except IOError:
+        PIL.ImageFile.MAXBLOCK = im.size[0] * im.size[1]
+        im.save(fp=content, format=img_format, optimize=optimize)
+    return ContentFile(content.getvalue())
+
+
 def resize_image(
     im: Image, edge: int, img_format: str, *, optimize: bool = True
 ) -> ContentFile:
@@ -144,10 +170,56 @@ def resize_image(
         img_format: the target format of the image ("JPEG", "PNG", "WEBP"...)
         optimize: Should the resized image be optimized ?
     """
-    (w, h) = im.size
-    ratio = edge / max(w, h)
-    (width, height) = int(w * ratio), int(h * ratio)
-    return resize_image_explicit(im, (width, height), img_format, optimize=optimize)
+    return resize_image_explicit(
+        im, _fit_size(im.size, edge), img_format, optimize=optimize
+    )
+
+
+def resize_image_many(
+    im: Image, edges: Sequence[int], img_format: str, *, optimize: bool = True
+) -> list[ContentFile]:
+    """Resize an image to fit several edge lengths at once.
+
+    The image is decoded only once, and each resized image
+    is downsampled from the previous (and larger) one,
+    which is much cheaper than resizing the original image each time.
+    The resized images are then encoded in parallel.
+
+    Args:
+        im: the image to resize
+        edges: the lengths that the greater side of the resized images should have
+        img_format: the target format of the images ("JPEG", "PNG", "WEBP"...)
+        optimize: Should the resized images be optimized ?
+
+    Returns:
+        The resized images, in the same order as the given edges.
+
+    Example:
+        ```python
+        compressed, thumbnail = resize_image_many(im, [1200, 200], "webp")
+        ```
+    """
+    sizes = [_fit_size(im.size, edge) for edge in edges]
+    # if the image is a JPEG which isn't loaded yet,
+    # decode it directly at a lower resolution (but still large enough)
+    im.draft(None, max(sizes))
+    resized = {}
+    for size in sorted(set(sizes), reverse=True):
+        if size != im.size:
+            # use the lanczos filter for antialiasing
+            im = im.resize(size, Resampling.LANCZOS)
+        resized[size] = im
+    if len(resized) == 1:
+        content = _save_image(im, img_format, optimize=optimize)
+        return [content for _ in sizes]
+    # Pillow releases the GIL while encoding,
+    # so the images are really encoded in parallel.
+    with ThreadPoolExecutor(max_workers=len(resized)) as executor:
+        futures = {
+            size: executor.submit(_save_image, img, img_format, optimize=optimize)
+            for size, img in resized.items()
+        }
+        return [futures[size].result() for size in sizes]
 
 
 def resize_image_explicit(
@@ -161,20 +233,71 @@ def resize_image_explicit(
         img_format: the target format of the image ("JPEG", "PNG", "WEBP"...)
         optimize: Should the resized image be optimized ?
     """
-    img_format = img_format.upper()
-    content = BytesIO()
-    # use the lanczos filter for antialiasing and discard the alpha channel
+    size = (size[0], size[1])
+    # if the image is a JPEG which isn't loaded yet,
+    # decode it directly at a lower resolution (but still large enough)
+    im.draft(None, size)
     if size != im.size:
-        im = im.resize((size[0], size[1]), Resampling.LANCZOS)
-    if img_format == "JPEG":
-        # converting an image with an alpha channel to jpeg would cause a crash
-        im = im.convert("RGB")
-    try:
-        im.save(fp=content, format=img_format, optimize=optimize)
-    except IOError:
-        PIL.ImageFile.MAXBLOCK = im.size[0] * im.size[1]
-        im.save(fp=content, format=img_format, optimize=optimize)
-    return ContentFile(content.getvalue())
+        # use the lanczos filter for antialiasing
+        im = im.resize(size, Resampling.LANCZOS)
+    return _save_image(im, img_format, optimize=optimize)
+
+
+class _ZipStream(RawIOBase):
+    """A write-only stream, whose content is emptied each time it's read."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buffer += b
+        return len(b)
+
+    def pop(self) -> bytes:
+        content = bytes(self._buffer)
+        self._buffer.clear()
+        return content
+
+
+def stream_zip(
+    files: Iterable[tuple[str, File, datetime]], chunk_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    """Generate a ZIP archive containing the given files, chunk by chunk.
+
+    The files are read chunk by chunk,
+    and each chunk is yielded as soon as it has been written in the archive,
+    so the memory usage stays constant, whatever the size of the archive.
+
+    The files are stored without compression,
+    as this is meant for files (like images) which are already compressed.
+
+    Args:
+        files: the files to put in the archive,
+            as (name in the archive, file, modification date) tuples
+        chunk_size: the size of the chunks the files are read by
+
+    Example:
+        ```python
+        response = StreamingHttpResponse(
+            stream_zip([("img.jpg", picture.file, picture.date)]),
+            content_type="application/zip",
+        )
+        ```
+    """
+    stream = _ZipStream()
+    with ZipFile(stream, mode="w", compression=ZIP_STORED) as archive:
+        for name, file, date in files:
+            info = ZipInfo(name, date_time=localtime(date).timetuple()[:6])
+            info.file_size = file.size
+            with file.open("rb") as src, archive.open(info, mode="w") as dest:
+                for chunk in src.chunks(chunk_size):
+                    dest.write(chunk)
+                    yield stream.pop()
+            yield stream.pop()
+    yield stream.pop()
 
 
 def get_client_ip(request: HttpRequest) -> str | None:
@@ -188,3 +311,55 @@ def get_client_ip(request: HttpRequest) -> str | None:
             return ip
 
     return None
+
+
+def cache_set_many_if_committed(values: dict[str, Any], timeout: float | None):
+    """Cache the given values, unless they may be rolled back.
+
+    Values computed inside a transaction may come from data
+    that will be rolled back, so they aren't cached.
+
+    Args:
+        values: the values to cache, by key
+        timeout: the timeout of the cache entries, in seconds
+    """
+    if values and not transaction.get_connection().in_atomic_block:
+        cache.set_many(values, timeout=timeout)
+
+
+def invalidate_now_and_on_commit(invalidate: Callable[[], Any]):
+    """Invalidate some cached data right away, then again on commit.
+
+    Invalidating the cache only right away isn't enough :
+    a concurrent request may cache the data again
+    before the current transaction is committed,
+    with the values of before the transaction.
+
+    Args:
+        invalidate: the function which invalidates the cached data
+
+    Example:
+        ```python
+        invalidate_now_and_on_commit(lambda: cache.delete("my_key"))
+        ```
+    """
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def cache_set_many_small(
+    values: dict[str, str | bytes], *, max_size: int, timeout: float | None
+):
+    """Cache the given values, except the ones bigger than `max_size`.
+
+    The big values are computed again each time they are needed,
+    in order to keep the cache entries small.
+
+    Args:
+        values: the values to cache, by key
+        max_size: the maximum length of a cached value
+        timeout: the timeout of the cache entries, in seconds
+    """
+    to_cache = {key: value for key, value in values.items() if len(value) <= max_size}
+    if to_cache:
+        cache.set_many(to_cache, timeout=timeout)
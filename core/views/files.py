@@ -13,6 +13,8 @@
 #
 #
 import mimetypes
+from collections.abc import Iterable
+from datetime import datetime
 from pathlib import Path
 from urllib.parse import quote, urljoin
 
@@ -22,9 +24,9 @@ from wsgiref.util import FileWrapper
 from django import forms
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.db.models import Exists, OuterRef
+from django.core.files import File
 from django.forms.models import modelform_factory
-from django.http import Http404, HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.utils.http import http_date
@@ -40,6 +42,8 @@ from core.auth.mixins import (
     can_view,
 )
 from core.models import Notification, SithFile, User
+from core.notifications import send_notifications
+from core.utils import stream_zip
 from core.views.mixins import AllowFragment
 from core.views.widgets.ajax_select import (
     AutoCompleteSelectMultipleGroup,
@@ -84,6 +88,34 @@ def send_raw_file(path: Path) -> HttpResponse:
         return response
 
 
+def send_zip(
+    files: Iterable[tuple[str, File, datetime]], filename: str
+) -> StreamingHttpResponse:
+    """Send a ZIP archive of the given files.
+
+    The archive is generated on the fly and streamed to the client,
+    thus it's never fully loaded in memory
+    (see [stream_zip][core.utils.stream_zip]).
+    The files that don't exist are skipped.
+
+    THIS DOESN'T CHECK ANY PERMISSIONS !
+    """
+    files = (
+        (name, file, date)
+        for name, file, date in files
+        if file and file.storage.exists(file.name)
+    )
+    return StreamingHttpResponse(
+        stream_zip(files),
+        content_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{quote(filename)}"',
+            # make the reverse proxy send the chunks as soon as they are generated
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 def send_file(
     request: HttpRequest,
     file_id: int | str,
@@ -175,18 +207,19 @@ class AddFilesForm(forms.Form):
                     % {"file_name": f, "msg": repr(e)},
                 )
         if notif:
-            unread_notif_subquery = Notification.objects.filter(
-                user=OuterRef("pk"), type="FILE_MODERATION", viewed=False
+            send_notifications(
+                (
+                    Notification(
+                        user=user,
+                        url=reverse("core:file_moderation"),
+                        type="FILE_MODERATION",
+                    )
+                    for user in User.objects.filter(
+                        groups__id__in=[settings.SITH_GROUP_COM_ADMIN_ID]
+                    )
+                ),
+                unless_unread=True,
             )
-            for user in User.objects.filter(
-                ~Exists(unread_notif_subquery),
-                groups__id__in=[settings.SITH_GROUP_COM_ADMIN_ID],
-            ):
-                Notification.objects.create(
-                    user=user,
-                    url=reverse("core:file_moderation"),
-                    type="FILE_MODERATION",
-                )
 
 
 class FileListView(ListView):
@@ -35,7 +35,7 @@ from django.contrib.auth.forms import PasswordChangeForm, SetPasswordForm
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.exceptions import PermissionDenied
-from django.db.models import DateField, F, QuerySet, Sum
+from django.db.models import DateField, QuerySet, Sum
 from django.db.models.functions import Trunc
 from django.forms.models import modelform_factory
 from django.http import Http404
@@ -379,24 +379,25 @@ class UserStatsView(UserTabsMixin, UserPassesTestMixin, DetailView):
     def get_context_data(self, **kwargs):
         kwargs = super().get_context_data(**kwargs)
 
+        # the stats are read from the daily rollups of the permanencies and sales
         kwargs["perm_time"] = list(
-            self.object.permanencies.filter(end__isnull=False, counter__type="BAR")
+            self.object.daily_permanencies.filter(counter__type="BAR")
             .values("counter", "counter__name")
-            .annotate(total=Sum(F("end") - F("start"), default=timedelta(seconds=0)))
+            .annotate(total=Sum("duration", default=timedelta(seconds=0)))
             .order_by("-total")
         )
         kwargs["total_perm_time"] = sum(
             [perm["total"] for perm in kwargs["perm_time"]], start=timedelta(seconds=0)
         )
         kwargs["purchase_sums"] = list(
-            self.object.customer.buyings.filter(counter__type="BAR")
+            self.object.customer.daily_sales.filter(counter__type="BAR")
             .values("counter", "counter__name")
-            .annotate(total=Sum(F("unit_price") * F("quantity")))
+            .annotate(total=Sum("amount"))
             .order_by("-total")
         )
         kwargs["total_purchases"] = sum(s["total"] for s in kwargs["purchase_sums"])
         kwargs["top_product"] = (
-            self.object.customer.buyings.values("product__name")
+            self.object.customer.daily_sales.values("product__name")
             .annotate(product_sum=Sum("quantity"))
             .order_by("-product_sum")
             .all()[:15]
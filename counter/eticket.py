@@ -0,0 +1,254 @@
+"""Generation of the PDF of the etickets.
+
+Etickets are downloaded again and again
+(mostly through the link sent by email, at the doors of the event),
+and generating a PDF with reportlab is quite expensive. Thus :
+
+- the parts of the PDF which are the same for all the sales of an eticket
+  (the images and the texts of the event) are prepared only once per process,
+  in an [EticketTemplate][counter.eticket.EticketTemplate] ;
+- the rendered PDF are cached.
+
+The cache key is a hash of everything that is printed on the ticket,
+so that a ticket never gets the PDF of its previous version
+(for example if the buyer changed their profile picture),
+without any need to invalidate anything.
+As the files keep the same name when they are replaced,
+the images are identified by the version of their row rather than by their name.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from importlib.metadata import version
+from io import BytesIO
+from typing import TYPE_CHECKING, NamedTuple, Self
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils.translation import gettext as _
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen.canvas import Canvas
+
+from core.utils import cache_set_many_small
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import date, datetime
+
+    from counter.models import Selling
+
+# increase this number each time the layout of the etickets is modified
+_LAYOUT_VERSION = 1
+_CACHE_PREFIX = f"eticket:{_LAYOUT_VERSION}:{version('reportlab')}"
+_IMG_DIR = settings.BASE_DIR / "core" / "static" / "core" / "img"
+
+
+class _Image(NamedTuple):
+    """A decoded image, with the size it must be drawn with."""
+
+    reader: ImageReader
+    width: float
+    height: float
+
+    @classmethod
+    def fit(cls, reader: ImageReader, size: float) -> Self:
+        """Scale the image so that its biggest side is `size` long."""
+        width, height = reader.getSize()
+        ratio = size / max(width, height)
+        return cls(reader, width * ratio, height * ratio)
+
+    def draw(self, p: Canvas, x: float, y: float):
+        p.drawImage(self.reader, x, y, self.width, self.height)
+
+
+@functools.cache
+def _static_image(name: str) -> ImageReader:
+    return ImageReader(str(_IMG_DIR / name))
+
+
+def _storage_image(name: str) -> ImageReader:
+    with default_storage.open(name, "rb") as f:
+        return ImageReader(BytesIO(f.read()))
+
+
+class EticketTemplate:
+    """The parts of a PDF which are common to all the sales of an eticket.
+
+    The images are decoded and laid out only once,
+    then each ticket is drawn on top of it.
+    Use [get_template][counter.eticket.get_template]
+    rather than instantiating this class directly,
+    in order to reuse the existing templates.
+    """
+
+    def __init__(
+        self, banner: str | None, event_title: str | None, event_date: date | None
+    ):
+        logo = _static_image("eticket.jpg")
+        self.logo = _Image.fit(logo, 8 * cm)
+        self.banner = _Image.fit(_storage_image(banner), 6 * cm) if banner else None
+        partners = _static_image("partners.png")
+        width, height = partners.getSize()
+        self.partners = _Image(partners, width * 2 / 3, height * 2 / 3)
+        self.event_title = event_title
+        self.event_date = event_date.strftime("%d %b %Y") if event_date else None
+
+    def draw(self, p: Canvas):
+        self.logo.draw(p, 10 * cm, 25 * cm)
+        if self.banner:
+            self.banner.draw(p, 1 * cm, 25 * cm)
+        if self.event_title:
+            p.setFont("Helvetica-Bold", 20)
+            p.drawCentredString(10.5 * cm, 23.6 * cm, self.event_title)
+        if self.event_date:
+            p.setFont("Helvetica-Bold", 16)
+            p.drawCentredString(10.5 * cm, 22.6 * cm, self.event_date)
+        self.partners.draw(p, 0, 0)
+
+
+@functools.lru_cache(maxsize=32)
+def get_template(
+    banner: str | None,
+    version: datetime,
+    event_title: str | None,
+    event_date: date | None,
+) -> EticketTemplate:
+    """Return the template of the etickets with the given event data.
+
+    The `version` of the eticket is only a part of the key of the cache,
+    so that a banner replaced by a file of the same name isn't reused.
+    """
+    return EticketTemplate(banner, event_title, event_date)
+
+
+@dataclass(frozen=True)
+class EticketContent:
+    """Everything that is printed on the eticket of a sale.
+
+    This only holds simple data (and not model instances),
+    so that the etickets can be rendered in other processes.
+    """
+
+    banner: str | None
+    """The name of the banner of the event in the storage."""
+    version: datetime
+    """The date of the last update of the eticket."""
+    event_title: str | None
+    event_date: date | None
+    picture: str | None
+    """The name of the profile picture of the buyer in the storage."""
+    picture_id: int | None
+    """The id of the profile picture, which changes at each upload."""
+    label: str
+    """The name of the buyer and the number of people the ticket is for."""
+    code: str
+    """The code printed (and put in the QR code) at the bottom of the ticket."""
+
+    @classmethod
+    def from_selling(cls, selling: Selling) -> Self:
+        eticket = selling.product.eticket
+        user = selling.customer.user
+        code = f"{user.id} {selling.product_id} {selling.id} {selling.quantity}"
+        code += " " + eticket.get_hash(code)[:8].upper()
+        return cls(
+            banner=eticket.banner.name or None,
+            version=eticket.updated_at,
+            event_title=eticket.event_title,
+            event_date=eticket.event_date,
+            picture=user.profile_pict.file.name if user.profile_pict else None,
+            picture_id=user.profile_pict_id,
+            label=f"{user.get_display_name()} : {selling.quantity} {_('people(s)')}",
+            code=code,
+        )
+
+    def get_cache_key(self) -> str:
+        return f"{_CACHE_PREFIX}:{hashlib.sha256(repr(self).encode()).hexdigest()}"
+
+    def render(self) -> bytes:
+        """Generate the PDF of the eticket."""
+        buffer = BytesIO()
+        # an invariant PDF doesn't contain its creation date,
+        # so that the same content always gives the same file
+        p = Canvas(buffer, invariant=True)
+        p.setTitle("Eticket")
+        get_template(self.banner, self.version, self.event_title, self.event_date).draw(
+            p
+        )
+        if self.picture:
+            picture = _Image.fit(_storage_image(self.picture), 150)
+            picture.draw(p, 10.5 * cm - picture.width / 2, 16 * cm)
+        p.setFont("Helvetica-Bold", 14)
+        p.drawCentredString(10.5 * cm, 15 * cm, self.label)
+        qrcode = QrCodeWidget(self.code)
+        x1, y1, x2, y2 = qrcode.getBounds()
+        d = Drawing(260, 260, transform=[260 / (x2 - x1), 0, 0, 260 / (y2 - y1), 0, 0])
+        d.add(qrcode)
+        renderPDF.draw(d, p, 10.5 * cm - 130, 6.1 * cm)
+        p.setFont("Courier-Bold", 14)
+        p.drawCentredString(10.5 * cm, 6 * cm, self.code)
+        p.showPage()
+        p.save()
+        return buffer.getvalue()
+
+
+def _cache_pdf(pdf_by_key: dict[str, bytes]):
+    cache_set_many_small(
+        pdf_by_key,
+        max_size=settings.SITH_ETICKET_CACHE_MAX_SIZE,
+        timeout=settings.SITH_ETICKET_CACHE_TIMEOUT.total_seconds(),
+    )
+
+
+def get_eticket_pdf(selling: Selling) -> bytes:
+    """Return the PDF of the eticket of the given sale, using the cache if possible."""
+    content = EticketContent.from_selling(selling)
+    key = content.get_cache_key()
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = content.render()
+        _cache_pdf({key: pdf})
+    return pdf
+
+
+def render_etickets(
+    sellings: Iterable[Selling], *, max_workers: int | None = None
+) -> int:
+    """Render the etickets of the given sales which aren't in cache yet.
+
+    The PDF are generated by a pool of processes,
+    then put in cache all at once.
+
+    Args:
+        sellings: the sales of the etickets to render.
+            The product, eticket, customer and profile picture
+            should be selected along with the sales.
+        max_workers: the number of processes which generate the PDF.
+            Defaults to the number of processors of the machine.
+
+    Returns:
+        The number of newly rendered etickets.
+    """
+    contents = {}
+    for selling in sellings:
+        content = EticketContent.from_selling(selling)
+        contents[content.get_cache_key()] = content
+    cached = cache.get_many(contents.keys())
+    missing = [(key, content) for key, content in contents.items() if key not in cached]
+    if not missing:
+        return 0
+    # with the spawn and forkserver start methods,
+    # the workers don't inherit the django setup of this process
+    with ProcessPoolExecutor(max_workers, initializer=django.setup) as executor:
+        rendered = executor.map(EticketContent.render, [c for _k, c in missing])
+        _cache_pdf({key: pdf for (key, _c), pdf in zip(missing, rendered, strict=True)})
+    return len(missing)
@@ -2,7 +2,7 @@ import json
 import math
 import uuid
 from collections import defaultdict
-from datetime import date, datetime, timezone
+from datetime import date
 from typing import ClassVar
 
 from dateutil.relativedelta import relativedelta
@@ -40,6 +40,7 @@ from counter.models import (
     Counter,
     CounterSellers,
     Customer,
+    DailySales,
     Eticket,
     InvoiceCall,
     Permanency,
@@ -49,7 +50,6 @@ from counter.models import (
     Refilling,
     ReturnableProduct,
     ScheduledProductAction,
-    Selling,
     StudentCard,
     get_product_actions,
 )
@@ -289,6 +289,7 @@ class CounterEditForm(forms.ModelForm):
             update_fields=["is_regular"],
             unique_fields=["user", "counter"],
         )
+        Counter.invalidate_bars_status()
 
     def save(self, commit=True):  # noqa: FBT002
         self.instance = super().save(commit=commit)
@@ -699,14 +700,14 @@ class InvoiceCallForm(forms.Form):
     def __init__(self, *args, month: date, **kwargs):
         super().__init__(*args, **kwargs)
         self.month = month
-        month_start = datetime(month.year, month.month, month.day, tzinfo=timezone.utc)
+        month_start = date(month.year, month.month, 1)
         self.clubs = list(
             Club.objects.filter(
                 Exists(
-                    Selling.objects.filter(
+                    DailySales.objects.filter(
                         club=OuterRef("pk"),
                         date__gte=month_start,
-                        date__lte=month_start + relativedelta(months=1),
+                        date__lt=month_start + relativedelta(months=1),
                     )
                 )
             ).annotate(
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from counter.models import Customer
+
+
+class Command(BaseCommand):
+    """Check that the amount of each AE account matches its operations.
+
+    Only the operations registered since the last run are scanned,
+    so this command is cheap enough to be automated with a cron task.
+    The first run, however, scans the whole history of each account.
+    """
+
+    help = "Check the amount of the AE accounts against their operations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Give their right amount to the accounts with a wrong amount",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = Customer.objects.reconcile_amount(fix=options["fix"])
+        if not mismatches:
+            self.stdout.write("All accounts are valid")
+            return
+        self.stdout.write(f"{len(mismatches)} accounts have a wrong amount")
+        if options["verbosity"] > 1:
+            self.stdout.write(
+                "\n".join(
+                    f"  - {customer_id} : {amount} € instead of {expected} €"
+                    for customer_id, (amount, expected) in mismatches.items()
+                )
+            )
+        if options["fix"]:
+            self.stdout.write("The accounts have been fixed")
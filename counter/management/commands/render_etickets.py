@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from counter.eticket import render_etickets
+from counter.models import Eticket, Selling
+
+
+class Command(BaseCommand):
+    """Render the PDF of all the sold etickets of some events, to put them in cache.
+
+    This is meant to be run a little before the doors of an event open,
+    so that the buyers get their ticket right away.
+    The PDF are generated by a pool of processes.
+
+    Note:
+        The tickets are rendered in the default language of the site.
+    """
+
+    help = "Put in cache the PDF of the sold etickets of some events"
+
+    def add_arguments(self, parser):
+        parser.add_argument("eticket_ids", nargs="+", type=int)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of processes generating the PDF "
+            "(defaults to the number of processors)",
+        )
+
+    def handle(self, *args, **options):
+        eticket_ids = options["eticket_ids"]
+        if Eticket.objects.filter(id__in=eticket_ids).count() != len(set(eticket_ids)):
+            raise CommandError("Some of the given etickets don't exist")
+        sellings = Selling.objects.filter(
+            product__eticket__id__in=eticket_ids, customer__isnull=False
+        ).select_related("product__eticket", "customer__user__profile_pict")
+        nb_rendered = render_etickets(sellings, max_workers=options["workers"])
+        self.stdout.write(f"{nb_rendered} etickets rendered")
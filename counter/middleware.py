@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING, Callable
 from django.http import HttpRequest, HttpResponse
 from django.utils.functional import SimpleLazyObject
 
-from core.models import User
+from core.models import User, UserGroupsSnapshot
 from counter.models import Permanency
 
 if TYPE_CHECKING:
@@ -35,6 +35,7 @@ def get_cached_barmen(request: HttpRequest) -> set[User]:
                 session[SESSION_PERMANENCES_KEY] = real_ids
 
             request._cached_barmen = {p.user for p in permanences}
+            UserGroupsSnapshot.prefetch(request._cached_barmen)
         else:
             request._cached_barmen = set()
 
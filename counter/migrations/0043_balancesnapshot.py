@@ -0,0 +1,48 @@
+# Generated by Django 5.2.15 on 2026-10-18 02:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import counter.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("counter", "0042_alter_customer_amount_alter_refilling_amount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BalanceSnapshot",
+            fields=[
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="balance_snapshot",
+                        serialize=False,
+                        to="counter.customer",
+                    ),
+                ),
+                (
+                    "amount",
+                    counter.fields.CurrencyField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=12,
+                        verbose_name="amount",
+                    ),
+                ),
+                ("last_refilling_id", models.PositiveIntegerField(default=0)),
+                ("last_selling_id", models.PositiveIntegerField(default=0)),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="updated at"),
+                ),
+            ],
+            options={
+                "verbose_name": "balance snapshot",
+            },
+        ),
+    ]
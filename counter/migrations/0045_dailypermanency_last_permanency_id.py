@@ -0,0 +1,29 @@
+# Generated by Django 5.2.15 on 2026-10-18 06:10
+
+from django.db import migrations, models
+from django.db.migrations.state import StateApps
+
+
+def clear_daily_permanencies(apps: StateApps, schema_editor):
+    # The rows were marked with the end of the permanencies,
+    # which doesn't tell which permanencies they cover.
+    # They will be computed again from scratch by the next task.
+    DailyPermanency = apps.get_model("counter", "DailyPermanency")
+    DailyPermanency.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [("counter", "0044_dailypermanency_dailysales")]
+
+    operations = [
+        migrations.RunPython(
+            clear_daily_permanencies, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.RemoveField(model_name="dailypermanency", name="last_end"),
+        migrations.AddField(
+            model_name="dailypermanency",
+            name="last_permanency_id",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.15 on 2026-10-18 06:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("counter", "0045_dailypermanency_last_permanency_id")]
+
+    operations = [
+        migrations.AddField(
+            model_name="eticket",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="updated at",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -16,20 +16,34 @@ from __future__ import annotations
 
 import base64
 import contextlib
+import hashlib
 import os
 import random
 import string
+from collections import defaultdict
 from datetime import date, datetime, timedelta
-from datetime import timezone as tz
 from decimal import Decimal
-from typing import Literal, Self
+from typing import TYPE_CHECKING, ClassVar, NamedTuple, Self
+from uuid import uuid4
 
 from dict2xml import dict2xml
 from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MinLengthValidator
-from django.db import models
-from django.db.models import Exists, F, Max, OuterRef, Q, QuerySet, Subquery, Sum, Value
-from django.db.models.functions import Coalesce, Concat, Length
+from django.db import models, transaction
+from django.db.models import (
+    Exists,
+    F,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce, Concat, Length, TruncDate
 from django.forms import ValidationError
 from django.urls import reverse
 from django.utils import timezone
@@ -41,13 +55,27 @@ from django_countries.fields import CountryField
 from ordered_model.models import OrderedModel
 from phonenumber_field.modelfields import PhoneNumberField
 
-from club.models import Club
+from club.models import Club, Membership
 from core.fields import ResizedImageField
 from core.models import Group, Notification, User
-from core.utils import get_start_of_semester
+from core.notifications import send_notifications
+from core.utils import (
+    cache_set_many_if_committed,
+    get_start_of_semester,
+    invalidate_now_and_on_commit,
+)
 from counter.fields import CurrencyField
 from subscription.models import Subscription
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+
+def _to_date(value: datetime | date) -> date:
+    if isinstance(value, datetime):
+        return timezone.localdate(value)
+    return value
+
 
 def get_eboutic() -> Counter:
     return Counter.objects.filter(type="EBOUTIC").order_by("id").first()
@@ -89,6 +117,190 @@ class CustomerQuerySet(models.QuerySet):
         )
         return self.update(amount=Coalesce(money_in - money_out, Decimal(0)))
 
+    def _compute_ledger(self, until: datetime) -> tuple[list[_LedgerLine], int, int]:
+        """Compute the balance of the selected customers from their operations.
+
+        Only the operations registered after the last
+        [BalanceSnapshot][counter.models.BalanceSnapshot] of each customer
+        are scanned (all of them if the customer has no snapshot yet),
+        with a single grouped aggregation on each operation table.
+
+        Args:
+            until: only the operations registered before this date
+                may be covered by the new snapshots.
+
+        Returns:
+            The ledger line of each customer, the id of the last refilling
+            and the id of the last sale that the new snapshots may cover.
+        """
+        last_refilling_id = Refilling.objects.filter(date__lt=until).aggregate(
+            res=Max("id", default=0)
+        )["res"]
+        last_selling_id = Selling.objects.filter(date__lt=until).aggregate(
+            res=Max("id", default=0)
+        )["res"]
+        customers = list(
+            self.values_list(
+                "pk",
+                "amount",
+                "balance_snapshot__amount",
+                "balance_snapshot__last_refilling_id",
+                "balance_snapshot__last_selling_id",
+            )
+        )
+        if not customers:
+            return [], last_refilling_id, last_selling_id
+        # Give a lower bound to the scanned ids, so that the db can use
+        # the primary key index instead of scanning the whole table.
+        # When all snapshots are taken together, it's the only bound that matters.
+        min_refilling_id = min(c[3] or 0 for c in customers)
+        min_selling_id = min(c[4] or 0 for c in customers)
+        # All the new operations are taken into account to check the amounts,
+        # but only the ones which are old enough are covered by the snapshots.
+        money_in = {
+            pk: (covered, total)
+            for pk, covered, total in Refilling.objects.filter(
+                Q(customer__balance_snapshot=None)
+                | Q(id__gt=F("customer__balance_snapshot__last_refilling_id")),
+                customer__in=self.values("pk"),
+                id__gt=min_refilling_id,
+            )
+            .values("customer_id")
+            .annotate(
+                covered=Sum(
+                    "amount", filter=Q(id__lte=last_refilling_id), default=Decimal(0)
+                ),
+                total=Sum("amount"),
+            )
+            .values_list("customer_id", "covered", "total")
+        }
+        price = F("unit_price") * F("quantity")
+        money_out = {
+            pk: (covered, total)
+            for pk, covered, total in Selling.objects.filter(
+                Q(customer__balance_snapshot=None)
+                | Q(id__gt=F("customer__balance_snapshot__last_selling_id")),
+                customer__in=self.values("pk"),
+                payment_method=Selling.PaymentMethod.SITH_ACCOUNT,
+                id__gt=min_selling_id,
+            )
+            .values("customer_id")
+            .annotate(
+                covered=Sum(price, filter=Q(id__lte=last_selling_id), default=0),
+                total=Sum(price),
+            )
+            .values_list("customer_id", "covered", "total")
+        }
+        ledger = []
+        for pk, amount, snapshot_amount, *_ids in customers:
+            covered_in, total_in = money_in.get(pk, (0, 0))
+            covered_out, total_out = money_out.get(pk, (0, 0))
+            base_amount = snapshot_amount or Decimal(0)
+            ledger.append(
+                _LedgerLine(
+                    customer_id=pk,
+                    amount=amount,
+                    expected_amount=base_amount + total_in - total_out,
+                    snapshot_amount=base_amount + covered_in - covered_out,
+                    has_snapshot=snapshot_amount is not None,
+                    has_new_operations=bool(covered_in or covered_out),
+                )
+            )
+        return ledger, last_refilling_id, last_selling_id
+
+    def reconcile_amount(
+        self, *, fix: bool = False, until: datetime | None = None
+    ) -> dict[int, tuple[Decimal, Decimal]]:
+        """Check the amount of the selected customers against their operations.
+
+        Unlike [update_amount][counter.models.CustomerQuerySet.update_amount],
+        this only rescans the operations registered since the last
+        [BalanceSnapshot][counter.models.BalanceSnapshot] of each customer,
+        which makes checking the whole `Customer` table cheap.
+        Once the check is done, the snapshots are moved forward,
+        up to the operations registered before `until`.
+
+        Args:
+            fix: give their right amount to the customers whose amount is wrong.
+            until: the operations registered after this date are checked,
+                but they aren't covered by the snapshots yet.
+                Defaults to `BalanceSnapshot.DELAY` ago.
+
+        Returns:
+            The customers whose amount doesn't match their operations,
+            as a dict `{customer_id: (amount, expected_amount)}`.
+        """
+        until = until or now() - BalanceSnapshot.DELAY
+        with transaction.atomic():
+            # lock the snapshots, in order not to miss an operation deletion
+            list(
+                BalanceSnapshot.objects.select_for_update()
+                .filter(customer__in=self.values("pk"))
+                .values_list("pk", flat=True)
+            )
+            ledger, last_refilling_id, last_selling_id = self._compute_ledger(until)
+            BalanceSnapshot.objects.filter(customer__in=self.values("pk")).update(
+                last_refilling_id=last_refilling_id, last_selling_id=last_selling_id
+            )
+            BalanceSnapshot.objects.bulk_create(
+                [
+                    BalanceSnapshot(
+                        customer_id=line.customer_id,
+                        amount=line.snapshot_amount,
+                        last_refilling_id=last_refilling_id,
+                        last_selling_id=last_selling_id,
+                    )
+                    for line in ledger
+                    if line.has_new_operations or not line.has_snapshot
+                ],
+                update_conflicts=True,
+                update_fields=["amount", "last_refilling_id", "last_selling_id"],
+                unique_fields=["customer"],
+                batch_size=1000,
+            )
+        mismatches = [line.customer_id for line in ledger if not line.is_valid]
+        if mismatches:
+            # Operations may have been registered while the ledger
+            # was being computed ; check again the concerned customers.
+            ledger = self.model.objects.filter(pk__in=mismatches)._compute_ledger(
+                until
+            )[0]
+        invalid_lines = [line for line in ledger if not line.is_valid]
+        if fix and invalid_lines:
+            with transaction.atomic():
+                # Lock the accounts, so that no operation can be registered
+                # between the computation of their amount and its update.
+                customers = self.model.objects.filter(
+                    pk__in=[line.customer_id for line in invalid_lines]
+                )
+                list(customers.select_for_update().values_list("pk", flat=True))
+                ledger = customers._compute_ledger(until)[0]
+                self.model.objects.bulk_update(
+                    [
+                        Customer(pk=line.customer_id, amount=line.expected_amount)
+                        for line in ledger
+                        if not line.is_valid
+                    ],
+                    fields=["amount"],
+                )
+        return {
+            line.customer_id: (line.amount, line.expected_amount)
+            for line in invalid_lines
+        }
+
+
+class _LedgerLine(NamedTuple):
+    customer_id: int
+    amount: Decimal
+    expected_amount: Decimal
+    snapshot_amount: Decimal
+    has_snapshot: bool
+    has_new_operations: bool
+
+    @property
+    def is_valid(self) -> bool:
+        return self.amount == self.expected_amount
+
 
 class Customer(models.Model):
     """Customer data of a User.
@@ -127,36 +339,76 @@ class Customer(models.Model):
 
     def update_returnable_balance(self):
         """Update all returnable balances of this user to their real amount."""
+        ReturnableProduct.objects.update_balances(customers=[self])
 
-        def purchases_qs(outer_ref: Literal["product_id", "returned_product_id"]):
-            return (
-                Selling.objects.filter(customer=self, product=OuterRef(outer_ref))
-                .values("product")
-                .annotate(quantity=Sum("quantity", default=0))
-                .values("quantity")
-            )
+    def purchase(
+        self, sales: Sequence[Selling], *, allow_negative: bool = False
+    ) -> list[Selling]:
+        """Register all the given sales of this customer at once.
 
-        balances = (
-            ReturnableProduct.objects.annotate_balance_for(self)
-            .annotate(
-                nb_cons=Coalesce(Subquery(purchases_qs("product_id")), 0),
-                nb_dcons=Coalesce(Subquery(purchases_qs("returned_product_id")), 0),
-            )
-            .annotate(new_balance=F("nb_cons") - F("nb_dcons"))
-            .values("id", "new_balance")
+        This applies the same business rules as `Selling.save`
+        (account balance, subscription products, notifications, etickets
+        and returnable products), but with a constant number of queries,
+        instead of several queries per sale :
+
+        - the account balance is updated once for the whole basket,
+        - the sales and their notifications are created with `bulk_create`,
+        - the returnable balances are updated once.
+
+        Args:
+            sales: the unsaved sales to register. Their customer must be this one.
+            allow_negative: allow the sales to use more money than available
+
+        Raises:
+            ValidationError: if one of the sales is invalid,
+                or if the customer doesn't have enough money.
+
+        Warning:
+            Call this inside a transaction, so that the account balance
+            isn't updated if the creation of the sales fails.
+        """
+        if not sales:
+            return []
+        sale_date = timezone.now()
+        # The existence of the foreign keys is checked by the db at insertion,
+        # checking it here would cost a query per key and per sale.
+        # However, those keys are nullable, so the required ones
+        # must be checked to be set.
+        relations = [f for f in Selling._meta.fields if f.is_relation]
+        required = [f for f in relations if not f.blank]
+        for sale in sales:
+            sale.customer = self
+            sale.date = sale.date or sale_date
+            sale.full_clean(exclude=[f.name for f in relations])
+            missing = {
+                f.name: f.error_messages["blank"]
+                for f in required
+                if getattr(sale, f.attname) is None
+            }
+            if missing:
+                raise ValidationError(missing)
+        self.amount -= sum(
+            sale.quantity * sale.unit_price
+            for sale in sales
+            if sale.payment_method == Selling.PaymentMethod.SITH_ACCOUNT
         )
-        updated_balances = [
-            ReturnableProductBalance(
-                customer=self, returnable_id=b["id"], balance=b["new_balance"]
-            )
-            for b in balances
-        ]
-        ReturnableProductBalance.objects.bulk_create(
-            updated_balances,
-            update_conflicts=True,
-            update_fields=["balance"],
-            unique_fields=["customer", "returnable"],
+        self.save(allow_negative=allow_negative, update_fields=["amount"])
+        if self.user.was_subscribed:
+            for sale in sales:
+                sale.create_subscription()
+        if self.user.preferences.notify_on_click:
+            send_notifications(sale.make_notification() for sale in sales)
+        sales = Selling.objects.bulk_create(sales)
+        eticket_products = set(
+            Eticket.objects.filter(
+                product_id__in={sale.product_id for sale in sales}
+            ).values_list("product_id", flat=True)
         )
+        for sale in sales:
+            if sale.product_id in eticket_products:
+                sale.send_mail_customer()
+        ReturnableProduct.objects.apply_sales(sales)
+        return sales
 
     @cached_property
     def can_buy(self) -> bool:
@@ -214,6 +466,59 @@ class Customer(models.Model):
         return f"https://{settings.SITH_URL}{self.get_absolute_url()}"
 
 
+class BalanceSnapshot(models.Model):
+    """The balance of a customer, given by its operations up to a certain point.
+
+    The snapshot covers all the refillings and sales of the customer
+    whose id is lower or equal to `last_refilling_id` and `last_selling_id`.
+    New operations don't need to update it, but the deletion of an operation
+    it covers does.
+
+    Snapshots are moved forward by
+    [CustomerQuerySet.reconcile_amount][counter.models.CustomerQuerySet.reconcile_amount].
+    """
+
+    customer = models.OneToOneField(
+        Customer,
+        primary_key=True,
+        related_name="balance_snapshot",
+        on_delete=models.CASCADE,
+    )
+    amount = CurrencyField(_("amount"), default=0)
+    last_refilling_id = models.PositiveIntegerField(default=0)
+    last_selling_id = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
+
+    DELAY: ClassVar[timedelta] = timedelta(minutes=5)
+    """The age an operation must have to be covered by a snapshot.
+
+    Ids are given before the operations are committed,
+    so an operation may become visible after another one with a greater id.
+    The snapshots only cover operations old enough
+    for their transaction to be over.
+    """
+
+    class Meta:
+        verbose_name = _("balance snapshot")
+
+    def __str__(self):
+        return f"{self.customer} : {self.amount} €"
+
+    @classmethod
+    def record_deletion(cls, operation: Refilling | Selling):
+        """Remove an operation being deleted from the snapshot that covers it."""
+        if isinstance(operation, Refilling):
+            cls.objects.filter(
+                customer_id=operation.customer_id,
+                last_refilling_id__gte=operation.id,
+            ).update(amount=F("amount") - operation.amount)
+        elif operation.payment_method == Selling.PaymentMethod.SITH_ACCOUNT:
+            cls.objects.filter(
+                customer_id=operation.customer_id,
+                last_selling_id__gte=operation.id,
+            ).update(amount=F("amount") + operation.quantity * operation.unit_price)
+
+
 class BillingInfo(models.Model):
     """Represent the billing information of a user, which are required
     by the 3D-Secure v2 system used by the etransaction module.
@@ -449,26 +754,43 @@ class Product(models.Model):
         ) or user.is_in_group(pk=settings.SITH_GROUP_COUNTER_ADMIN_ID)
 
 
+def get_buying_age(user: User) -> int:
+    """The age that is taken into account for the products this user can buy.
+
+    Users banned from alcohol are considered as minors.
+    """
+    if user.is_banned_alcohol:
+        return min(user.age, 17)
+    return user.age
+
+
 class PriceQuerySet(models.QuerySet):
-    def for_user(self, user: User) -> Self:
-        age = user.age
-        if user.is_banned_alcohol:
-            age = min(age, 17)
+    def for_groups(self, groups: Iterable[int | Group]) -> Self:
+        """Filter the prices of non-archived products available to the given groups.
+
+        Unlike [for_user][counter.models.PriceQuerySet.for_user],
+        the age limit of products isn't checked.
+        """
+        groups = list(groups)
         return self.filter(
-            Q(is_always_shown=True, groups__in=user.all_groups)
+            Q(is_always_shown=True, groups__in=groups)
             | Q(
                 id=Subquery(
                     Price.objects.filter(
-                        product_id=OuterRef("product_id"), groups__in=user.all_groups
+                        product_id=OuterRef("product_id"), groups__in=groups
                     )
                     .order_by("amount")
                     .values("id")[:1]
                 )
             ),
             product__archived=False,
-            product__limit_age__lte=age,
         ).distinct()
 
+    def for_user(self, user: User) -> Self:
+        return self.for_groups(user.groups_snapshot.group_ids).filter(
+            product__limit_age__lte=get_buying_age(user)
+        )
+
 
 class Price(models.Model):
     amount = CurrencyField(_("amount"))
@@ -578,19 +900,80 @@ class CounterQuerySet(models.QuerySet):
             )
         )
 
+    def viewable_by(self, user: User) -> Self:
+        """Filter the counters this user can view.
+
+        This is the queryset counterpart of `user.can_view(counter)` :
+        bars are visible to everyone, and other counters
+        only to root users, counter admins, the sellers of the counter,
+        the board of the club and the users in its view or edit groups.
+        """
+        if user.is_root or user.is_in_group(pk=settings.SITH_GROUP_COUNTER_ADMIN_ID):
+            return self.all()
+        if user.is_anonymous:
+            public = Counter.view_groups.through.objects.filter(
+                counter_id=OuterRef("pk"), group_id=settings.SITH_GROUP_PUBLIC_ID
+            )
+            return self.filter(Q(type="BAR") | Exists(public))
+        groups = list(user.groups_snapshot.group_ids)
+        in_groups = Counter.view_groups.through.objects.filter(
+            counter_id=OuterRef("pk"), group_id__in=groups
+        )
+        in_edit_groups = Counter.edit_groups.through.objects.filter(
+            counter_id=OuterRef("pk"), group_id__in=groups
+        )
+        is_seller = CounterSellers.objects.filter(counter_id=OuterRef("pk"), user=user)
+        is_president = Membership.objects.ongoing().filter(
+            club_id=OuterRef("club_id"), user=user, role__is_presidency=True
+        )
+        return self.filter(
+            Q(type="BAR")
+            | Q(club__board_group_id__in=groups)
+            | Exists(in_groups)
+            | Exists(in_edit_groups)
+            | Exists(is_seller)
+            | Exists(is_president)
+        )
+
     def handle_timeout(self) -> int:
         """Disconnect the barmen who are inactive in the given counters.
 
+        This is done periodically on all the counters by the
+        [close_inactive_permanencies][counter.tasks.close_inactive_permanencies]
+        task.
+
         Returns:
             The number of affected rows (ie, the number of timeouted permanences)
         """
         timeout = timezone.now() - timedelta(minutes=settings.SITH_BARMAN_TIMEOUT)
-        return Permanency.objects.filter(
+        nb_rows = Permanency.objects.filter(
             counter__in=self, end=None, activity__lt=timeout
         ).update(end=F("activity"))
+        if nb_rows:
+            Counter.invalidate_bars_status()
+        return nb_rows
+
+
+class BarStatus(NamedTuple):
+    """The state of a bar, as displayed in the header of every page."""
+
+    id: int
+    name: str
+    is_open: bool
+    seller_ids: frozenset[int]
+    """The ids of the users who are allowed to be barmen in this bar."""
+
+    def __str__(self):
+        return self.name
 
 
 class Counter(models.Model):
+    PRICES_CACHE_TIMEOUT = 60 * 60 * 24
+    """How long (in seconds) the price catalogues of a counter are cached."""
+    BARS_STATUS_CACHE_KEY = "counter:bars_status"
+    BARS_STATUS_CACHE_TIMEOUT = 60 * 60 * 24
+    """How long (in seconds) the state of the bars is cached."""
+
     name = models.CharField(_("name"), max_length=30)
     club = models.ForeignKey(
         Club, related_name="counters", verbose_name=_("club"), on_delete=models.CASCADE
@@ -677,24 +1060,33 @@ class Counter(models.Model):
         ae = Club.objects.get(id=settings.SITH_MAIN_CLUB_ID)
         return any(ae.get_membership_for(barman) for barman in self.barmen_list)
 
-    def get_top_barmen(self) -> QuerySet:
-        """Return a QuerySet querying the office hours stats of all the barmen of all time
-        of this counter, ordered by descending number of hours.
+    def get_top_barmen(self, since: datetime | date | None = None) -> QuerySet:
+        """Return a QuerySet querying the office hours stats of the barmen
+        of this counter since the specified date (by default, of all time),
+        ordered by descending number of hours.
 
         Each element of the QuerySet corresponds to a barman and has the following data :
             - the full name (first name + last name) of the barman
             - the nickname of the barman
             - the promo of the barman
             - the total number of office hours the barman did attend
+
+        The stats are read from the [DailyPermanency][counter.models.DailyPermanency]
+        rollup, thus the most recent permanencies may not be counted yet.
+
+        Args:
+            since: date from which to perform the calculation
         """
+        permanencies = DailyPermanency.objects.filter(counter=self).exclude(user=None)
+        if since is not None:
+            permanencies = permanencies.filter(date__gte=_to_date(since))
         name_expr = Concat(F("user__first_name"), Value(" "), F("user__last_name"))
         return (
-            self.permanencies.exclude(end=None)
-            .annotate(
+            permanencies.annotate(
                 name=name_expr, nickname=F("user__nick_name"), promo=F("user__promo")
             )
             .values("user", "name", "nickname", "promo")
-            .annotate(perm_sum=Sum(F("end") - F("start")))
+            .annotate(perm_sum=Sum("duration"))
             .exclude(perm_sum=None)
             .order_by("-perm_sum")
         )
@@ -709,18 +1101,20 @@ class Counter(models.Model):
         - the nickname of the customer
         - the amount of money spent by the customer
 
+        The stats are read from the [DailySales][counter.models.DailySales] rollup,
+        thus the most recent sales may not be counted yet.
+
         Args:
-            since: timestamp from which to perform the calculation
+            since: date from which to perform the calculation
         """
         if since is None:
             since = get_start_of_semester()
-        if isinstance(since, date):
-            since = datetime(since.year, since.month, since.day, tzinfo=tz.utc)
         name_expr = Concat(
             F("customer__user__first_name"), Value(" "), F("customer__user__last_name")
         )
         return (
-            self.sellings.filter(date__gte=since)
+            DailySales.objects.filter(counter=self, date__gte=_to_date(since))
+            .exclude(customer=None)
             .annotate(
                 name=name_expr,
                 nickname=F("customer__user__nick_name"),
@@ -728,11 +1122,7 @@ class Counter(models.Model):
                 user=F("customer__user"),
             )
             .values("user", "promo", "name", "nickname")
-            .annotate(
-                selling_sum=Sum(
-                    F("unit_price") * F("quantity"), output_field=CurrencyField()
-                )
-            )
+            .annotate(selling_sum=Sum("amount"))
             .filter(selling_sum__gt=0)
             .order_by("-selling_sum")
         )
@@ -741,24 +1131,20 @@ class Counter(models.Model):
         """Compute and return the total turnover of this counter since the given date.
 
         By default, the date is the start of the current semester.
+        The total is read from the [DailySales][counter.models.DailySales] rollup,
+        thus the most recent sales may not be counted yet.
 
         Args:
-            since: timestamp from which to perform the calculation
+            since: date from which to perform the calculation
 
         Returns:
             Total revenue earned at this counter.
         """
         if since is None:
             since = get_start_of_semester()
-        if isinstance(since, date):
-            since = datetime(since.year, since.month, since.day, tzinfo=tz.utc)
-        return self.sellings.filter(date__gte=since).aggregate(
-            total=Sum(
-                F("quantity") * F("unit_price"),
-                default=0,
-                output_field=CurrencyField(),
-            )
-        )["total"]
+        return DailySales.objects.filter(
+            counter=self, date__gte=_to_date(since)
+        ).aggregate(total=Sum("amount", default=0))["total"]
 
     def customer_is_barman(self, customer: Customer | User) -> bool:
         """Check if this counter is a `bar` and if the customer is currently logged in.
@@ -778,6 +1164,90 @@ class Counter(models.Model):
             .prefetch_related("groups")
         )
 
+    @staticmethod
+    def _prices_version_key(counter_id: int) -> str:
+        return f"counter:{counter_id}:prices_version"
+
+    @classmethod
+    def invalidate_prices_cache(cls, counter_ids: Iterable[int]):
+        """Invalidate the cached price catalogues of the given counters.
+
+        This doesn't delete the cached catalogues (there is one by set of groups),
+        but changes the version of the counter catalogue,
+        so that the next call to
+        [get_cached_prices_for][counter.models.Counter.get_cached_prices_for]
+        fetches fresh prices.
+        """
+        versions = {
+            cls._prices_version_key(counter_id): uuid4().hex
+            for counter_id in counter_ids
+        }
+        if versions:
+            cache.set_many(versions, timeout=None)
+
+    @classmethod
+    def get_bars_status(cls) -> list[BarStatus]:
+        """Return the state of all the bars.
+
+        The states are the same for all the users,
+        so they are computed once and cached until a bar opens or closes,
+        or until its sellers change (see `counter/signals.py`).
+        Thus, the header of the site usually doesn't query the bars.
+        """
+        bars: list[BarStatus] | None = cache.get(cls.BARS_STATUS_CACHE_KEY)
+        if bars is not None:
+            return bars
+        sellers = defaultdict(set)
+        for counter_id, user_id in CounterSellers.objects.filter(
+            counter__type="BAR"
+        ).values_list("counter_id", "user_id"):
+            sellers[counter_id].add(user_id)
+        bars = [
+            BarStatus(bar.id, bar.name, bar.is_open, frozenset(sellers[bar.id]))
+            for bar in cls.objects.filter(type="BAR").annotate_is_open().order_by("id")
+        ]
+        cache_set_many_if_committed(
+            {cls.BARS_STATUS_CACHE_KEY: bars}, timeout=cls.BARS_STATUS_CACHE_TIMEOUT
+        )
+        return bars
+
+    @classmethod
+    def invalidate_bars_status(cls):
+        """Invalidate the cached state of the bars."""
+        invalidate_now_and_on_commit(lambda: cache.delete(cls.BARS_STATUS_CACHE_KEY))
+
+    def get_cached_prices_for(self, customer: Customer) -> list[Price]:
+        """Return the same prices as `get_prices_for`, using a cached catalogue.
+
+        The catalogue is cached by counter and by set of groups of the customer,
+        and is invalidated every time one of the products of the counter
+        or one of its prices changes (see `counter/signals.py`).
+        Once the catalogue is cached, getting the prices
+        doesn't query the `Price`, `Product` and `ProductType` tables.
+        """
+        user = customer.user
+        group_ids = sorted(user.groups_snapshot.group_ids)
+        version_key = self._prices_version_key(self.id)
+        version = cache.get(version_key)
+        if version is None:
+            version = uuid4().hex
+            cache.set(version_key, version, timeout=None)
+        groups_hash = hashlib.md5(",".join(map(str, group_ids)).encode()).hexdigest()
+        cache_key = f"counter:{self.id}:prices:{version}:{groups_hash}"
+        prices: list[Price] | None = cache.get(cache_key)
+        if prices is None:
+            prices = list(
+                Price.objects.filter(
+                    product__counters=self, product__product_type__isnull=False
+                )
+                .for_groups(group_ids)
+                .select_related("product", "product__product_type")
+                .prefetch_related("groups")
+            )
+            cache.set(cache_key, prices, timeout=self.PRICES_CACHE_TIMEOUT)
+        age = get_buying_age(user)
+        return [p for p in prices if p.product.limit_age <= age]
+
 
 class CounterSellers(models.Model):
     """Custom through model for the counter-sellers M2M relationship."""
@@ -861,7 +1331,7 @@ class Refilling(models.Model):
             self.customer.amount += self.amount
             self.customer.save()
         if self.customer.user.preferences.notify_on_refill:
-            Notification(
+            notif = Notification(
                 user=self.customer.user,
                 url=reverse(
                     "core:user_account_detail",
@@ -873,7 +1343,8 @@ class Refilling(models.Model):
                 ),
                 param=str(self.amount),
                 type="REFILLING",
-            ).save()
+            )
+            send_notifications([notif])
         super().save(*args, **kwargs)
 
     def is_owned_by(self, user):
@@ -892,6 +1363,7 @@ class Refilling(models.Model):
     def delete(self, *args, **kwargs):
         self.customer.amount -= self.amount
         self.customer.save()
+        BalanceSnapshot.record_deletion(self)
         super().delete(*args, **kwargs)
 
 
@@ -976,70 +1448,57 @@ class Selling(models.Model):
             self.customer.save(allow_negative=allow_negative)
         user = self.customer.user
         if user.was_subscribed:
-            if (
-                self.product
-                and self.product.id == settings.SITH_PRODUCT_SUBSCRIPTION_ONE_SEMESTER
-            ):
-                sub = Subscription(
-                    member=user,
-                    subscription_type="un-semestre",
-                    payment_method="EBOUTIC",
-                    location="EBOUTIC",
-                )
-                sub.subscription_start = Subscription.compute_start()
-                sub.subscription_start = Subscription.compute_start(
-                    duration=settings.SITH_SUBSCRIPTIONS[sub.subscription_type][
-                        "duration"
-                    ]
-                )
-                sub.subscription_end = Subscription.compute_end(
-                    duration=settings.SITH_SUBSCRIPTIONS[sub.subscription_type][
-                        "duration"
-                    ],
-                    start=sub.subscription_start,
-                )
-                sub.save()
-            elif (
-                self.product
-                and self.product.id == settings.SITH_PRODUCT_SUBSCRIPTION_TWO_SEMESTERS
-            ):
-                sub = Subscription(
-                    member=user,
-                    subscription_type="deux-semestres",
-                    payment_method="EBOUTIC",
-                    location="EBOUTIC",
-                )
-                sub.subscription_start = Subscription.compute_start()
-                sub.subscription_start = Subscription.compute_start(
-                    duration=settings.SITH_SUBSCRIPTIONS[sub.subscription_type][
-                        "duration"
-                    ]
-                )
-                sub.subscription_end = Subscription.compute_end(
-                    duration=settings.SITH_SUBSCRIPTIONS[sub.subscription_type][
-                        "duration"
-                    ],
-                    start=sub.subscription_start,
-                )
-                sub.save()
+            self.create_subscription()
         if user.preferences.notify_on_click:
-            Notification(
-                user=user,
-                url=reverse(
-                    "core:user_account_detail",
-                    kwargs={
-                        "user_id": user.id,
-                        "year": self.date.year,
-                        "month": self.date.month,
-                    },
-                ),
-                param="%d x %s" % (self.quantity, self.label),
-                type="SELLING",
-            ).save()
+            send_notifications([self.make_notification()])
         super().save(*args, **kwargs)
         if hasattr(self.product, "eticket"):
             self.send_mail_customer()
 
+    def create_subscription(self) -> Subscription | None:
+        """Create the subscription bought with this sale, if any.
+
+        Returns:
+            The created subscription if the sold product is a subscription,
+            else None.
+        """
+        subscription_types = {
+            settings.SITH_PRODUCT_SUBSCRIPTION_ONE_SEMESTER: "un-semestre",
+            settings.SITH_PRODUCT_SUBSCRIPTION_TWO_SEMESTERS: "deux-semestres",
+        }
+        if not self.product or self.product.id not in subscription_types:
+            return None
+        sub = Subscription(
+            member=self.customer.user,
+            subscription_type=subscription_types[self.product.id],
+            payment_method="EBOUTIC",
+            location="EBOUTIC",
+        )
+        duration = settings.SITH_SUBSCRIPTIONS[sub.subscription_type]["duration"]
+        sub.subscription_start = Subscription.compute_start(duration=duration)
+        sub.subscription_end = Subscription.compute_end(
+            duration=duration, start=sub.subscription_start
+        )
+        sub.save()
+        return sub
+
+    def make_notification(self) -> Notification:
+        """Build (without saving it) the notification of this sale for the customer."""
+        user = self.customer.user
+        return Notification(
+            user=user,
+            url=reverse(
+                "core:user_account_detail",
+                kwargs={
+                    "user_id": user.id,
+                    "year": self.date.year,
+                    "month": self.date.month,
+                },
+            ),
+            param="%d x %s" % (self.quantity, self.label),
+            type="SELLING",
+        )
+
     def is_owned_by(self, user: User) -> bool:
         if user.is_anonymous:
             return False
@@ -1058,6 +1517,8 @@ class Selling(models.Model):
         if self.payment_method == Selling.PaymentMethod.SITH_ACCOUNT:
             self.customer.amount += self.quantity * self.unit_price
             self.customer.save()
+            BalanceSnapshot.record_deletion(self)
+        DailySales.record_deletion(self)
         super().delete(*args, **kwargs)
         self.customer.update_returnable_balance()
 
@@ -1139,6 +1600,263 @@ class Permanency(models.Model):
         return self.end - self.start
 
 
+class DailyRollup(models.Model):
+    """Base class for the tables summing up some operations day by day.
+
+    Aggregating the whole history of operations (sales, permanencies...)
+    every time some statistics are displayed is very slow.
+    Instead, the operations are summed up in rollup tables,
+    with a row for each day and each combination of `KEY_FIELDS`,
+    so that statistics are computed on a lot fewer rows.
+
+    The rollups are fed incrementally by the
+    [update_daily_stats][counter.tasks.update_daily_stats] task :
+    each row remembers the last operation it covers (`MARK_FIELD`),
+    and only the operations after the last covered one are aggregated
+    and added to the existing rows.
+
+    Warning:
+        Only new operations are taken into account.
+        If an operation is modified after having been summed up,
+        the rollup won't be updated.
+        In this case, delete all the rows of the rollup,
+        and they will be computed again from scratch by the next task.
+    """
+
+    KEY_FIELDS: ClassVar[list[str]]
+    """The fields identifying a row, in addition to the date."""
+    SUM_FIELDS: ClassVar[list[str]]
+    """The fields holding the sums of the operations."""
+    MARK_FIELD: ClassVar[str]
+    """The field holding the last operation covered by a row."""
+
+    DELAY: ClassVar[timedelta] = timedelta(minutes=5)
+    """The age an operation must have to be summed up.
+
+    Operations are committed a few moments after their date has been set,
+    so the most recent ones may not be visible yet when the rollup is updated.
+    If they were skipped, they would never be taken into account.
+    """
+
+    date = models.DateField(_("date"), db_index=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def _merge(cls, rows: Iterable[dict]):
+        """Add the given aggregated operations to the existing rows.
+
+        Each row must contain the `date`, and the `KEY_FIELDS`,
+        `SUM_FIELDS` and `MARK_FIELD` of the rollup.
+        """
+        fields = ["date", *cls.KEY_FIELDS]
+        new = {tuple(row[f] for f in fields): row for row in rows}
+        if not new:
+            return
+        existing = {
+            tuple(getattr(obj, f) for f in fields): obj
+            for obj in cls.objects.filter(
+                date__in={row["date"] for row in new.values()}
+            )
+        }
+        to_create = []
+        for key, row in new.items():
+            obj = existing.get(key)
+            if obj is None:
+                to_create.append(cls(**row))
+                continue
+            for field in cls.SUM_FIELDS:
+                setattr(obj, field, getattr(obj, field) + row[field])
+            setattr(obj, cls.MARK_FIELD, row[cls.MARK_FIELD])
+        updated = [existing[key] for key in new if key in existing]
+        cls.objects.bulk_update(updated, fields=[*cls.SUM_FIELDS, cls.MARK_FIELD])
+        cls.objects.bulk_create(to_create)
+
+
+class DailySales(DailyRollup):
+    """The sales of each day, by counter, club, product, customer and payment method."""
+
+    KEY_FIELDS = [
+        "counter_id",
+        "club_id",
+        "product_id",
+        "customer_id",
+        "payment_method",
+    ]
+    SUM_FIELDS = ["quantity", "amount"]
+    MARK_FIELD = "last_selling_id"
+
+    BATCH_SIZE: ClassVar[int] = 100_000
+    """The maximum number of sales aggregated at once."""
+
+    counter = models.ForeignKey(
+        Counter, related_name="+", null=True, on_delete=models.SET_NULL
+    )
+    club = models.ForeignKey(
+        Club, related_name="+", null=True, on_delete=models.SET_NULL
+    )
+    product = models.ForeignKey(
+        Product, related_name="+", null=True, on_delete=models.SET_NULL
+    )
+    customer = models.ForeignKey(
+        Customer, related_name="daily_sales", null=True, on_delete=models.SET_NULL
+    )
+    payment_method = models.PositiveSmallIntegerField(
+        _("payment method"), choices=Selling.PaymentMethod
+    )
+    quantity = models.IntegerField(_("quantity"))
+    amount = CurrencyField(_("amount"))
+    last_selling_id = models.PositiveIntegerField(db_index=True)
+
+    class Meta:
+        verbose_name = _("daily sales")
+        verbose_name_plural = _("daily sales")
+
+    def __str__(self):
+        return f"{self.date} : {self.quantity} x {self.product_id} ({self.amount} €)"
+
+    @classmethod
+    def update_from_sales(cls, until: datetime | None = None):
+        """Sum up the sales which aren't covered by the rollup yet.
+
+        Args:
+            until: only the sales registered before this date are summed up.
+                Defaults to `DELAY` ago.
+        """
+        until = until or now() - cls.DELAY
+        last_id = cls.objects.aggregate(res=Max("last_selling_id", default=0))["res"]
+        # The rollup advances on the ids of the sales, so it's bounded on ids too.
+        # Bounding it on the dates would skip forever a sale
+        # with a later date than a sale with a greater id.
+        until_id = Selling.objects.filter(date__lt=until).aggregate(
+            res=Max("id", default=0)
+        )["res"]
+        sales = Selling.objects.filter(id__lte=until_id)
+        while sales.filter(id__gt=last_id).exists():
+            batch = sales.filter(id__gt=last_id)
+            batch_end = (
+                batch.order_by("id")
+                .values_list("id", flat=True)[cls.BATCH_SIZE - 1 : cls.BATCH_SIZE]
+                .first()
+            )
+            if batch_end is not None:
+                batch = batch.filter(id__lte=batch_end)
+            rows = (
+                batch.values(
+                    "counter_id",
+                    "club_id",
+                    "product_id",
+                    "customer_id",
+                    "payment_method",
+                    day=TruncDate("date"),
+                )
+                .annotate(
+                    sum_quantity=Sum("quantity"),
+                    sum_amount=Sum(F("quantity") * F("unit_price")),
+                    max_id=Max("id"),
+                )
+                .order_by()
+            )
+            with transaction.atomic():
+                cls._merge(
+                    {
+                        "date": row["day"],
+                        **{field: row[field] for field in cls.KEY_FIELDS},
+                        "quantity": row["sum_quantity"],
+                        "amount": row["sum_amount"],
+                        "last_selling_id": row["max_id"],
+                    }
+                    for row in rows
+                )
+            if batch_end is None:
+                return
+            last_id = batch_end
+
+    @classmethod
+    def record_deletion(cls, sale: Selling):
+        """Remove a sale being deleted from the row that covers it."""
+        cls.objects.filter(
+            date=timezone.localdate(sale.date),
+            counter_id=sale.counter_id,
+            club_id=sale.club_id,
+            product_id=sale.product_id,
+            customer_id=sale.customer_id,
+            payment_method=sale.payment_method,
+            last_selling_id__gte=sale.id,
+        ).update(
+            quantity=F("quantity") - sale.quantity,
+            amount=F("amount") - sale.quantity * sale.unit_price,
+        )
+
+
+class DailyPermanency(DailyRollup):
+    """The time spent by each barman on each counter, for each day.
+
+    Permanencies are counted on the day they started, once they have ended.
+    """
+
+    KEY_FIELDS = ["counter_id", "user_id"]
+    SUM_FIELDS = ["duration"]
+    MARK_FIELD = "last_permanency_id"
+
+    counter = models.ForeignKey(
+        Counter, related_name="+", null=True, on_delete=models.SET_NULL
+    )
+    user = models.ForeignKey(
+        User, related_name="daily_permanencies", null=True, on_delete=models.SET_NULL
+    )
+    duration = models.DurationField(_("duration"))
+    last_permanency_id = models.PositiveIntegerField(db_index=True)
+
+    class Meta:
+        verbose_name = _("daily permanency")
+        verbose_name_plural = _("daily permanencies")
+
+    def __str__(self):
+        return f"{self.date} : {self.user_id} ({self.duration})"
+
+    @classmethod
+    def update_from_permanencies(cls, until: datetime | None = None):
+        """Sum up the ended permanencies which aren't covered by the rollup yet.
+
+        The permanencies are covered in the order of their ids,
+        up to the first one which isn't over :
+        an ongoing permanency holds back the ones which started after it,
+        until it ends.
+        The end of the permanencies can't be used to find the new ones,
+        because a permanency closed for inactivity ends
+        at the last activity of its barman, which is already in the past.
+
+        Args:
+            until: only the permanencies which started and ended
+                before this date are summed up. Defaults to `DELAY` ago.
+        """
+        until = until or now() - cls.DELAY
+        last_id = cls.objects.aggregate(res=Max("last_permanency_id", default=0))["res"]
+        permanencies = Permanency.objects.filter(id__gt=last_id)
+        first_ongoing_id = permanencies.filter(
+            Q(end=None) | Q(end__gte=until) | Q(start__gte=until)
+        ).aggregate(res=Min("id"))["res"]
+        if first_ongoing_id is not None:
+            permanencies = permanencies.filter(id__lt=first_ongoing_id)
+        rows = (
+            permanencies.values("counter_id", "user_id", day=TruncDate("start"))
+            .annotate(sum_duration=Sum(F("end") - F("start")), max_id=Max("id"))
+            .order_by()
+        )
+        with transaction.atomic():
+            cls._merge(
+                {
+                    "date": row["day"],
+                    **{field: row[field] for field in cls.KEY_FIELDS},
+                    "duration": row["sum_duration"],
+                    "last_permanency_id": row["max_id"],
+                }
+                for row in rows
+            )
+
+
 class CashRegisterSummary(models.Model):
     user = models.ForeignKey(
         User,
@@ -1258,6 +1976,7 @@ class Eticket(models.Model):
         _("event title"), max_length=64, null=True, blank=True
     )
     secret = models.CharField(_("secret"), max_length=64, unique=True)
+    updated_at = models.DateTimeField(_("updated at"), auto_now=True)
 
     def __str__(self):
         return self.product.name
@@ -1343,6 +2062,124 @@ class ReturnableProductQuerySet(models.QuerySet):
             )
         )
 
+    def update_balances(
+        self, customers: Iterable[Customer | int] | CustomerQuerySet | None = None
+    ) -> int:
+        """Update the balances of the selected returnable products to their real amount.
+
+        The purchases of all the concerned products are counted
+        with a single aggregation over `Selling`, grouped by customer and product,
+        then all the balances that changed are updated at once.
+
+        Args:
+            customers: the customers whose balances must be updated.
+                If None, the balances of all customers are updated.
+
+        Returns:
+            The number of updated balances.
+        """
+        returnables = list(self.values_list("id", "product_id", "returned_product_id"))
+        if not returnables:
+            return 0
+        cons = {product_id: pk for pk, product_id, _returned in returnables}
+        dcons = {returned_id: pk for pk, _product, returned_id in returnables}
+        sales = Selling.objects.filter(
+            product_id__in=[*cons, *dcons], customer__isnull=False
+        )
+        old_balances = ReturnableProductBalance.objects.filter(
+            returnable_id__in=[r[0] for r in returnables]
+        )
+        if customers is not None:
+            sales = sales.filter(customer__in=customers)
+            old_balances = old_balances.filter(customer__in=customers)
+        new_balances: dict[tuple[int, int], int] = defaultdict(int)
+        for customer_id, product_id, quantity in (
+            sales.values("customer_id", "product_id")
+            .annotate(quantity=Sum("quantity"))
+            .values_list("customer_id", "product_id", "quantity")
+        ):
+            if product_id in cons:
+                new_balances[customer_id, cons[product_id]] += quantity
+            if product_id in dcons:
+                new_balances[customer_id, dcons[product_id]] -= quantity
+        old_balances = {
+            (customer_id, returnable_id): balance
+            for customer_id, returnable_id, balance in old_balances.values_list(
+                "customer_id", "returnable_id", "balance"
+            )
+        }
+        # balances whose sales have all been deleted must go back to zero
+        new_balances.update(dict.fromkeys(old_balances.keys() - new_balances, 0))
+        updates = [
+            ReturnableProductBalance(
+                customer_id=customer_id, returnable_id=returnable_id, balance=balance
+            )
+            for (customer_id, returnable_id), balance in new_balances.items()
+            if old_balances.get((customer_id, returnable_id)) != balance
+        ]
+        ReturnableProductBalance.objects.bulk_create(
+            updates,
+            update_conflicts=True,
+            update_fields=["balance"],
+            unique_fields=["customer", "returnable"],
+            batch_size=1000,
+        )
+        return len(updates)
+
+    def apply_sales(self, sales: Iterable[Selling]):
+        """Apply the given sales to the balances of the selected returnable products.
+
+        Contrary to [update_balances][counter.models.ReturnableProductQuerySet.update_balances],
+        this doesn't scan the purchase history of the customers:
+        only the quantities of the given sales are added to
+        (or removed from) the current balances.
+        Use this right after new sales have been registered.
+        """
+        quantities: dict[tuple[int, int], int] = defaultdict(int)
+        for sale in sales:
+            if sale.customer_id is not None and sale.product_id is not None:
+                quantities[sale.customer_id, sale.product_id] += sale.quantity
+        product_ids = {product_id for _customer, product_id in quantities}
+        returnables = list(
+            self.filter(
+                Q(product_id__in=product_ids) | Q(returned_product_id__in=product_ids)
+            ).values_list("id", "product_id", "returned_product_id")
+        )
+        if not returnables:
+            return
+        deltas: dict[tuple[int, int], int] = defaultdict(int)
+        for (customer_id, product_id), quantity in quantities.items():
+            for pk, cons_id, dcons_id in returnables:
+                if product_id == cons_id:
+                    deltas[customer_id, pk] += quantity
+                elif product_id == dcons_id:
+                    deltas[customer_id, pk] -= quantity
+        with transaction.atomic():
+            balances = {
+                (customer_id, returnable_id): balance
+                for customer_id, returnable_id, balance in (
+                    ReturnableProductBalance.objects.select_for_update()
+                    .filter(
+                        customer_id__in={key[0] for key in deltas},
+                        returnable_id__in={key[1] for key in deltas},
+                    )
+                    .values_list("customer_id", "returnable_id", "balance")
+                )
+            }
+            ReturnableProductBalance.objects.bulk_create(
+                [
+                    ReturnableProductBalance(
+                        customer_id=customer_id,
+                        returnable_id=returnable_id,
+                        balance=balances.get((customer_id, returnable_id), 0) + delta,
+                    )
+                    for (customer_id, returnable_id), delta in deltas.items()
+                ],
+                update_conflicts=True,
+                update_fields=["balance"],
+                unique_fields=["customer", "returnable"],
+            )
+
 
 class ReturnableProduct(models.Model):
     """A returnable relation between two products (*consigne/déconsigne*)."""
@@ -1390,49 +2227,8 @@ class ReturnableProduct(models.Model):
         """Update all returnable balances linked to this object.
 
         Call this when a ReturnableProduct is created or updated.
-
-        Warning:
-            This function is expensive (around a few seconds),
-            so try not to run it outside a management command
-            or a task.
         """
-
-        def product_balance_subquery(product_id: int):
-            return Subquery(
-                Selling.objects.filter(customer=OuterRef("pk"), product_id=product_id)
-                .values("customer")
-                .annotate(res=Sum("quantity"))
-                .values("res")
-            )
-
-        old_balance_subquery = Subquery(
-            ReturnableProductBalance.objects.filter(
-                customer=OuterRef("pk"), returnable=self
-            ).values("balance")
-        )
-        new_balances = (
-            Customer.objects.annotate(
-                nb_cons=Coalesce(product_balance_subquery(self.product_id), 0),
-                nb_dcons=Coalesce(
-                    product_balance_subquery(self.returned_product_id), 0
-                ),
-            )
-            .annotate(new_balance=F("nb_cons") - F("nb_dcons"))
-            .exclude(new_balance=Coalesce(old_balance_subquery, 0))
-            .values("pk", "new_balance")
-        )
-        updates = [
-            ReturnableProductBalance(
-                customer_id=c["pk"], returnable=self, balance=c["new_balance"]
-            )
-            for c in new_balances
-        ]
-        ReturnableProductBalance.objects.bulk_create(
-            updates,
-            update_conflicts=True,
-            update_fields=["balance"],
-            unique_fields=["customer_id", "returnable"],
-        )
+        ReturnableProduct.objects.filter(pk=self.pk).update_balances()
 
 
 class ReturnableProductBalance(models.Model):
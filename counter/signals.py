@@ -22,12 +22,23 @@
 #
 import random
 
-from django.db.models.signals import pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 from core.middleware import get_signal_request
 from core.models import OperationLog
-from counter.models import Refilling, Selling
+from core.utils import invalidate_now_and_on_commit
+from counter.models import (
+    Counter,
+    CounterSellers,
+    Permanency,
+    Price,
+    Product,
+    ProductType,
+    Refilling,
+    ScheduledProductAction,
+    Selling,
+)
 
 
 def write_log(instance: Selling | Refilling, operation_type):
@@ -59,3 +70,96 @@ def write_log_refilling_deletion(sender, instance, **kwargs):
 @receiver(pre_delete, sender=Selling, dispatch_uid="write_log_refilling_deletion")
 def write_log_selling_deletion(sender, instance, **kwargs):
     write_log(instance, "SELLING_DELETION")
+
+
+def invalidate_prices_cache(counter_ids: list[int]):
+    """Invalidate the price catalogues of the given counters."""
+    if counter_ids:
+        invalidate_now_and_on_commit(
+            lambda: Counter.invalidate_prices_cache(counter_ids)
+        )
+
+
+def invalidate_product_counters(product_ids: list[int]):
+    invalidate_prices_cache(
+        list(
+            Counter.products.through.objects.filter(product_id__in=product_ids)
+            .values_list("counter_id", flat=True)
+            .distinct()
+        )
+    )
+
+
+@receiver(post_save, sender=Product, dispatch_uid="product_prices_cache")
+@receiver(pre_delete, sender=Product, dispatch_uid="product_prices_cache")
+def product_prices_cache(sender, instance: Product, **kwargs):
+    invalidate_product_counters([instance.id])
+
+
+@receiver(post_save, sender=Price, dispatch_uid="price_prices_cache")
+@receiver(post_delete, sender=Price, dispatch_uid="price_prices_cache")
+def price_prices_cache(sender, instance: Price, **kwargs):
+    invalidate_product_counters([instance.product_id])
+
+
+@receiver(m2m_changed, sender=Price.groups.through, dispatch_uid="price_groups_cache")
+def price_groups_cache(sender, instance, action, pk_set, *, reverse, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_product_counters([instance.product_id])
+    elif pk_set:
+        invalidate_product_counters(
+            list(
+                Price.objects.filter(id__in=pk_set)
+                .values_list("product_id", flat=True)
+                .distinct()
+            )
+        )
+    else:
+        # the whole price set of a group has been cleared,
+        # we can't know which counters were concerned
+        invalidate_prices_cache(list(Counter.objects.values_list("id", flat=True)))
+
+
+@receiver(
+    m2m_changed, sender=Counter.products.through, dispatch_uid="counter_products_cache"
+)
+def counter_products_cache(sender, instance, action, pk_set, *, reverse, **kwargs):
+    if action in ("pre_clear", "post_add", "post_remove"):
+        # on clear, pk_set is None, and the m2m table
+        # is already empty in post_clear, so invalidate before.
+        if not reverse:
+            invalidate_prices_cache([instance.id])
+        elif pk_set:
+            invalidate_prices_cache(list(pk_set))
+        else:
+            invalidate_product_counters([instance.id])
+
+
+@receiver(post_save, sender=ProductType, dispatch_uid="product_type_prices_cache")
+@receiver(pre_delete, sender=ProductType, dispatch_uid="product_type_prices_cache")
+def product_type_prices_cache(sender, instance: ProductType, **kwargs):
+    invalidate_product_counters(list(instance.products.values_list("id", flat=True)))
+
+
+@receiver(
+    post_save, sender=ScheduledProductAction, dispatch_uid="product_action_prices_cache"
+)
+@receiver(
+    post_delete,
+    sender=ScheduledProductAction,
+    dispatch_uid="product_action_prices_cache",
+)
+def product_action_prices_cache(sender, instance: ScheduledProductAction, **kwargs):
+    invalidate_product_counters([instance.product_id])
+
+
+@receiver(post_save, sender=Counter, dispatch_uid="counter_bars_status")
+@receiver(post_delete, sender=Counter, dispatch_uid="counter_bars_status")
+@receiver(post_save, sender=Permanency, dispatch_uid="permanency_bars_status")
+@receiver(post_delete, sender=Permanency, dispatch_uid="permanency_bars_status")
+@receiver(post_save, sender=CounterSellers, dispatch_uid="sellers_bars_status")
+@receiver(post_delete, sender=CounterSellers, dispatch_uid="sellers_bars_status")
+def bars_status_cache(sender, **kwargs):
+    Counter.invalidate_bars_status()
@@ -1,8 +1,11 @@
 # Create your tasks here
 
 from celery import shared_task
+from celery.utils.log import get_task_logger
 
-from counter.models import Counter, Product
+from counter.models import Counter, DailyPermanency, DailySales, Product
+
+logger = get_task_logger(__name__)
 
 
 @shared_task
@@ -17,3 +20,23 @@ def change_counters(*, product_id: int, counters: list[int], **kwargs):
     product = Product.objects.get(id=product_id)
     counters = Counter.objects.filter(id__in=counters)
     product.counters.set(counters)
+
+
+@shared_task
+def update_daily_stats(**kwargs):
+    """Sum up the new sales and permanencies in the daily rollups."""
+    DailySales.update_from_sales()
+    DailyPermanency.update_from_permanencies()
+
+
+@shared_task
+def close_inactive_permanencies(**kwargs) -> int:
+    """End the permanencies of the barmen who have been inactive for too long.
+
+    Returns:
+        The number of ended permanencies (which is kept by the results backend).
+    """
+    nb_closed = Counter.objects.handle_timeout()
+    if nb_closed:
+        logger.info("%d inactive permanencies closed", nb_closed)
+    return nb_closed
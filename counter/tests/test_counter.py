@@ -15,6 +15,7 @@
 from dataclasses import asdict, dataclass
 from datetime import timedelta
 from decimal import Decimal
+from unittest.mock import patch
 
 import pytest
 from bs4 import BeautifulSoup
@@ -22,9 +23,13 @@ from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.contrib.auth.models import Permission, make_password
 from django.contrib.messages import DEFAULT_LEVELS, get_messages
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
 from django.http import HttpResponse
 from django.shortcuts import resolve_url
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.timezone import localdate, now
@@ -33,20 +38,25 @@ from model_bakery import baker
 from model_bakery.recipe import Recipe
 from pytest_django.asserts import assertRedirects
 
-from club.models import ClubRole, Membership
+from club.models import Club, ClubRole, Membership
+from core.auth.mixins import can_view
 from core.baker_recipes import board_user, subscriber_user, very_old_subscriber_user
-from core.models import BanGroup, Group, User
+from core.models import AnonymousUser, BanGroup, Group, User
 from counter.baker_recipes import price_recipe, product_recipe, sale_recipe
 from counter.models import (
     Counter,
     CounterSellers,
     Customer,
+    DailyPermanency,
+    DailySales,
     Permanency,
+    Price,
     ProductType,
     Refilling,
     ReturnableProduct,
     Selling,
 )
+from counter.tasks import close_inactive_permanencies
 
 
 def set_age(user: User, age: int):
@@ -649,6 +659,82 @@ class TestCounterClick(TestFullClickBase):
         assert unarchived_prices == customer_prices
 
 
+class TestCounterPricesCache(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = baker.make(Group)
+        cls.customer = baker.make(Customer)
+        cls.group.users.add(cls.customer.user)
+        cls.counter = baker.make(Counter)
+        cls.products = product_recipe.make(
+            counters=[cls.counter], product_type=baker.make(ProductType), _quantity=3
+        )
+        cls.prices = price_recipe.make(
+            product=iter(cls.products), groups=[cls.group], _quantity=3
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_prices(self) -> set[Price]:
+        # fetch the customer again, so that its groups aren't already cached
+        customer = Customer.objects.get(pk=self.customer.pk)
+        return set(self.counter.get_cached_prices_for(customer))
+
+    def test_same_prices(self):
+        assert self.get_prices() == set(self.counter.get_prices_for(self.customer))
+        assert self.get_prices() == set(self.prices)
+
+    def test_cached(self):
+        self.get_prices()
+        customer = Customer.objects.get(pk=self.customer.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            prices = self.counter.get_cached_prices_for(customer)
+        assert set(prices) == set(self.prices)
+        # the remaining queries are used to fetch the user groups, bans...
+        for query in ctx.captured_queries:
+            assert "counter_price" not in query["sql"]
+            assert "counter_product" not in query["sql"]
+
+    def test_age_limit(self):
+        self.products[0].limit_age = 18
+        self.products[0].save()
+        set_age(self.customer.user, 20)
+        assert self.get_prices() == set(self.prices)
+        set_age(self.customer.user, 16)
+        assert self.get_prices() == set(self.prices[1:])
+
+    def test_other_groups(self):
+        self.get_prices()
+        other_customer = baker.make(Customer)
+        assert self.counter.get_cached_prices_for(other_customer) == []
+
+    def test_invalidate_on_price_change(self):
+        self.get_prices()
+        self.prices[0].amount += 1
+        self.prices[0].save()
+        assert self.prices[0].amount in {p.amount for p in self.get_prices()}
+        self.prices[1].delete()
+        assert self.get_prices() == {self.prices[0], self.prices[2]}
+        self.prices[0].groups.clear()
+        assert self.get_prices() == {self.prices[2]}
+
+    def test_invalidate_on_product_change(self):
+        self.get_prices()
+        self.products[0].archived = True
+        self.products[0].save()
+        assert self.get_prices() == set(self.prices[1:])
+
+    def test_invalidate_on_counter_products_change(self):
+        self.get_prices()
+        self.counter.products.remove(self.products[0])
+        assert self.get_prices() == set(self.prices[1:])
+        self.products[1].counters.clear()
+        assert self.get_prices() == {self.prices[2]}
+        self.counter.products.add(self.products[0])
+        assert self.get_prices() == {self.prices[0], self.prices[2]}
+
+
 class TestCounterStats(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -708,6 +794,9 @@ class TestCounterStats(TestCase):
             _sale_recipe.prepare(quantity=50, customer=cls.users[3].customer),  # 100€
         ]
         Selling.objects.bulk_create(sales)
+        # some permanencies end in the future
+        DailySales.update_from_sales(until=_now + timedelta(days=30))
+        DailyPermanency.update_from_permanencies(until=_now + timedelta(days=30))
 
     def test_not_authenticated_access_fail(self):
         url = reverse("counter:stats", args=[self.counter.id])
@@ -764,6 +853,92 @@ class TestCounterStats(TestCase):
         ]
 
 
+@pytest.mark.django_db
+class TestDailyRollup:
+    @pytest.fixture
+    def sale_recipe(self) -> Recipe[Selling]:
+        """A recipe of sales that all go in the same row of the rollup."""
+        return sale_recipe.extend(
+            customer=baker.make(Customer, amount=1000),
+            counter=baker.make(Counter),
+            club=baker.make(Club),
+            product=product_recipe.make(),
+            unit_price=2,
+        )
+
+    def test_update_sales(self, sale_recipe: Recipe[Selling]):
+        """Test that the new sales are added to the existing rows."""
+        sale_recipe.make(quantity=2)
+        DailySales.update_from_sales(until=now())
+        sale_recipe.make(quantity=3)
+        sale_recipe.make(quantity=1, payment_method=Selling.PaymentMethod.CARD)
+        sale_recipe.make(quantity=1, date=now() + timedelta(hours=1))  # too recent
+        DailySales.update_from_sales(until=now())
+        rows = DailySales.objects.order_by("quantity")
+        assert [(r.quantity, r.amount) for r in rows] == [(1, 2), (5, 10)]
+
+    def test_update_sales_id_order(self, sale_recipe: Recipe[Selling]):
+        """Test that a sale with a later date than a newer sale isn't skipped."""
+        sale_recipe.make(quantity=1, date=now() + timedelta(hours=1))
+        sale_recipe.make(quantity=2)
+        DailySales.update_from_sales(until=now())
+        DailySales.update_from_sales(until=now() + timedelta(hours=2))
+        assert DailySales.objects.aggregate(res=Sum("quantity"))["res"] == 3
+
+    def test_update_sales_by_batch(self, sale_recipe: Recipe[Selling]):
+        sale_recipe.make(quantity=1, _quantity=5)
+        with patch.object(DailySales, "BATCH_SIZE", 2):
+            DailySales.update_from_sales(until=now())
+        row = DailySales.objects.get()
+        assert (row.quantity, row.amount) == (5, 10)
+
+    def test_sale_deletion(self, sale_recipe: Recipe[Selling]):
+        sales = sale_recipe.make(quantity=1, _quantity=2)
+        DailySales.update_from_sales(until=now())
+        DailySales.record_deletion(sales[0])
+        row = DailySales.objects.get()
+        assert (row.quantity, row.amount) == (1, 2)
+
+    def test_update_permanencies(self):
+        user = baker.make(User)
+        start = now() - timedelta(hours=5)
+        baker.make(Permanency, user=user, start=start, end=start + timedelta(hours=1))
+        baker.make(Permanency, user=user, start=start, end=None)
+        DailyPermanency.update_from_permanencies(until=now())
+        Permanency.objects.filter(end=None).update(end=start + timedelta(hours=2))
+        DailyPermanency.update_from_permanencies(until=now())
+        assert DailyPermanency.objects.filter(user=user).aggregate(res=Sum("duration"))[
+            "res"
+        ] == timedelta(hours=3)
+
+    def test_update_permanencies_after_timeout(self):
+        """Test that a permanency closed for inactivity is summed up.
+
+        Such a permanency ends at the last activity of its barman,
+        which may be before the end of permanencies already summed up.
+        """
+        user = baker.make(User)
+        counter = baker.make(Counter)
+        start = now() - timedelta(hours=5)
+        inactive = baker.make(Permanency, user=user, counter=counter, start=start)
+        Permanency.objects.filter(id=inactive.id).update(
+            activity=start + timedelta(hours=1)
+        )
+        baker.make(
+            Permanency,
+            user=user,
+            counter=counter,
+            start=start,
+            end=start + timedelta(hours=2),
+        )
+        DailyPermanency.update_from_permanencies(until=now())
+        Counter.objects.filter(id=counter.id).handle_timeout()
+        DailyPermanency.update_from_permanencies(until=now())
+        assert DailyPermanency.objects.filter(user=user).aggregate(res=Sum("duration"))[
+            "res"
+        ] == timedelta(hours=3)
+
+
 class TestBarmanConnection(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -912,6 +1087,47 @@ def test_barman_timeout(client: Client):
     assert res.wsgi_request.barmen == set()
 
 
+@pytest.mark.django_db
+def test_close_inactive_permanencies():
+    counters = [*baker.make(Counter, type="BAR", _quantity=2), baker.make(Counter)]
+    stale = [baker.make(Permanency, counter=c, start=now()) for c in counters]
+    with freeze_time() as frozen_time:
+        frozen_time.tick(timedelta(minutes=settings.SITH_BARMAN_TIMEOUT + 1))
+        active = baker.make(Permanency, counter=counters[0], start=now())
+        assert close_inactive_permanencies() == len(stale)
+    perms = Permanency.objects.filter(id__in=[p.id for p in [*stale, active]])
+    assert list(perms.filter(end=None)) == [active]
+
+
+@pytest.mark.django_db
+def test_bars_status(django_assert_num_queries):
+    """Test that the cached state of the bars follows their openings and sellers."""
+    bar = baker.make(Counter, type="BAR")
+    office = baker.make(Counter, type="OFFICE")
+    user = baker.make(User)
+
+    def get_status():
+        # the cache is disabled inside transactions,
+        # which is the case of every test
+        connection = transaction.get_connection()
+        with patch.object(connection, "in_atomic_block", new=False):
+            bars = {b.id: b for b in Counter.get_bars_status()}
+        assert office.id not in bars
+        return bars[bar.id]
+
+    assert get_status() == (bar.id, bar.name, False, frozenset())
+    with django_assert_num_queries(0):
+        get_status()
+    CounterSellers.objects.create(counter=bar, user=user)
+    assert get_status().seller_ids == {user.id}
+    baker.make(Permanency, counter=bar, user=user, start=now())
+    assert get_status().is_open
+    with freeze_time() as frozen_time:
+        frozen_time.tick(timedelta(minutes=settings.SITH_BARMAN_TIMEOUT + 1))
+        Counter.objects.handle_timeout()
+    assert not get_status().is_open
+
+
 class TestClubCounterClickAccess(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -1024,3 +1240,41 @@ class TestCounterLogout:
             assert permanence.end == permanence.activity
             old_permanence.refresh_from_db()
             assert old_permanence.end == old_end
+
+
+@pytest.mark.django_db
+def test_counter_viewable_by():
+    club = baker.make(Club)
+    groups = baker.make(Group, _quantity=2)
+    seller = subscriber_user.make()
+    counters = [
+        baker.make(Counter, type="BAR", club=club),
+        baker.make(Counter, type="OFFICE", club=club),
+        baker.make(Counter, type="OFFICE", view_groups=[groups[0]]),
+        baker.make(Counter, type="OFFICE", edit_groups=[groups[1]]),
+        baker.make(Counter, type="EBOUTIC", sellers=[seller]),
+    ]
+    president = baker.make(User)
+    baker.make(
+        Membership,
+        club=club,
+        user=president,
+        role=baker.make(ClubRole, club=club, is_board=True, is_presidency=True),
+    )
+    users = [
+        AnonymousUser(),
+        baker.make(User),
+        baker.make(User, groups=[club.board_group]),
+        baker.make(User, groups=[groups[0]]),
+        baker.make(User, groups=[groups[1]]),
+        baker.make(
+            User, groups=[Group.objects.get(id=settings.SITH_GROUP_COUNTER_ADMIN_ID)]
+        ),
+        president,
+        seller,
+    ]
+    qs = Counter.objects.filter(id__in=[c.id for c in counters])
+    for user in users:
+        # the result of the SQL filter must be the same as the python one
+        expected = {c for c in counters if can_view(c, user)}
+        assert set(qs.viewable_by(user)) == expected
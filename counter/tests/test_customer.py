@@ -1,10 +1,15 @@
 import itertools
 import string
 from datetime import timedelta
+from io import StringIO
 
 import pytest
 from django.contrib.auth.base_user import make_password
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 from model_bakery import baker
@@ -14,6 +19,7 @@ from core.baker_recipes import board_user, subscriber_user
 from core.models import User
 from counter.baker_recipes import product_recipe, refill_recipe, sale_recipe
 from counter.models import (
+    BalanceSnapshot,
     Counter,
     CounterSellers,
     Customer,
@@ -338,6 +344,104 @@ def test_update_balance():
         assert customer.amount == amount
 
 
+class TestReconcileAmount(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customers = baker.make(Customer, _quantity=3)
+        for customer, amount in zip(cls.customers, [10, 20, 30], strict=True):
+            refill_recipe.make(customer=customer, amount=amount)
+        cls.sale = sale_recipe.make(customer=cls.customers[0], unit_price=2, quantity=3)
+        cls.qs = Customer.objects.filter(pk__in=[c.pk for c in cls.customers])
+
+    def test_valid_amounts(self):
+        assert self.qs.reconcile_amount(until=now()) == {}
+        snapshots = BalanceSnapshot.objects.filter(customer__in=self.customers)
+        assert list(snapshots.order_by("amount").values_list("amount", flat=True)) == [
+            4,
+            20,
+            30,
+        ]
+        last_selling = Selling.objects.latest("id")
+        assert set(snapshots.values_list("last_selling_id", flat=True)) == {
+            last_selling.id
+        }
+
+    def test_scan_after_snapshot(self):
+        self.qs.reconcile_amount(until=now())
+        refill_recipe.make(customer=self.customers[1], amount=5)
+        sale_recipe.make(customer=self.customers[2], unit_price=1, quantity=5)
+        assert self.qs.reconcile_amount(until=now()) == {}
+        snapshots = BalanceSnapshot.objects.filter(customer__in=self.customers)
+        assert list(snapshots.order_by("amount").values_list("amount", flat=True)) == [
+            4,
+            25,
+            25,
+        ]
+
+    def test_wrong_amount(self):
+        self.qs.reconcile_amount()
+        sale_recipe.make(customer=self.customers[1], unit_price=1, quantity=5)
+        Customer.objects.filter(pk=self.customers[1].pk).update(amount=50)
+        Customer.objects.filter(pk=self.customers[2].pk).update(amount=0)
+        assert self.qs.reconcile_amount() == {
+            self.customers[1].pk: (50, 15),
+            self.customers[2].pk: (0, 30),
+        }
+        # the previous call didn't fix the amounts
+        assert self.qs.reconcile_amount(fix=True) == {
+            self.customers[1].pk: (50, 15),
+            self.customers[2].pk: (0, 30),
+        }
+        assert self.qs.reconcile_amount() == {}
+        assert list(self.qs.order_by("amount").values_list("amount", flat=True)) == [
+            4,
+            15,
+            30,
+        ]
+
+    def test_deleted_operation(self):
+        self.qs.reconcile_amount(until=now())
+        self.sale.delete()
+        self.customers[1].refillings.get().delete()
+        assert self.qs.reconcile_amount(until=now()) == {}
+        snapshots = BalanceSnapshot.objects.filter(customer__in=self.customers)
+        assert list(snapshots.order_by("amount").values_list("amount", flat=True)) == [
+            0,
+            10,
+            30,
+        ]
+
+    def test_recent_operations(self):
+        """Test that the snapshots don't cover the most recent operations.
+
+        Those operations may not be visible to every transaction yet,
+        so covering them could make the snapshots miss an operation
+        registered a bit earlier, but committed later.
+        """
+        assert self.qs.reconcile_amount() == {}
+        snapshots = BalanceSnapshot.objects.filter(customer__in=self.customers)
+        assert set(snapshots.values_list("amount", "last_selling_id")) == {(0, 0)}
+        sale = sale_recipe.make(customer=self.customers[1], unit_price=1, quantity=5)
+        assert self.qs.reconcile_amount(until=sale.date) == {}
+        assert set(snapshots.values_list("last_selling_id", flat=True)) == {
+            self.sale.id
+        }
+        assert self.qs.reconcile_amount(until=now()) == {}
+        assert list(snapshots.order_by("amount").values_list("amount", flat=True)) == [
+            4,
+            15,
+            30,
+        ]
+
+    def test_command(self):
+        Customer.objects.filter(pk=self.customers[0].pk).update(amount=0)
+        out = StringIO()
+        call_command("reconcile_accounts", "--fix", stdout=out)
+        assert "1 accounts have a wrong amount" in out.getvalue()
+        self.customers[0].refresh_from_db()
+        assert self.customers[0].amount == 4
+
+
 @pytest.mark.django_db
 def test_update_returnable_balance():
     ReturnableProduct.objects.all().delete()
@@ -364,3 +468,81 @@ def test_update_returnable_balance():
         {"returnable_id": returnables[1].id, "balance": -2},
     ]
     assert set(balance_qs.values_list("balance", flat=True)) == {-2, 5}
+
+
+@pytest.mark.django_db
+def test_purchase(django_capture_on_commit_callbacks):
+    customer = baker.make(Customer, amount=20)
+    customer.user.preferences.notify_on_click = True
+    customer.user.preferences.save()
+    products = product_recipe.make(_quantity=3, _bulk_create=True)
+    sales = [
+        sale_recipe.prepare(
+            product=products[0], unit_price=5, quantity=2, _save_related=True
+        ),
+        sale_recipe.prepare(
+            product=products[1], unit_price=-2, quantity=1, _save_related=True
+        ),
+        sale_recipe.prepare(
+            product=products[2], unit_price=3, quantity=2, _save_related=True
+        ),
+        sale_recipe.prepare(
+            product=products[2],
+            unit_price=30,
+            quantity=1,
+            payment_method=Selling.PaymentMethod.CARD,
+            _save_related=True,
+        ),
+    ]
+    # the notifications are sent when the transaction is committed
+    with django_capture_on_commit_callbacks(execute=True):
+        customer.purchase(sales)
+    customer.refresh_from_db()
+    assert customer.amount == 6
+    assert customer.buyings.count() == 4
+    assert customer.user.notifications.filter(type="SELLING").count() == 4
+
+
+@pytest.mark.django_db
+def test_purchase_not_enough_money():
+    customer = baker.make(Customer, amount=10)
+    sales = sale_recipe.prepare(
+        unit_price=4, quantity=1, _quantity=3, _save_related=True
+    )
+    with pytest.raises(ValidationError), transaction.atomic():
+        customer.purchase(sales)
+    customer.refresh_from_db()
+    assert customer.amount == 10
+    assert not customer.buyings.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("field", ["counter", "club", "seller"])
+def test_purchase_missing_relation(field: str):
+    """Test that sales without a counter, a club or a seller are refused."""
+    customer = baker.make(Customer, amount=10)
+    sales = sale_recipe.prepare(
+        unit_price=1, quantity=1, _quantity=2, _save_related=True
+    )
+    setattr(sales[1], field, None)
+    with pytest.raises(ValidationError) as exc_info, transaction.atomic():
+        customer.purchase(sales)
+    assert field in exc_info.value.message_dict
+    customer.refresh_from_db()
+    assert customer.amount == 10
+    assert not customer.buyings.exists()
+
+
+@pytest.mark.django_db
+def test_purchase_num_queries():
+    """Test that the number of queries doesn't depend on the size of the basket."""
+    queries = []
+    for nb_sales in (1, 10):
+        customer = baker.make(Customer, amount=100)
+        sales = sale_recipe.prepare(
+            unit_price=1, quantity=1, _quantity=nb_sales, _save_related=True
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            customer.purchase(sales)
+        queries.append(len(ctx.captured_queries))
+    assert queries[0] == queries[1]
@@ -0,0 +1,104 @@
+from datetime import date
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from model_bakery import baker
+from PIL import Image
+
+from core.models import SithFile, User
+from counter.baker_recipes import product_recipe, sale_recipe
+from counter.eticket import EticketContent, get_eticket_pdf
+from counter.models import Customer, Eticket, Selling
+
+
+def _png() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (60, 30), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def eticket(db) -> Eticket:
+    eticket = baker.make(
+        Eticket,
+        product=product_recipe.make(),
+        event_title="Gala",
+        event_date=date(2025, 5, 31),
+        banner=ContentFile(_png(), name="banner.png"),
+    )
+    eticket.refresh_from_db()  # the secret is a string only once saved
+    return eticket
+
+
+@pytest.fixture
+def sale(eticket: Eticket) -> Selling:
+    customer = baker.make(Customer, amount=100)
+    return sale_recipe.make(
+        product=eticket.product, customer=customer, quantity=2, unit_price=1
+    )
+
+
+@pytest.mark.django_db
+def test_eticket_pdf_view(client: Client, sale: Selling):
+    url = reverse("counter:eticket_pdf", kwargs={"selling_id": sale.id})
+    client.force_login(sale.customer.user)
+    with patch.object(
+        EticketContent, "render", autospec=True, side_effect=EticketContent.render
+    ) as render:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.content.startswith(b"%PDF")
+        # the second download is served from the cache
+        assert client.get(url).content == response.content
+    render.assert_called_once()
+
+    client.force_login(baker.make(User))
+    assert client.get(url).status_code == 403
+
+
+@pytest.mark.django_db
+def test_eticket_cache_key(sale: Selling):
+    """Test that the PDF is rendered again when the ticket changes."""
+    pdf = get_eticket_pdf(sale)
+    key = EticketContent.from_selling(sale).get_cache_key()
+    assert cache.get(key) == pdf
+    sale.customer.user.first_name = "Nouveau"
+    assert EticketContent.from_selling(sale).get_cache_key() != key
+    sale.quantity = 3
+    assert EticketContent.from_selling(sale).get_cache_key() != key
+
+
+@pytest.mark.django_db
+def test_eticket_cache_key_replaced_files(sale: Selling):
+    """Test that replacing a file by another of the same name changes the key."""
+    user = sale.customer.user
+    user.profile_pict = SithFile(id=1, file=f"profiles/profile_{user.id}.webp")
+    key = EticketContent.from_selling(sale).get_cache_key()
+    # a new profile picture is a new SithFile, but with the same file name
+    user.profile_pict = SithFile(id=2, file=f"profiles/profile_{user.id}.webp")
+    assert EticketContent.from_selling(sale).get_cache_key() != key
+
+    key = EticketContent.from_selling(sale).get_cache_key()
+    sale.product.eticket.save()  # for example, with a new banner
+    assert EticketContent.from_selling(sale).get_cache_key() != key
+
+
+@pytest.mark.django_db
+def test_render_etickets_command(eticket: Eticket, sale: Selling):
+    other_sale = sale_recipe.make(
+        product=eticket.product,
+        customer=baker.make(Customer, amount=100),
+        unit_price=1,
+        quantity=1,
+    )
+    get_eticket_pdf(sale)
+    call_command("render_etickets", str(eticket.id), "--workers", "1")
+    # only the sale that wasn't in cache yet has been rendered
+    key = EticketContent.from_selling(other_sale).get_cache_key()
+    assert cache.get(key).startswith(b"%PDF")
@@ -14,7 +14,7 @@ from club.models import Club
 from core.models import User
 from counter.baker_recipes import sale_recipe
 from counter.forms import InvoiceCallForm
-from counter.models import Customer, InvoiceCall, Selling
+from counter.models import Customer, DailySales, InvoiceCall, Selling
 
 
 @pytest.mark.django_db
@@ -63,6 +63,7 @@ def test_invoice_call_form():
     recipe.make(club=clubs[0], quantity=2, unit_price=200)
     recipe.make(club=clubs[0], quantity=3, unit_price=5)
     recipe.make(club=clubs[1], quantity=20, unit_price=10)
+    DailySales.update_from_sales()
     form = InvoiceCallForm(
         month=month, data={str(clubs[0].id): True, str(clubs[1].id): False}
     )
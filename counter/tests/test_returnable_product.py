@@ -1,8 +1,14 @@
 import pytest
 from model_bakery import baker
+from pytest_django.asserts import assertNumQueries
 
-from counter.baker_recipes import refill_recipe, sale_recipe
-from counter.models import Customer, ReturnableProduct
+from counter.baker_recipes import product_recipe, refill_recipe, sale_recipe
+from counter.models import (
+    Customer,
+    ReturnableProduct,
+    ReturnableProductBalance,
+    Selling,
+)
 
 
 @pytest.mark.django_db
@@ -35,3 +41,71 @@ def test_update_returnable_product_balance():
         {"customer_id": customers[0].pk, "balance": 2},
         {"customer_id": customers[1].pk, "balance": 4},
     ]
+
+
+@pytest.mark.django_db
+def test_update_returnable_product_balances_of_customers():
+    ReturnableProduct.objects.all().delete()
+    customers = baker.make(Customer, _quantity=3, _bulk_create=True)
+    returnables = baker.make(ReturnableProduct, _quantity=2)
+    sale_recipe.make(
+        unit_price=0, quantity=3, product=returnables[0].product, customer=customers[0]
+    )
+    sale_recipe.make(
+        unit_price=0,
+        quantity=1,
+        product=returnables[1].returned_product,
+        customer=customers[1],
+    )
+    # this balance is wrong and there are no sales left to explain it
+    baker.make(
+        ReturnableProductBalance,
+        customer=customers[2],
+        returnable=returnables[0],
+        balance=5,
+    )
+    baker.make(
+        ReturnableProductBalance,
+        customer=customers[0],
+        returnable=returnables[0],
+        balance=3,
+    )
+
+    with assertNumQueries(4):
+        # fetch returnables, fetch sales, fetch old balances, upsert
+        nb_updated = ReturnableProduct.objects.update_balances(customers=customers[1:])
+    assert nb_updated == 2
+    assert list(
+        ReturnableProductBalance.objects.order_by("customer_id").values_list(
+            "customer_id", "returnable_id", "balance"
+        )
+    ) == [
+        (customers[0].pk, returnables[0].pk, 3),
+        (customers[1].pk, returnables[1].pk, -1),
+        (customers[2].pk, returnables[0].pk, 0),
+    ]
+
+
+@pytest.mark.django_db
+def test_apply_sales_to_returnable_product_balances():
+    ReturnableProduct.objects.all().delete()
+    customers = baker.make(Customer, _quantity=2, _bulk_create=True)
+    returnable = baker.make(ReturnableProduct)
+    baker.make(
+        ReturnableProductBalance,
+        customer=customers[0],
+        returnable=returnable,
+        balance=2,
+    )
+    sales = [
+        Selling(customer=customers[0], product=returnable.product, quantity=3),
+        Selling(customer=customers[0], product=returnable.returned_product, quantity=1),
+        Selling(customer=customers[1], product=returnable.returned_product, quantity=2),
+        Selling(customer=customers[1], product=product_recipe.make(), quantity=2),
+    ]
+    ReturnableProduct.objects.apply_sales(sales)
+    assert list(
+        returnable.balances.order_by("customer_id").values_list(
+            "customer_id", "balance"
+        )
+    ) == [(customers[0].pk, 4), (customers[1].pk, -2)]
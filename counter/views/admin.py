@@ -12,7 +12,7 @@
 # OR WITHIN THE LOCAL FILE "LICENSE"
 #
 #
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.mixins import PermissionRequiredMixin, UserPassesTestMixin
@@ -24,7 +24,6 @@ from django.forms.models import modelform_factory
 from django.shortcuts import get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from django.utils.timezone import get_current_timezone
 from django.utils.translation import gettext as _
 from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.edit import CreateView, DeleteView, FormView, UpdateView
@@ -352,14 +351,7 @@ class CounterStatView(PermissionRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         """Add stats to the context."""
         counter: Counter = self.object
-        start_date = get_start_of_semester()
-        semester_start = datetime(
-            start_date.year,
-            start_date.month,
-            start_date.day,
-            tzinfo=get_current_timezone(),
-        )
-        office_hours = counter.get_top_barmen()
+        semester_start = get_start_of_semester()
         kwargs = super().get_context_data(**kwargs)
         kwargs.update(
             {
@@ -367,9 +359,9 @@ class CounterStatView(PermissionRequiredMixin, DetailView):
                 "current_semester": get_semester_code(),
                 "total_sellings": counter.get_total_sales(since=semester_start),
                 "top_customers": counter.get_top_customers(since=semester_start)[:100],
-                "top_barman": office_hours[:100],
+                "top_barman": counter.get_top_barmen()[:100],
                 "top_barman_semester": (
-                    office_hours.filter(start__gt=semester_start)[:100]
+                    counter.get_top_barmen(since=semester_start)[:100]
                 ),
             }
         )
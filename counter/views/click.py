@@ -18,7 +18,6 @@ from collections import defaultdict
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
-from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, resolve_url
 from django.urls import reverse
@@ -37,7 +36,6 @@ from counter.models import (
     Customer,
     ProductFormula,
     Refilling,
-    ReturnableProduct,
     Selling,
 )
 from counter.utils import is_logged_in_counter
@@ -106,7 +104,7 @@ class CounterClick(
             messages.error(request, _("You cannot click users on this counter"))
             return redirect(obj)  # Redirect to counter
 
-        self.prices = list(obj.get_prices_for(self.customer))
+        self.prices = obj.get_cached_prices_for(self.customer)
 
         return super().dispatch(request, *args, **kwargs)
 
@@ -117,41 +115,41 @@ class CounterClick(
             return ret
 
         operator = get_operator(self.request, self.object, self.customer)
-        with transaction.atomic():
-            self.request.session["last_basket"] = []
-
-            # We sort items from cheap to expensive
-            # This is important because some items have a negative price
-            # Negative priced items gives money to the customer and should
-            # be processed first so that we don't throw a not enough money error
-            for form in sorted(formset, key=lambda form: form.price.amount):
-                self.request.session["last_basket"].append(
-                    f"{form.cleaned_data['quantity']} x {form.price.full_label}"
-                )
-
-                common_kwargs = {
-                    "product": form.price.product,
-                    "club_id": form.price.product.club_id,
-                    "counter": self.object,
-                    "seller": operator,
-                    "customer": self.customer,
-                }
+        self.request.session["last_basket"] = []
+        sales = []
+        # We sort items from cheap to expensive,
+        # so that items with a negative price are listed first
+        for form in sorted(formset, key=lambda form: form.price.amount):
+            self.request.session["last_basket"].append(
+                f"{form.cleaned_data['quantity']} x {form.price.full_label}"
+            )
+            common_kwargs = {
+                "product": form.price.product,
+                "club_id": form.price.product.club_id,
+                "counter": self.object,
+                "seller": operator,
+                "customer": self.customer,
+            }
+            sales.append(
                 Selling(
                     **common_kwargs,
                     label=form.price.full_label,
                     unit_price=form.price.amount,
                     quantity=form.cleaned_data["quantity"]
                     - form.cleaned_data["bonus_quantity"],
-                ).save()
-                if form.cleaned_data["bonus_quantity"] > 0:
+                )
+            )
+            if form.cleaned_data["bonus_quantity"] > 0:
+                sales.append(
                     Selling(
                         **common_kwargs,
                         label=f"{form.price.full_label} (Plateau)",
                         unit_price=0,
                         quantity=form.cleaned_data["bonus_quantity"],
-                    ).save()
-
-            self.customer.update_returnable_balance()
+                    )
+                )
+        with transaction.atomic():
+            self.customer.purchase(sales)
 
         # Add some info for the main counter view to display
         self.request.session["last_customer"] = self.customer.user.get_display_name()
@@ -160,37 +158,6 @@ class CounterClick(
 
         return ret
 
-    def _update_returnable_balance(self, formset):
-        ids = [form.cleaned_data["id"] for form in formset]
-        returnables = list(
-            ReturnableProduct.objects.filter(
-                Q(product_id__in=ids) | Q(returned_product_id__in=ids)
-            ).annotate_balance_for(self.customer)
-        )
-        for returnable in returnables:
-            cons_quantity = next(
-                (
-                    form.cleaned_data["quantity"]
-                    for form in formset
-                    if form.cleaned_data["id"] == returnable.product_id
-                ),
-                0,
-            )
-            dcons_quantity = next(
-                (
-                    form.cleaned_data["quantity"]
-                    for form in formset
-                    if form.cleaned_data["id"] == returnable.returned_product_id
-                ),
-                0,
-            )
-            self.customer.return_balances.update_or_create(
-                returnable=returnable,
-                defaults={
-                    "balance": returnable.balance + cons_quantity - dcons_quantity
-                },
-            )
-
     def get_success_url(self):
         return resolve_url(self.object)
 
@@ -79,9 +79,10 @@ class CounterLoginFragment(FragmentMixin, SingleObjectMixin, FormView):
 @require_POST
 def counter_logout(request: HttpRequest, counter_id: int) -> HttpResponseRedirect:
     """End the permanency of a user in this counter."""
-    Permanency.objects.filter(
+    if Permanency.objects.filter(
         counter=counter_id, user=request.POST["user_id"], end=None
-    ).update(end=F("activity"))
+    ).update(end=F("activity")):
+        Counter.invalidate_bars_status()
     return redirect("counter:details", counter_id=counter_id)
 
 
@@ -12,19 +12,19 @@
 # OR WITHIN THE LOCAL FILE "LICENSE"
 #
 #
-from datetime import datetime, timezone
+from datetime import date, datetime, time
 from urllib.parse import urlencode
 
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import F, Sum
+from django.db.models import Sum
 from django.utils.timezone import localdate, make_aware
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import FormView
 
 from counter.forms import InvoiceCallForm
-from counter.models import Refilling, Selling
+from counter.models import DailySales, Refilling, Selling
 from counter.views.mixins import CounterAdminTabsMixin
 
 
@@ -60,32 +60,29 @@ class InvoiceCallView(
         return url
 
     def get_context_data(self, **kwargs):
-        """Add sums to the context."""
+        """Add sums to the context.
+
+        The sales are read from the [DailySales][counter.models.DailySales] rollup.
+        """
         kwargs = super().get_context_data(**kwargs)
-        kwargs["months"] = Selling.objects.datetimes("date", "month", order="DESC")
+        kwargs["months"] = DailySales.objects.dates("date", "month", order="DESC")
         month = self.get_month()
-        start_date = datetime(month.year, month.month, month.day, tzinfo=timezone.utc)
+        start_date = date(month.year, month.month, 1)
         end_date = start_date + relativedelta(months=1)
+        sales = DailySales.objects.filter(date__gte=start_date, date__lt=end_date)
 
         kwargs["sum_cb"] = Refilling.objects.filter(
             payment_method=Refilling.PaymentMethod.CARD,
-            date__gte=start_date,
-            date__lte=end_date,
+            date__gte=make_aware(datetime.combine(start_date, time())),
+            date__lt=make_aware(datetime.combine(end_date, time())),
+        ).aggregate(res=Sum("amount", default=0))["res"]
+        kwargs["sum_cb"] += sales.filter(
+            payment_method=Selling.PaymentMethod.CARD
         ).aggregate(res=Sum("amount", default=0))["res"]
-        kwargs["sum_cb"] += (
-            Selling.objects.filter(
-                payment_method=Selling.PaymentMethod.CARD,
-                date__gte=start_date,
-                date__lte=end_date,
-            )
-            .annotate(amount=F("unit_price") * F("quantity"))
-            .aggregate(res=Sum("amount", default=0))["res"]
-        )
         kwargs["start_date"] = start_date
         kwargs["invoices"] = (
-            Selling.objects.filter(date__gte=start_date, date__lt=end_date)
-            .values("club_id", "club__name")
-            .annotate(selling_sum=Sum(F("unit_price") * F("quantity")))
+            sales.values("club_id", "club__name")
+            .annotate(selling_sum=Sum("amount"))
             .exclude(selling_sum=None)
             .order_by("-selling_sum")
         )
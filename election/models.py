@@ -1,5 +1,8 @@
+from typing import Self
+
+from django.conf import settings
 from django.db import models
-from django.db.models import Count
+from django.db.models import Count, Exists, OuterRef
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
@@ -9,6 +12,33 @@ from club.models import Club, ClubRole, Membership
 from core.models import Group, User
 
 
+class ElectionQuerySet(models.QuerySet):
+    def viewable_by(self, user: User) -> Self:
+        """Filter the elections this user can view.
+
+        Root users can view all elections.
+        The other users can view the elections of which
+        they are in the view groups or in the edit groups.
+        """
+        if user.is_anonymous:
+            return self.filter(view_groups=settings.SITH_GROUP_PUBLIC_ID)
+        if user.is_root:
+            return self.all()
+        groups = list(user.groups_snapshot.group_ids)
+        return self.filter(
+            Exists(
+                Election.view_groups.through.objects.filter(
+                    election_id=OuterRef("pk"), group_id__in=groups
+                )
+            )
+            | Exists(
+                Election.edit_groups.through.objects.filter(
+                    election_id=OuterRef("pk"), group_id__in=groups
+                )
+            )
+        )
+
+
 class Election(models.Model):
     """This class allows to create a new election."""
 
@@ -55,6 +85,8 @@ class Election(models.Model):
     )
     archived = models.BooleanField(_("archived"), default=False)
 
+    objects = ElectionQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
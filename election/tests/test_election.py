@@ -11,8 +11,9 @@ from model_bakery.recipe import Recipe
 from pytest_django.asserts import assertRedirects
 
 from club.models import Club
+from core.auth.mixins import can_view
 from core.baker_recipes import subscriber_user
-from core.models import Group, User
+from core.models import AnonymousUser, Group, User
 from election.models import Candidature, Election, ElectionList, Role, Vote
 
 
@@ -253,3 +254,46 @@ def test_create_election(client: Client):
     assert list(election.election_lists.values_list("title", flat=True)) == [
         "Candidat⸱e libre"
     ]
+
+
+@pytest.mark.django_db
+def test_election_viewable_by():
+    groups = baker.make(Group, _quantity=2)
+    public_group = Group.objects.get(id=settings.SITH_GROUP_PUBLIC_ID)
+    elections = [
+        baker.make(Election, view_groups=[public_group]),
+        baker.make(Election, view_groups=[groups[0]]),
+        baker.make(Election, edit_groups=[groups[1]]),
+        baker.make(Election, view_groups=groups, edit_groups=groups),
+    ]
+    users = [
+        AnonymousUser(),
+        baker.make(User),
+        baker.make(User, groups=[groups[0]]),
+        baker.make(User, groups=[groups[1]]),
+        User.objects.get(username="root"),
+    ]
+    qs = Election.objects.filter(id__in=[e.id for e in elections])
+    for user in users:
+        # the result of the SQL filter must be the same as the python one
+        expected = {e for e in elections if can_view(e, user)}
+        assert set(qs.viewable_by(user)) == expected
+
+
+@pytest.mark.django_db
+def test_election_list_view(client: Client):
+    Election.objects.all().delete()
+    group = baker.make(Group)
+    elections = baker.make(
+        Election, archived=False, _quantity=3, title=iter(["foo", "bar", "baz"])
+    )
+    elections[0].view_groups.add(group)
+    elections[1].edit_groups.add(group)
+    client.force_login(baker.make(User, groups=[group]))
+    res = client.get(reverse("election:list"))
+    assert res.status_code == 200
+    assert set(res.context_data["object_list"]) == set(elections[:2])
+
+    client.force_login(baker.make(User))
+    res = client.get(reverse("election:list"))
+    assert res.status_code == 403
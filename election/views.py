@@ -117,7 +117,7 @@ class VoteFormView(LoginRequiredMixin, UserPassesTestMixin, FormView):
         if not self.election.can_vote(self.request.user):
             return False
         return self.election.vote_groups.filter(
-            id__in=self.request.user.all_groups
+            id__in=self.request.user.groups_snapshot.group_ids
         ).exists()
 
     def vote(self, election_data):
@@ -262,7 +262,7 @@ class ElectionListCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView
             .union(self.election.edit_groups.values("id"))
             .values_list("id", flat=True)
         )
-        return not groups.isdisjoint(self.request.user.all_groups.keys())
+        return not groups.isdisjoint(self.request.user.groups_snapshot.group_ids)
 
     def get_form_kwargs(self):
         return super().get_form_kwargs() | {"election": self.election}
@@ -403,7 +403,7 @@ class ApplyResultFragment(LoginRequiredMixin, UserPassesTestMixin, FormView):
         if self.request.user.has_perm("club.add_membership"):
             return True
         return self.election.edit_groups.filter(
-            id__in=self.request.user.all_groups
+            id__in=self.request.user.groups_snapshot.group_ids
         ).exists()
 
     def post(self, request, *args, **kwargs):
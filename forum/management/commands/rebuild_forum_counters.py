@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from forum.models import Forum, ForumClosure
+
+
+class Command(BaseCommand):
+    """Rebuild from scratch the forum tree and the forum counters.
+
+    The closure table of the forums, the number of topics of each forum,
+    the number of messages of each topic and their last messages
+    are normally kept up to date incrementally.
+    This command is meant to fix them after bulk operations
+    or a manual edition of the database.
+    """
+
+    help = "Rebuild the forum tree and the topic and message counters"
+
+    def handle(self, *args, **options):
+        ForumClosure.rebuild()
+        Forum.rebuild_counters()
+        self.stdout.write("The forum counters have been rebuilt")
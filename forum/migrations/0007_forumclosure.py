@@ -0,0 +1,68 @@
+# Generated by Django 5.2.15 on 2026-10-18 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.migrations.state import StateApps
+
+
+def build_closure(apps: StateApps, schema_editor):
+    Forum = apps.get_model("forum", "Forum")
+    ForumClosure = apps.get_model("forum", "ForumClosure")
+    parents = dict(Forum.objects.values_list("id", "parent_id"))
+    links = []
+    for forum_id in parents:
+        current, depth = forum_id, 0
+        while current is not None and depth <= len(parents):
+            links.append(
+                ForumClosure(ancestor_id=current, descendant_id=forum_id, depth=depth)
+            )
+            current, depth = parents[current], depth + 1
+    ForumClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forum", "0006_auto_20180426_2013"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ForumClosure",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField(verbose_name="depth")),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="forum.forum",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="forum.forum",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ancestor", "descendant"), name="forum_closure_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_closure, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.15 on 2026-10-18 03:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.migrations.state import StateApps
+from django.db.models import Max
+
+
+def compact_readers(apps: StateApps, schema_editor):
+    """Keep only the last message read by each user in each topic."""
+    ForumMessage = apps.get_model("forum", "ForumMessage")
+    ForumTopicRead = apps.get_model("forum", "ForumTopicRead")
+    last_reads = (
+        ForumMessage.readers.through.objects.values("user_id", "forummessage__topic_id")
+        .annotate(message_id=Max("forummessage_id"))
+        .order_by()
+    )
+    ForumTopicRead.objects.bulk_create(
+        (
+            ForumTopicRead(
+                user_id=read["user_id"],
+                topic_id=read["forummessage__topic_id"],
+                last_read_message_id=read["message_id"],
+            )
+            for read in last_reads.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forum", "0007_forumclosure"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ForumTopicRead",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_read_message",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="forum.forummessage",
+                        verbose_name="last read message",
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reads",
+                        to="forum.forumtopic",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="forum_topic_reads",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "topic"), name="forum_topic_read_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(compact_readers, reverse_code=migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="forummessage",
+            name="readers",
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.15 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.migrations.state import StateApps
+from django.db.models import F
+
+
+def copy_last_read_message(apps: StateApps, schema_editor):
+    ForumTopicRead = apps.get_model("forum", "ForumTopicRead")
+    ForumTopicRead.objects.update(last_read_message_id=F("old_last_read_message"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [("forum", "0008_forumtopicread")]
+
+    operations = [
+        migrations.RenameField(
+            model_name="forumtopicread",
+            old_name="last_read_message",
+            new_name="old_last_read_message",
+        ),
+        migrations.AddField(
+            model_name="forumtopicread",
+            name="last_read_message_id",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="last read message"
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(
+            copy_last_read_message, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.RemoveField(
+            model_name="forumtopicread", name="old_last_read_message"
+        ),
+    ]
@@ -25,18 +25,38 @@ from __future__ import annotations
 from datetime import datetime
 from datetime import timezone as tz
 from itertools import chain
-from typing import Self
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from club.models import Club
-from core.models import Group, User
+from core.models import Group, TreeClosure, TreeQuerySet, User
+from forum.signals import forum_rights_changed
+
+
+def _fields_except(instance: models.Model, excluded: list[str]) -> list[str]:
+    return [
+        f.name
+        for f in instance._meta.concrete_fields
+        if not f.primary_key and f.name not in excluded
+    ]
 
 
 # Those functions prevent generating migration upon settings changes
@@ -48,6 +68,24 @@ def get_default_view_group():
     return [settings.SITH_GROUP_PUBLIC_ID]
 
 
+class ForumQuerySet(TreeQuerySet):
+    def update_last_message(self) -> int:
+        """Recompute the last message of those forums, in a single query.
+
+        The last message of a forum is the most recent one posted
+        in the topics of the forum or of any of its descendants.
+        """
+        last_messages = (
+            ForumTopic.objects.filter(
+                forum__ancestor_links__ancestor_id=OuterRef("pk"),
+                _last_message__isnull=False,
+            )
+            .order_by("-_last_message_id")
+            .values("_last_message_id")[:1]
+        )
+        return self.update(_last_message_id=Subquery(last_messages))
+
+
 class Forum(models.Model):
     """The Forum class, made as a tree to allow nice tidy organization.
 
@@ -98,6 +136,8 @@ class Forum(models.Model):
     )
     _topic_number = models.IntegerField(_("number of topics"), default=0)
 
+    objects = ForumQuerySet.as_manager()
+
     class Meta:
         ordering = ["number"]
 
@@ -105,56 +145,148 @@ class Forum(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
-        copy_rights = False
-        if self.id is None:
-            copy_rights = True
-        super().save(*args, **kwargs)
-        if copy_rights:
+        adding = self._state.adding
+        old_parent_id = (
+            None
+            if adding
+            else Forum.objects.filter(id=self.id)
+            .values_list("parent_id", flat=True)
+            .first()
+        )
+        if not adding and kwargs.get("update_fields") is None:
+            # The counters are only changed with atomic updates,
+            # to avoid overwriting them with outdated values.
+            kwargs["update_fields"] = _fields_except(
+                self, ["_topic_number", "_last_message"]
+            )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                ForumClosure.link_new([self])
+            elif old_parent_id != self.parent_id:
+                self._move_subtree()
+        if adding:
             self.copy_rights()
 
     def get_absolute_url(self):
         return reverse("forum:view_forum", kwargs={"forum_id": self.id})
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            ancestors = list(
+                Forum.objects.ancestors_of(self.id, include_self=False).values_list(
+                    "id", flat=True
+                )
+            )
+            topic_number = (
+                Forum.objects.filter(id=self.id)
+                .values_list("_topic_number", flat=True)
+                .first()
+            )
+            res = super().delete(*args, **kwargs)
+            Forum.objects.filter(id__in=ancestors).update(
+                _topic_number=F("_topic_number") - (topic_number or 0)
+            )
+            Forum.objects.filter(id__in=ancestors).update_last_message()
+        return res
+
+    def _move_subtree(self):
+        """Move this forum and its descendants under the current parent.
+
+        The closure table is updated, then the topics of the moved forums
+        are subtracted from the old ancestors and added to the new ones.
+        """
+        if ForumClosure.has_loop(self):
+            raise ValidationError(_("You can not make loops in forums"))
+        old_ancestors = list(
+            Forum.objects.ancestors_of(self.id, include_self=False).values_list(
+                "id", flat=True
+            )
+        )
+        ForumClosure.move(self)
+        new_ancestors = list(
+            Forum.objects.ancestors_of(self.id, include_self=False).values_list(
+                "id", flat=True
+            )
+        )
+        topic_number = (
+            Forum.objects.filter(id=self.id).values_list("_topic_number", flat=True)
+        )[0]
+        Forum.objects.filter(id__in=old_ancestors).update(
+            _topic_number=F("_topic_number") - topic_number
+        )
+        Forum.objects.filter(id__in=new_ancestors).update(
+            _topic_number=F("_topic_number") + topic_number
+        )
+        Forum.objects.filter(
+            id__in=[*old_ancestors, *new_ancestors]
+        ).update_last_message()
+
     def clean(self):
         self.check_loop()
 
-    def set_topic_number(self):
-        self._topic_number = self.get_topic_number()
-        self.save()
-        if self.parent:
-            self.parent.set_topic_number()
-
-    def set_last_message(self):
-        topic = (
-            ForumTopic.objects.filter(forum__id=self.id)
-            .exclude(_last_message=None)
-            .order_by("-_last_message__id")
-            .first()
-        )
-        forum = (
-            Forum.objects.filter(parent__id=self.id)
-            .exclude(_last_message=None)
-            .order_by("-_last_message__id")
-            .first()
+    @classmethod
+    def rebuild_counters(cls):
+        """Recompute from scratch the counters of all topics and forums.
+
+        The counters are normally kept up to date incrementally,
+        each time a topic or a message is created, moved or deleted.
+        This is meant to fix them after bulk operations.
+
+        Warning:
+            The closure table must be up to date
+            (see [ForumClosure.rebuild][forum.models.ForumClosure.rebuild]).
+        """
+        messages = ForumMessage.objects.filter(topic_id=OuterRef("pk"))
+        topics = ForumTopic.objects.filter(
+            forum__ancestor_links__ancestor_id=OuterRef("pk")
         )
-        if topic and forum:
-            if topic._last_message_id < forum._last_message_id:
-                self._last_message_id = forum._last_message_id
-            else:
-                self._last_message_id = topic._last_message_id
-        elif topic:
-            self._last_message_id = topic._last_message_id
-        elif forum:
-            self._last_message_id = forum._last_message_id
-        self.save()
-        if self.parent:
-            self.parent.set_last_message()
+        with transaction.atomic():
+            ForumTopic.objects.update(
+                _message_number=Coalesce(
+                    Subquery(
+                        messages.values("topic_id")
+                        .annotate(res=Count("*"))
+                        .values("res")
+                    ),
+                    0,
+                ),
+                _last_message_id=Subquery(
+                    messages.order_by("-date", "-id").values("id")[:1]
+                ),
+            )
+            cls.objects.update(
+                _topic_number=Coalesce(
+                    Subquery(
+                        topics.values("forum__ancestor_links__ancestor_id")
+                        .annotate(res=Count("*"))
+                        .values("res")
+                    ),
+                    0,
+                )
+            )
+            cls.objects.all().update_last_message()
 
     def apply_rights_recursively(self):
-        children = self.children.all()
-        for c in children:
-            c.copy_rights()
-            c.apply_rights_recursively()
+        """Apply the rights of this forum to all its descendants."""
+        forum_ids = list(
+            Forum.objects.descendants_of(self.id, include_self=False).values_list(
+                "id", flat=True
+            )
+        )
+        with transaction.atomic():
+            Forum.objects.filter(id__in=forum_ids).update(owner_club=self.owner_club_id)
+            for through in (Forum.view_groups.through, Forum.edit_groups.through):
+                groups = list(
+                    through.objects.filter(forum_id=self.id).values_list(
+                        "group_id", flat=True
+                    )
+                )
+                through.objects.filter(forum_id__in=forum_ids).delete()
+                through.objects.bulk_create(
+                    [through(forum_id=f, group_id=g) for f in forum_ids for g in groups]
+                )
+        forum_rights_changed.send(sender=Forum, forum_ids=forum_ids)
 
     def copy_rights(self):
         """Copy, if possible, the rights of the parent folder."""
@@ -187,14 +319,9 @@ class Forum(models.Model):
         return False
 
     def check_loop(self):
-        """Raise a validation error when a loop is found within the parent list."""
-        objs = []
-        cur = self
-        while cur.parent is not None:
-            if cur in objs:
-                raise ValidationError(_("You can not make loops in forums"))
-            objs.append(cur)
-            cur = cur.parent
+        """Raise a validation error when the parent is a descendant of this forum."""
+        if self == self.parent or ForumClosure.has_loop(self):
+            raise ValidationError(_("You can not make loops in forums"))
 
     def get_full_name(self):
         return "/".join(
@@ -207,34 +334,39 @@ class Forum(models.Model):
     def parent_list(self):
         return self.get_parent_list()
 
-    def get_parent_list(self):
-        parents = []
-        current = self.parent
-        while current is not None:
-            parents.append(current)
-            current = current.parent
-        return parents
+    def get_parent_list(self) -> list[Forum]:
+        """Return the ancestors of this forum, from its parent to the root."""
+        return ForumClosure.get_ancestors(self.parent_id)
 
     @property
     def topic_number(self):
         return self._topic_number
 
-    def get_topic_number(self):
-        number = self.topics.all().count()
-        for c in self.children.all():
-            number += c.topic_number
-        return number
-
     @cached_property
     def last_message(self):
         return self._last_message
 
-    def get_children_list(self) -> list[Self]:
-        children = [self.id]
-        for c in self.children.all():
-            children.append(c.id)
-            children.extend(c.get_children_list())
-        return children
+    def get_children_list(self) -> list[int]:
+        """Return the ids of this forum and of all its descendants."""
+        return list(Forum.objects.descendants_of(self.id).values_list("id", flat=True))
+
+
+class ForumClosure(TreeClosure):
+    """The closure table of the forum tree."""
+
+    ancestor = models.ForeignKey(
+        Forum, related_name="descendant_links", on_delete=models.CASCADE
+    )
+    descendant = models.ForeignKey(
+        Forum, related_name="ancestor_links", on_delete=models.CASCADE
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"], name="forum_closure_unique"
+            )
+        ]
 
 
 class ForumTopic(models.Model):
@@ -263,13 +395,49 @@ class ForumTopic(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.forum.set_topic_number()  # Recompute the cached value
-        self.forum.set_last_message()
+        adding = self._state.adding
+        old_forum_id = (
+            None
+            if adding
+            else ForumTopic.objects.filter(id=self.id)
+            .values_list("forum_id", flat=True)
+            .first()
+        )
+        if not adding and kwargs.get("update_fields") is None:
+            # The counters are only changed with atomic updates,
+            # to avoid overwriting them with outdated values.
+            kwargs["update_fields"] = _fields_except(
+                self, ["_message_number", "_last_message"]
+            )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Forum.objects.ancestors_of(self.forum_id).update(
+                    _topic_number=F("_topic_number") + 1
+                )
+            elif old_forum_id != self.forum_id:
+                Forum.objects.ancestors_of(old_forum_id).update(
+                    _topic_number=F("_topic_number") - 1
+                )
+                Forum.objects.ancestors_of(self.forum_id).update(
+                    _topic_number=F("_topic_number") + 1
+                )
+                Forum.objects.filter(
+                    Q(descendant_links__descendant_id=old_forum_id)
+                    | Q(descendant_links__descendant_id=self.forum_id)
+                ).update_last_message()
 
     def get_absolute_url(self):
         return reverse("forum:view_topic", kwargs={"topic_id": self.id})
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            res = super().delete(*args, **kwargs)
+            ancestors = Forum.objects.ancestors_of(self.forum_id)
+            ancestors.update(_topic_number=F("_topic_number") - 1)
+            ancestors.update_last_message()
+        return res
+
     def is_owned_by(self, user):
         return self.forum.is_owned_by(user)
 
@@ -282,8 +450,11 @@ class ForumTopic(models.Model):
     def get_first_unread_message(self, user: User) -> ForumMessage | None:
         if not hasattr(user, "forum_infos"):
             return None
+        reads = ForumTopicRead.objects.filter(
+            user=user, topic=self, last_read_message_id__gte=OuterRef("id")
+        )
         return (
-            self.messages.exclude(readers=user)
+            self.messages.filter(~Exists(reads))
             .filter(date__gte=user.forum_infos.last_read_date)
             .order_by("id")
             .first()
@@ -310,9 +481,6 @@ class ForumMessage(models.Model):
     title = models.CharField(_("title"), default="", max_length=64, blank=True)
     message = models.TextField(_("message"), default="")
     date = models.DateTimeField(_("date"), default=timezone.now)
-    readers = models.ManyToManyField(
-        User, related_name="read_messages", verbose_name=_("readers")
-    )
     _deleted = models.BooleanField(_("is deleted"), default=False)
 
     class Meta:
@@ -322,18 +490,36 @@ class ForumMessage(models.Model):
         return "%s (%s) - %s" % (self.id, self.author, self.title)
 
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         self._deleted = self.is_deleted()  # Recompute the cached value
-        super().save(*args, **kwargs)
-        if self.is_last_in_topic():
-            self.topic._last_message_id = self.id
-        if self.is_first_in_topic() and self.title:
-            self.topic._title = self.title
-        self.topic._message_number = self.topic.messages.count()
-        self.topic.save()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                self._update_counters()
+            elif self.title and self.is_first_in_topic():
+                ForumTopic.objects.filter(id=self.topic_id).update(_title=self.title)
 
     def get_absolute_url(self):
         return reverse("forum:view_message", kwargs={"message_id": self.id})
 
+    def _update_counters(self):
+        """Count this new message in its topic and its forums."""
+        topics = ForumTopic.objects.filter(id=self.topic_id)
+        title = F("_title")
+        if self.title:
+            # the first message of a topic gives its title to the latter
+            title = Case(When(_message_number=0, then=Value(self.title)), default=title)
+        topics.update(_message_number=F("_message_number") + 1, _title=title)
+        is_last = topics.filter(
+            Q(_last_message=None) | Q(_last_message__date__lte=self.date)
+        ).update(_last_message=self)
+        if is_last:
+            Forum.objects.filter(
+                descendant_links__descendant__topics=self.topic_id
+            ).filter(Q(_last_message=None) | Q(_last_message_id__lt=self.id)).update(
+                _last_message=self
+            )
+
     def is_first_in_topic(self):
         return bool(self.id == self.topic.messages.order_by("date").first().id)
 
@@ -377,14 +563,27 @@ class ForumMessage(models.Model):
         )
 
     def mark_as_read(self, user):
-        if user.is_anonymous:
+        """Mark this message and all the previous ones of its topic as read."""
+        if user.is_anonymous or self.date < user.forum_infos.last_read_date:
             return
-        if not self.is_read(user):
-            self.readers.add(user)
+        reads = ForumTopicRead.objects.filter(user=user, topic_id=self.topic_id)
+        if not reads.filter(last_read_message_id__lt=self.id).update(
+            last_read_message_id=self.id
+        ):
+            ForumTopicRead.objects.bulk_create(
+                [
+                    ForumTopicRead(
+                        user=user, topic_id=self.topic_id, last_read_message_id=self.id
+                    )
+                ],
+                ignore_conflicts=True,
+            )
 
     def is_read(self, user):
         return (self.date < user.forum_infos.last_read_date) or (
-            user in self.readers.all()
+            ForumTopicRead.objects.filter(
+                user=user, topic_id=self.topic_id, last_read_message_id__gte=self.id
+            ).exists()
         )
 
     def is_deleted(self):
@@ -442,3 +641,35 @@ class ForumUserInfo(models.Model):
 
     def __str__(self):
         return str(self.user)
+
+
+class ForumTopicRead(models.Model):
+    """The last message of a topic a user has read.
+
+    All the messages of the topic up to this one are considered as read,
+    as well as all the messages posted before the last time the user
+    marked all the messages as read (see `ForumUserInfo.last_read_date`).
+    Thus, there is at most one row per user and per topic,
+    instead of one per user and per message.
+
+    The last read message is stored as a plain id,
+    so that the deletion of a message doesn't delete the reads of its topic.
+    """
+
+    user = models.ForeignKey(
+        User, related_name="forum_topic_reads", on_delete=models.CASCADE
+    )
+    topic = models.ForeignKey(
+        ForumTopic, related_name="reads", on_delete=models.CASCADE
+    )
+    last_read_message_id = models.PositiveIntegerField(_("last read message"))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "topic"], name="forum_topic_read_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.topic} ({self.last_read_message_id})"
@@ -0,0 +1,12 @@
+from django.dispatch import Signal
+
+forum_rights_changed = Signal()
+"""Sent when the rights of forums have been changed in bulk.
+
+The usual `post_save` and `m2m_changed` signals aren't sent
+in this case, so this one can be used instead.
+
+Args:
+    sender: the [Forum][forum.models.Forum] class
+    forum_ids: the ids of the forums whose rights changed
+"""
@@ -12,15 +12,28 @@
 # OR WITHIN THE LOCAL FILE "LICENSE"
 #
 #
+from unittest.mock import MagicMock
 
 import pytest
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import Client
 from django.urls import reverse
+from model_bakery import baker
 from pytest_django.asserts import assertRedirects
 
-from core.models import User
-from forum.models import Forum, ForumMessage, ForumTopic
+from club.models import Club
+from core.models import Group, User
+from core.search_indexes import ForumMessageIndex
+from forum.models import (
+    Forum,
+    ForumClosure,
+    ForumMessage,
+    ForumTopic,
+    ForumTopicRead,
+)
+from forum.signals import forum_rights_changed
 
 
 @pytest.mark.django_db
@@ -75,3 +88,235 @@ class TestTopicCreation:
         response = client.post(reverse("forum:new_topic", args=str(forum.id)), payload)
         assert response.status_code == 403
         assert not ForumTopic.objects.filter(_title=payload["title"]).exists()
+
+
+@pytest.mark.django_db
+class TestForumCounters:
+    @pytest.fixture
+    def forums(self) -> list[Forum]:
+        """A chain of four forums, each one the parent of the next."""
+        forums = [baker.make(Forum)]
+        for _i in range(3):
+            forums.append(baker.make(Forum, parent=forums[-1]))
+        return forums
+
+    def test_closure(self, forums: list[Forum]):
+        assert (
+            list(Forum.objects.ancestors_of(forums[2].id).order_by("id")) == forums[:3]
+        )
+        assert set(
+            ForumClosure.objects.filter(ancestor=forums[1]).values_list(
+                "descendant_id", "depth"
+            )
+        ) == {(forums[1].id, 0), (forums[2].id, 1), (forums[3].id, 2)}
+
+    def test_post_message(self, forums: list[Forum], django_assert_num_queries):
+        topic = baker.make(ForumTopic, forum=forums[3])
+        baker.make(ForumMessage, topic=topic, title="first")
+        message = ForumMessage(topic=topic, author=topic.author, title="second")
+        # savepoint, insert, 2 updates of the topic, 1 of the forums, release
+        # whatever the depth of the forum
+        with django_assert_num_queries(6):
+            message.save()
+        topic.refresh_from_db()
+        assert topic._message_number == 2
+        assert topic._last_message == message
+        assert topic._title == "first"
+        for forum in forums:
+            forum.refresh_from_db()
+            assert forum._topic_number == 1
+            assert forum._last_message == message
+
+    def test_move_topic(self, forums: list[Forum]):
+        topic = baker.make(ForumTopic, forum=forums[3])
+        message = baker.make(ForumMessage, topic=topic)
+        topic.forum = forums[1]
+        topic.save()
+        for forum in forums:
+            forum.refresh_from_db()
+        assert [f._topic_number for f in forums] == [1, 1, 0, 0]
+        assert [f._last_message for f in forums] == [message, message, None, None]
+
+    def test_move_forum(self, forums: list[Forum]):
+        other_forum = baker.make(Forum)
+        topic = baker.make(ForumTopic, forum=forums[3])
+        message = baker.make(ForumMessage, topic=topic)
+        forums[2].parent = other_forum
+        forums[2].save()
+        assert set(
+            Forum.objects.ancestors_of(forums[3].id).values_list("id", flat=True)
+        ) == {other_forum.id, forums[2].id, forums[3].id}
+        for forum in [*forums, other_forum]:
+            forum.refresh_from_db()
+        assert [f._topic_number for f in forums] == [0, 0, 1, 1]
+        assert other_forum._topic_number == 1
+        assert other_forum._last_message == message
+        assert forums[0]._last_message is None
+
+    def test_delete_forum(self, forums: list[Forum]):
+        topic = baker.make(ForumTopic, forum=forums[3])
+        baker.make(ForumMessage, topic=topic)
+        forums[2].delete()
+        forums[0].refresh_from_db()
+        assert forums[0]._topic_number == 0
+        assert forums[0]._last_message is None
+
+    def test_tree_queries(self, forums: list[Forum], django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert forums[3].get_parent_list() == forums[2::-1]
+        with django_assert_num_queries(1):
+            assert forums[1].get_children_list() == [f.id for f in forums[1:]]
+        forums[0].parent = forums[3]
+        with pytest.raises(ValidationError):
+            forums[0].clean()
+
+    def test_apply_rights_recursively(self, forums: list[Forum]):
+        club = baker.make(Club)
+        groups = baker.make(Group, _quantity=2)
+        forums[1].owner_club = club
+        forums[1].save()
+        forums[1].view_groups.set([groups[0]])
+        forums[1].edit_groups.set([groups[1]])
+        forums[1].apply_rights_recursively()
+        for forum in Forum.objects.filter(id__in=[f.id for f in forums[1:]]):
+            assert forum.owner_club == club
+            assert list(forum.view_groups.all()) == [groups[0]]
+            assert list(forum.edit_groups.all()) == [groups[1]]
+        assert forums[0].owner_club != club
+
+    def test_rebuild_counters(self, forums: list[Forum]):
+        topics = baker.make(ForumTopic, forum=iter(forums[2:]), _quantity=2)
+        messages = [baker.make(ForumMessage, topic=t) for t in topics]
+        ForumClosure.objects.filter(ancestor=forums[0]).delete()
+        Forum.objects.filter(id__in=[f.id for f in forums]).update(
+            _topic_number=0, _last_message=None
+        )
+        ForumTopic.objects.filter(id__in=[t.id for t in topics]).update(
+            _message_number=0, _last_message=None
+        )
+        call_command("rebuild_forum_counters")
+        assert ForumClosure.objects.filter(ancestor=forums[0]).count() == 4
+        for forum in forums:
+            forum.refresh_from_db()
+        assert [f._topic_number for f in forums] == [2, 2, 2, 1]
+        assert [f._last_message for f in forums] == [messages[1]] * 4
+        for topic, message in zip(topics, messages, strict=True):
+            topic.refresh_from_db()
+            assert topic._message_number == 1
+            assert topic._last_message == message
+
+
+@pytest.mark.django_db
+class TestReadTracking:
+    @pytest.fixture
+    def topic(self) -> ForumTopic:
+        topic = baker.make(ForumTopic, forum=Forum.objects.get(name="AE"))
+        baker.make(ForumMessage, topic=topic, _quantity=5)
+        return topic
+
+    def test_mark_as_read(self, topic: ForumTopic):
+        user = baker.make(User)
+        messages = list(topic.messages.order_by("id"))
+        assert topic.get_first_unread_message(user) == messages[0]
+        messages[2].mark_as_read(user)
+        assert topic.get_first_unread_message(user) == messages[3]
+        assert messages[1].is_read(user)
+        assert not messages[3].is_read(user)
+        # reading an older message doesn't move the mark backwards
+        messages[0].mark_as_read(user)
+        assert topic.get_first_unread_message(user) == messages[3]
+        assert ForumTopicRead.objects.filter(user=user).count() == 1
+
+    def test_view_topic(self, client: Client, topic: ForumTopic):
+        user = User.objects.get(username="root")
+        client.force_login(user)
+        response = client.get(reverse("forum:view_topic", args=[topic.id]))
+        assert response.status_code == 200
+        assert topic.get_first_unread_message(user) is None
+        assert (
+            ForumTopicRead.objects.get(user=user, topic=topic).last_read_message_id
+            == topic.messages.order_by("id").last().id
+        )
+
+    def test_last_unread_and_mark_all(self, client: Client, topic: ForumTopic):
+        user = User.objects.get(username="root")
+        client.force_login(user)
+        url = reverse("forum:last_unread")
+        assert topic in client.get(url).context_data["object_list"]
+        topic.messages.order_by("id").last().mark_as_read(user)
+        assert topic not in client.get(url).context_data["object_list"]
+
+        baker.make(ForumMessage, topic=topic)
+        assert topic in client.get(url).context_data["object_list"]
+        client.get(reverse("forum:mark_all_as_read"))
+        assert topic not in client.get(url).context_data["object_list"]
+        assert not ForumTopicRead.objects.filter(user=user).exists()
+
+    def test_delete_read_message(self, topic: ForumTopic):
+        user = baker.make(User)
+        messages = list(topic.messages.order_by("id"))
+        messages[2].mark_as_read(user)
+        messages[2].delete()
+        assert topic.get_first_unread_message(user) == messages[3]
+        assert ForumTopicRead.objects.filter(user=user, topic=topic).exists()
+
+    def test_last_unread_first_unread_link(
+        self, client: Client, django_assert_max_num_queries
+    ):
+        user = User.objects.get(username="root")
+        client.force_login(user)
+        # fill the page, to check that the number of queries
+        # doesn't depend on the number of displayed topics
+        first_unread = {}
+        for topic in baker.make(
+            ForumTopic,
+            forum=Forum.objects.get(name="AE"),
+            _title="topic",
+            _quantity=settings.SITH_FORUM_PAGE_LENGTH,
+        ):
+            messages = baker.make(ForumMessage, topic=topic, _quantity=3)
+            messages[0].mark_as_read(user)
+            first_unread[topic.id] = messages[1].id
+        with django_assert_max_num_queries(10):
+            response = client.get(reverse("forum:last_unread"))
+        topics = response.context_data["object_list"]
+        assert len(topics) == settings.SITH_FORUM_PAGE_LENGTH // 2
+        for topic in topics:
+            assert topic.first_unread_message_id == first_unread[topic.id]
+            assert (
+                reverse("forum:view_message", args=[first_unread[topic.id]])
+                in response.text
+            )
+
+
+@pytest.mark.django_db
+class TestSearchIndex:
+    def test_index_rights(self):
+        club = baker.make(Club)
+        groups = baker.make(Group, _quantity=2)
+        forum = baker.make(
+            Forum, owner_club=club, view_groups=[groups[0]], edit_groups=[groups[1]]
+        )
+        message = baker.make(ForumMessage, topic__forum=forum)
+        message._deleted = True
+        data = ForumMessageIndex().full_prepare(message)
+        assert data["view_groups"] == [groups[0].id]
+        assert data["edit_groups"] == [groups[1].id]
+        assert data["owner_club"] == club.id
+        assert data["author"] == message.author_id
+        assert data["deleted"] is True
+
+    def test_rights_changed_signal(self):
+        forums = [baker.make(Forum)]
+        forums.extend(baker.make(Forum, parent=forums[0], _quantity=2))
+        receiver = MagicMock()
+        forum_rights_changed.connect(receiver, sender=Forum)
+        try:
+            forums[0].apply_rights_recursively()
+        finally:
+            forum_rights_changed.disconnect(receiver, sender=Forum)
+        receiver.assert_called_once()
+        assert set(receiver.call_args.kwargs["forum_ids"]) == {
+            forums[1].id,
+            forums[2].id,
+        }
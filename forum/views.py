@@ -29,7 +29,8 @@ from django import forms
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.db import IntegrityError
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.utils import html, timezone
@@ -39,26 +40,28 @@ from django.utils.translation import gettext_lazy as _
 from django.views.generic import DetailView, ListView, RedirectView
 from django.views.generic.detail import SingleObjectMixin
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
-from haystack.query import RelatedSearchQuerySet
 from honeypot.decorators import check_honeypot
 
 from club.widgets.ajax_select import AutoCompleteSelectClub
-from core.auth.mixins import (
-    CanEditMixin,
-    CanEditPropMixin,
-    CanViewMixin,
-    can_view,
-)
+from core.auth.mixins import CanEditMixin, CanEditPropMixin, CanViewMixin
+from core.search_indexes import ForumMessageSearchQuerySet
 from core.views.widgets.ajax_select import (
     AutoCompleteSelect,
     AutoCompleteSelectMultipleGroup,
 )
 from core.views.widgets.markdown import MarkdownInput
-from forum.models import Forum, ForumMessage, ForumMessageMeta, ForumTopic
+from forum.models import (
+    Forum,
+    ForumMessage,
+    ForumMessageMeta,
+    ForumTopic,
+    ForumTopicRead,
+)
 
 
 class ForumSearchView(ListView):
     template_name = "forum/search.jinja"
+    paginate_by = 30
 
     def get_queryset(self):
         query = self.request.GET.get("query", "")
@@ -66,39 +69,26 @@ class ForumSearchView(ListView):
 
         try:
             queryset = (
-                RelatedSearchQuerySet()
+                ForumMessageSearchQuerySet()
                 .models(ForumMessage)
                 .autocomplete(auto=html.escape(query))
             )
         except TypeError:
             return []
 
+        # The messages the user can't see are filtered by the search backend,
+        # so that the pagination is right
+        queryset = queryset.viewable_by(self.request.user)
         if order_by == "date":
             queryset = queryset.order_by("-date")
 
-        queryset = queryset.load_all()
-        queryset = queryset.load_all_queryset(
+        return queryset.load_all().load_all_queryset(
             ForumMessage,
-            ForumMessage.objects.all()
-            .prefetch_related("topic__forum__edit_groups")
-            .prefetch_related("topic__forum__view_groups")
-            .prefetch_related("topic__forum__owner_club"),
+            ForumMessage.objects.select_related(
+                "author", "topic__forum", "topic__author"
+            ),
         )
 
-        # Filter unauthorized responses
-        resp = []
-        count = 0
-        max_count = 30
-        for r in queryset:
-            if count >= max_count:
-                return resp
-            if can_view(r.object, self.request.user) and can_view(
-                r.object.topic, self.request.user
-            ):
-                resp.append(r.object)
-                count += 1
-        return resp
-
 
 class ForumMainView(ListView):
     queryset = Forum.objects.filter(parent=None).prefetch_related(
@@ -115,11 +105,10 @@ class ForumMarkAllAsRead(RedirectView):
         fi = request.user.forum_infos
         fi.last_read_date = timezone.now()
         fi.save()
-        try:
-            for m in request.user.read_messages.filter(date__lt=fi.last_read_date):
-                m.readers.remove(request.user)  # Clean up to keep table low in data
-        except IntegrityError:
-            pass
+        # Clean up to keep table low in data
+        request.user.forum_topic_reads.filter(
+            topic___last_message__date__lt=fi.last_read_date
+        ).delete()
         return super().get(request, *args, **kwargs)
 
 
@@ -139,11 +128,26 @@ class ForumLastUnread(ListView):
     paginate_by = settings.SITH_FORUM_PAGE_LENGTH / 2
 
     def get_queryset(self):
+        last_read_date = self.request.user.forum_infos.last_read_date
+        reads = ForumTopicRead.objects.filter(
+            user=self.request.user, topic=OuterRef("pk")
+        )
+        last_read_id = ForumTopicRead.objects.filter(
+            user=self.request.user, topic=OuterRef(OuterRef("pk"))
+        ).values("last_read_message_id")[:1]
+        first_unread = ForumMessage.objects.filter(
+            topic=OuterRef("pk"),
+            date__gte=last_read_date,
+            id__gt=Coalesce(Subquery(last_read_id), Value(0)),
+        ).order_by("id")
         topic_list = (
-            self.model.objects.filter(
-                _last_message__date__gt=self.request.user.forum_infos.last_read_date
+            self.model.objects.filter(_last_message__date__gt=last_read_date)
+            .filter(
+                ~Exists(
+                    reads.filter(last_read_message_id__gte=OuterRef("_last_message_id"))
+                )
             )
-            .exclude(_last_message__readers=self.request.user)
+            .annotate(first_unread_message_id=Subquery(first_unread.values("id")[:1]))
             .order_by("-_last_message__date")
             .select_related("_last_message__author", "author")
             .prefetch_related("forum__edit_groups")
@@ -332,7 +336,7 @@ class ForumTopicDetailView(CanViewMixin, DetailView):
             kwargs["first_unread_message_id"] = msg.id
         paginator = Paginator(
             topic.messages.select_related("author__avatar_pict", "topic__forum")
-            .prefetch_related("topic__forum__edit_groups", "readers")
+            .prefetch_related("topic__forum__edit_groups")
             .order_by("date"),
             settings.SITH_FORUM_PAGE_LENGTH,
         )
@@ -343,6 +347,8 @@ class ForumTopicDetailView(CanViewMixin, DetailView):
             kwargs["msgs"] = paginator.page(1)
         except EmptyPage:
             kwargs["msgs"] = paginator.page(paginator.num_pages)
+        if len(kwargs["msgs"]) > 0:
+            max(kwargs["msgs"], key=lambda m: m.id).mark_as_read(self.request.user)
         return kwargs
 
 
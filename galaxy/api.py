@@ -0,0 +1,33 @@
+from typing import Annotated
+
+from annotated_types import Ge, Le
+from ninja_extra import ControllerBase, api_controller, route
+from ninja_extra.exceptions import NotFound
+
+from api.permissions import IsOldSubscriber
+from galaxy.models import Galaxy, GalaxyStar
+from galaxy.schemas import GalaxySchema
+
+
+@api_controller("/galaxy")
+class GalaxyController(ControllerBase):
+    @route.get(
+        "/{int:user_id}/neighbourhood",
+        response=GalaxySchema,
+        permissions=[IsOldSubscriber],
+        url_name="galaxy_neighbourhood",
+    )
+    def fetch_neighbourhood(self, user_id: int, hops: Annotated[int, Ge(1), Le(3)] = 1):
+        """Return the part of the current galaxy around the given citizen.
+
+        The result has the same structure as the whole galaxy state,
+        but only contains the citizens that are at most `hops` lanes away
+        from the given one.
+        """
+        galaxy = Galaxy.get_current_galaxy()
+        if galaxy is None:
+            raise NotFound
+        try:
+            return galaxy.get_neighbourhood(user_id, hops)
+        except GalaxyStar.DoesNotExist as e:
+            raise NotFound from e
@@ -38,6 +38,16 @@ class Command(BaseCommand):
         "environment."
     )
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Only update the stars and lanes of the current galaxy "
+                "whose relations changed, instead of ruling a brand-new galaxy."
+            ),
+        )
+
     def handle(self, *args, **options):
         logger = logging.getLogger("main")
         if not 0 <= options["verbosity"] <= 2:
@@ -53,10 +63,15 @@ class Command(BaseCommand):
         else:
             logger.setLevel(logging.ERROR)
 
-        logger.info("The Galaxy is being ruled by the Sith.")
-        galaxy = Galaxy.objects.create()
-        galaxy.rule()
-        logger.info("Sending old galaxies' remains to garbage.")
-        Galaxy.objects.filter(state__isnull=True).delete()
+        current_galaxy = Galaxy.get_current_galaxy()
+        if options["incremental"] and current_galaxy is not None:
+            logger.info("The Galaxy is being refreshed by the Sith.")
+            current_galaxy.refresh()
+        else:
+            logger.info("The Galaxy is being ruled by the Sith.")
+            galaxy = Galaxy.objects.create()
+            galaxy.rule()
+            logger.info("Sending old galaxies' remains to garbage.")
+            Galaxy.objects.filter(state__isnull=True).delete()
 
         logger.info("Ruled the galaxy in {} queries.".format(len(connection.queries)))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.15 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("galaxy", "0002_auto_20230412_1130"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="galaxy",
+            name="state_file",
+            field=models.FileField(
+                blank=True,
+                editable=False,
+                null=True,
+                upload_to="galaxy",
+                verbose_name="The galaxy current state, compressed",
+            ),
+        ),
+    ]
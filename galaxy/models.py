@@ -23,14 +23,23 @@
 
 from __future__ import annotations
 
+import gzip
+import hashlib
+import heapq
+import io
 import itertools
+import json
 import logging
 import math
 import time
-from collections import defaultdict
-from typing import NamedTuple, TypedDict
-
-from django.db import models
+from collections import Counter, defaultdict
+from functools import partial
+from operator import itemgetter
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, TypedDict
+
+from django.core.files.base import ContentFile
+from django.db import models, transaction
 from django.db.models import Count, Exists, F, OuterRef, Q, QuerySet
 from django.utils.timezone import localdate, now
 from django.utils.translation import gettext_lazy as _
@@ -40,6 +49,10 @@ from core.models import User
 from sas.models import PeoplePictureRelation, Picture
 from subscription.models import Subscription
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from datetime import date
+
 
 class GalaxyStar(models.Model):
     """Define a star (vertex -> user) in the galaxy graph.
@@ -171,8 +184,18 @@ class Galaxy(models.Model):
     FAMILY_LINK_POINTS = 366  # Equivalent to a leap year together in a club, because.
     PICTURE_POINTS = 2  # Equivalent to two days as random members of a club.
     CLUBS_POINTS = 1  # One day together as random members in a club is one point.
+    LANE_DISTANCE_THRESHOLD = 30  # TODO: this needs tuning with real-world data
+    LANES_BATCH_SIZE = 1_000
+    STATE_CHUNK_SIZE = 2_000
 
     state = models.JSONField(_("The galaxy current state"), null=True)
+    state_file = models.FileField(
+        _("The galaxy current state, compressed"),
+        upload_to="galaxy",
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ["pk"]
@@ -298,6 +321,8 @@ class Galaxy(models.Model):
         (two years) and user2 was a member of the same club from 01/01/2021 to
         31/12/2022 (also two years, but with an offset of one year), then their
         club score is 365.
+
+        The memberships which haven't started yet don't overlap anything.
         """
         memberships = user.memberships.values("start_date", "end_date", "club_id")
         result = defaultdict(int)
@@ -326,9 +351,148 @@ class Galaxy(models.Model):
             for other in common_memberships:
                 start = max(membership["start_date"], other.start_date)
                 end = min(membership["end_date"] or today, other.end_date or today)
+                if end < start:  # one of the memberships hasn't started yet
+                    continue
                 result[other.user_id] += (end - start).days * cls.CLUBS_POINTS
         return result
 
+    @staticmethod
+    def _pair(user1_id: int, user2_id: int) -> tuple[int, int]:
+        """Return the key of the relation between two users in the scores matrices."""
+        if user1_id < user2_id:
+            return user1_id, user2_id
+        return user2_id, user1_id
+
+    @classmethod
+    def compute_family_scores(cls, citizens: set[int]) -> Counter[tuple[int, int]]:
+        """Compute the family scores of all the relations between the given citizens.
+
+        This does the same as `compute_user_family_score`,
+        but for all citizens at once, with a single db query.
+
+        Returns:
+            A sparse matrix of the family scores, indexed by ordered pairs of user ids.
+            Pairs of users which aren't in the same family are absent.
+        """
+        links = User.godfathers.through.objects.values_list(
+            "from_user_id", "to_user_id"
+        )
+        result = Counter()
+        for user1, user2 in links.iterator():
+            if user1 != user2 and user1 in citizens and user2 in citizens:
+                result[cls._pair(user1, user2)] += cls.FAMILY_LINK_POINTS
+        return result
+
+    @classmethod
+    def compute_pictures_scores(cls, citizens: set[int]) -> Counter[tuple[int, int]]:
+        """Compute the pictures scores of all the relations between the given citizens.
+
+        This does the same as `compute_user_pictures_score`,
+        but for all citizens at once, with a single db query.
+
+        Returns:
+            A sparse matrix of the pictures scores, indexed by ordered pairs of user ids.
+            Pairs of users which have no picture in common are absent.
+        """
+        relations = PeoplePictureRelation.objects.order_by(
+            "picture_id", "user_id"
+        ).values_list("picture_id", "user_id")
+        result = Counter()
+        for _picture, group in itertools.groupby(
+            relations.iterator(), key=itemgetter(0)
+        ):
+            people = [user for _picture, user in group if user in citizens]
+            for pair in itertools.combinations(people, 2):
+                result[pair] += cls.PICTURE_POINTS
+        return result
+
+    @staticmethod
+    def _club_overlaps(
+        intervals: Iterable[tuple[int, date, date]],
+    ) -> Iterator[tuple[int, int, int]]:
+        """Find all the overlapping memberships of a club with a sweep line.
+
+        Args:
+            intervals: the `(user_id, start, end)` memberships of a single club,
+                sorted by start date.
+
+        Returns:
+            An iterator over `(user1_id, user2_id, days)` triplets,
+            one for each couple of memberships of different users
+            which ran at the same time, with `days` the duration of the overlap.
+        """
+        # Memberships which started before the current one,
+        # as a heap ordered by end date.
+        ongoing: list[tuple[date, int]] = []
+        for user, start, end in intervals:
+            if end < start:  # this membership hasn't started yet
+                continue
+            while ongoing and ongoing[0][0] < start:
+                heapq.heappop(ongoing)
+            for other_end, other_user in ongoing:
+                if other_user != user:
+                    yield user, other_user, (min(end, other_end) - start).days
+            heapq.heappush(ongoing, (end, user))
+
+    @classmethod
+    def compute_clubs_scores(cls, citizens: set[int]) -> Counter[tuple[int, int]]:
+        """Compute the clubs scores of all the relations between the given citizens.
+
+        This does the same as `compute_user_clubs_score`,
+        but for all citizens at once, with a single db query.
+        The memberships of each club are sorted by start date,
+        then a sweep line finds the overlapping ones,
+        which takes O(m log m) time for m memberships
+        (plus the number of overlaps found).
+
+        Returns:
+            A sparse matrix of the clubs scores, indexed by ordered pairs of user ids.
+            Pairs of users which have never been in the same club at the same time
+            are absent.
+        """
+        today = localdate()
+        memberships = Membership.objects.order_by("club_id", "start_date").values_list(
+            "club_id", "user_id", "start_date", "end_date"
+        )
+        result = Counter()
+        for _club, group in itertools.groupby(
+            memberships.iterator(), key=itemgetter(0)
+        ):
+            intervals = (
+                (user, start, end or today)
+                for _club, user, start, end in group
+                if user in citizens
+            )
+            for user1, user2, days in cls._club_overlaps(intervals):
+                result[cls._pair(user1, user2)] += days * cls.CLUBS_POINTS
+        return result
+
+    @classmethod
+    def compute_relation_scores(
+        cls, citizens: set[int]
+    ) -> dict[tuple[int, int], RelationScore]:
+        """Compute the scores of all the relations between the given citizens.
+
+        Instead of computing the scores of each citizen one by one
+        (which costs several queries per citizen), all the godfather links,
+        the picture identifications and the memberships are loaded once,
+        and aggregated in sparse matrices.
+
+        Returns:
+            The relation scores of the given citizens,
+            indexed by ordered pairs of user ids.
+            Pairs of users which have nothing in common are absent.
+        """
+        family = cls.compute_family_scores(citizens)
+        pictures = cls.compute_pictures_scores(citizens)
+        clubs = cls.compute_clubs_scores(citizens)
+        return {
+            pair: RelationScore(
+                family=family[pair], pictures=pictures[pair], clubs=clubs[pair]
+            )
+            for pair in family.keys() | pictures.keys() | clubs.keys()
+        }
+
     ###################
     # Rule the galaxy #
     ###################
@@ -377,7 +541,11 @@ class Galaxy(models.Model):
         This does very effectively limit the quantity of computing to do
         and only includes users who have had a minimum of activity.
 
-        This method still remains very expensive, so think thoroughly before
+        The relation scores of all citizens are computed at once
+        by [Galaxy.compute_relation_scores][galaxy.models.Galaxy.compute_relation_scores],
+        so that only the pairs of citizen which have something in common
+        are examined.
+        This method still remains expensive, so think thoroughly before
         you call it, especially in production.
 
         :param picture_count_threshold: the minimum number of picture to have to be
@@ -386,15 +554,9 @@ class Galaxy(models.Model):
         total_time = time.time()
         self.logger.info("Listing rulable citizen.")
 
-        # force fetch of the whole query to make sure there won't
-        # be any more db hits
-        # this is memory expensive but prevents a lot of db hits, therefore
-        # is far more time efficient
-
         rulable_users_qs = self.get_rulable_users(picture_count_threshold)
-        active_users_count = rulable_users_qs.filter(is_active_in_galaxy=True).count()
         rulable_users = list(rulable_users_qs)
-        user1_count = 0
+        active_users_count = sum(u.is_active_in_galaxy for u in rulable_users)
         self.logger.info(
             f" {len(rulable_users)} citizens (with {active_users_count} active ones) "
             f"have been listed. Starting to rule."
@@ -410,67 +572,28 @@ class Galaxy(models.Model):
                 for user in rulable_users
             ]
         )
-        stars = {star.owner_id: star for star in self.stars.all()}
-
-        self.logger.info("Creating lanes between stars")
-        global_avg_speed_accumulator = 0
-        global_avg_speed_count = 0
-        t_global_start = time.time()
-        while len(rulable_users) > 0:
-            user1 = rulable_users.pop()
-            if not user1.is_active_in_galaxy:
-                continue
-            user1_count += 1
-            star1 = stars[user1.id]
+        stars = {star.owner_id: star.id for star in self.stars.all()}
 
-            lanes = []
-            family_scores = self.compute_user_family_score(user1)
-            picture_scores = self.compute_user_pictures_score(user1)
-            club_scores = self.compute_user_clubs_score(user1)
+        self.logger.info("Computing relation scores between citizen")
+        scores = self.compute_relation_scores({u.id for u in rulable_users})
+        self.logger.info(f"{len(scores)} pairs of citizen have something in common")
 
-            for user2 in rulable_users:
-                star2 = stars[user2.id]
-
-                score = RelationScore(
-                    family=family_scores.get(user2.id, 0),
-                    pictures=picture_scores.get(user2.id, 0),
-                    clubs=club_scores.get(user2.id, 0),
-                )
-                distance = self.scale_distance(sum(score))
-                if distance < 30:  # TODO: this needs tuning with real-world data
-                    lanes.append(
-                        GalaxyLane(
-                            star1=star1,
-                            star2=star2,
-                            distance=distance,
-                            family=score.family,
-                            pictures=score.pictures,
-                            clubs=score.clubs,
-                        )
-                    )
-            GalaxyLane.objects.bulk_create(lanes)
-
-            t_global_end = time.time()
-            global_delta = t_global_end - t_global_start
-            speed = 1.0 / global_delta
-            global_avg_speed_accumulator += speed
-            global_avg_speed_count += 1
-            global_avg_speed = global_avg_speed_accumulator / global_avg_speed_count
-
-            if user1_count % 50 == 0:
-                self.logger.info("")
-                self.logger.info(f" Ruling of {self} ".center(60, "#"))
-                self.logger.info(
-                    f"Progression: {user1_count}/{active_users_count} "
-                    f"citizen -- {active_users_count - user1_count} remaining"
-                )
-                self.logger.info(f"Speed: {global_avg_speed:.2f} citizen per second")
-                eta = len(rulable_users) // global_avg_speed
-                self.logger.info(
-                    f"ETA: {int(eta // 60 % 60)} minutes {int(eta % 60)} seconds"
-                )
-                self.logger.info("#" * 60)
-            t_global_start = time.time()
+        self.logger.info("Creating lanes between stars")
+        lanes = (
+            GalaxyLane(
+                star1_id=stars[user1],
+                star2_id=stars[user2],
+                distance=distance,
+                family=score.family,
+                pictures=score.pictures,
+                clubs=score.clubs,
+            )
+            for user1, user2, distance, score in self._compute_lanes(
+                rulable_users, scores
+            )
+        )
+        for batch in itertools.batched(lanes, self.LANES_BATCH_SIZE):
+            GalaxyLane.objects.bulk_create(batch)
 
         count, _ = self.stars.filter(Q(lanes1=None) & Q(lanes2=None)).delete()
         self.logger.info(f"{count} orphan stars have been trimmed.")
@@ -490,7 +613,10 @@ class Galaxy(models.Model):
         # Avoid accident if there is nothing to delete
         if len(old_galaxies_pks) > 0:
             # Former galaxies can now be deleted.
-            Galaxy.objects.filter(pk__in=old_galaxies_pks).delete()
+            old_galaxies = Galaxy.objects.filter(pk__in=old_galaxies_pks)
+            for galaxy in old_galaxies:
+                galaxy.state_file.delete(save=False)
+            old_galaxies.delete()
 
         total_time = time.time() - total_time
         total_time_minutes = int(total_time // 60 % 60)
@@ -499,8 +625,233 @@ class Galaxy(models.Model):
             f"{self} ruled in {total_time_minutes} minutes, {total_time_seconds} seconds"
         )
 
+    @classmethod
+    def _compute_lanes(
+        cls,
+        citizens: list[User],
+        scores: dict[tuple[int, int], RelationScore],
+    ) -> Iterator[tuple[int, int, int, RelationScore]]:
+        """Yield the lanes between the given citizen, in a deterministic order.
+
+        Each active citizen is linked to the citizens listed before them
+        with whom they have a close enough relation.
+        Citizens are handled from the end of the list to its beginning,
+        which is the order in which the lanes have always been created.
+
+        Args:
+            citizens: the citizens of the galaxy, in their ruling order
+            scores: the relation scores of the citizen,
+                as returned by `compute_relation_scores`
+
+        Returns:
+            An iterator over `(user1_id, user2_id, distance, score)` tuples,
+            one for each lane.
+        """
+        index = {user.id: i for i, user in enumerate(citizens)}
+        neighbours = defaultdict(list)
+        for user1_id, user2_id in scores:
+            neighbours[user1_id].append(user2_id)
+            neighbours[user2_id].append(user1_id)
+        for i in range(len(citizens) - 1, -1, -1):
+            user1 = citizens[i]
+            if not user1.is_active_in_galaxy:
+                continue
+            partners = sorted(index[u] for u in neighbours[user1.id] if index[u] < i)
+            for j in partners:
+                user2 = citizens[j]
+                score = scores[cls._pair(user1.id, user2.id)]
+                distance = cls.scale_distance(sum(score))
+                if distance < cls.LANE_DISTANCE_THRESHOLD:
+                    yield user1.id, user2.id, distance, score
+
+    def refresh(
+        self, picture_count_threshold: int = DEFAULT_PICTURE_COUNT_THRESHOLD
+    ) -> None:
+        """Update this ruled galaxy instead of ruling a brand-new one.
+
+        The relation scores are computed once again for all citizens,
+        then compared to the lanes and stars of this galaxy.
+        Only the stars and the lanes of the citizens whose pictures,
+        memberships or family changed since the galaxy was ruled are written,
+        and the cached state is patched accordingly.
+
+        The result is the same as what [Galaxy.rule][galaxy.models.Galaxy.rule]
+        would have given, except that the lanes keep their original direction.
+
+        :param picture_count_threshold: the minimum number of picture to have to be
+                                        included in the galaxy
+        """
+        total_time = time.time()
+        self.logger.info(f"Refreshing {self}.")
+        self._refresh_relations(picture_count_threshold)
+        # The state file is written once the new state has been committed,
+        # so that the committed galaxy never points to a file
+        # that isn't there anymore, or not there yet.
+        self.write_state_file()
+        self.save(update_fields=["state_file"])
+        total_time = time.time() - total_time
+        self.logger.info(f"{self} refreshed in {total_time:.0f} seconds")
+
+    @transaction.atomic
+    def _refresh_relations(self, picture_count_threshold: int) -> None:
+        """Update the stars, the lanes and the state of this galaxy.
+
+        The state file isn't written : it's up to the caller.
+        """
+        rulable_users = list(self.get_rulable_users(picture_count_threshold))
+        individual_scores = self.compute_individual_scores()
+        scores = self.compute_relation_scores({u.id for u in rulable_users})
+        new_lanes = {
+            self._pair(user1, user2): (user1, user2, distance, score)
+            for user1, user2, distance, score in self._compute_lanes(
+                rulable_users, scores
+            )
+        }
+        citizens = {owner for pair in new_lanes for owner in pair}
+
+        # Close the lanes which don't exist anymore
+        old_lanes = {
+            self._pair(lane.star1_owner, lane.star2_owner): lane
+            for lane in GalaxyLane.objects.filter(star1__galaxy=self).annotate(
+                star1_owner=F("star1__owner_id"), star2_owner=F("star2__owner_id")
+            )
+        }
+        gone_lanes = [pair for pair in old_lanes if pair not in new_lanes]
+        GalaxyLane.objects.filter(id__in=[old_lanes[p].id for p in gone_lanes]).delete()
+
+        # Update the stars
+        stars = {star.owner_id: star for star in self.stars.all()}
+        gone_stars = [s for owner, s in stars.items() if owner not in citizens]
+        self.stars.filter(id__in=[s.id for s in gone_stars]).delete()
+        new_stars = GalaxyStar.objects.bulk_create(
+            [
+                GalaxyStar(owner_id=owner, galaxy=self, mass=individual_scores[owner])
+                for owner in citizens - stars.keys()
+            ]
+        )
+        updated_stars = []
+        for owner, star in stars.items():
+            if owner in citizens and star.mass != individual_scores[owner]:
+                star.mass = individual_scores[owner]
+                updated_stars.append(star)
+        GalaxyStar.objects.bulk_update(updated_stars, fields=["mass"])
+        star_ids = {s.owner_id: s.id for s in stars.values() if s.owner_id in citizens}
+        star_ids |= {s.owner_id: s.id for s in new_stars}
+
+        # Update the lanes
+        changed_lanes = []
+        open_lanes = []
+        for pair, (user1, user2, distance, score) in new_lanes.items():
+            lane = old_lanes.get(pair)
+            if lane is None:
+                lane = GalaxyLane(star1_id=star_ids[user1], star2_id=star_ids[user2])
+                lane.star1_owner, lane.star2_owner = user1, user2
+                open_lanes.append(lane)
+            elif (distance, *score) == (
+                lane.distance,
+                lane.family,
+                lane.pictures,
+                lane.clubs,
+            ):
+                continue
+            else:
+                changed_lanes.append(lane)
+            lane.distance = distance
+            lane.family, lane.pictures, lane.clubs = score
+        GalaxyLane.objects.bulk_update(
+            changed_lanes, fields=["distance", "family", "pictures", "clubs"]
+        )
+        for batch in itertools.batched(open_lanes, self.LANES_BATCH_SIZE):
+            GalaxyLane.objects.bulk_create(batch)
+
+        touched_lanes = [*changed_lanes, *open_lanes]
+        touched_users = {s.owner_id for s in itertools.chain(new_stars, updated_stars)}
+        touched_users |= {owner for pair in gone_lanes for owner in pair}
+        touched_users |= {
+            owner
+            for lane in touched_lanes
+            for owner in (lane.star1_owner, lane.star2_owner)
+        }
+        self.logger.info(
+            f"{len(touched_users)} citizens have changed "
+            f"({len(gone_stars)} stars destroyed, {len(new_stars)} stars born, "
+            f"{len(gone_lanes)} lanes closed, {len(open_lanes)} lanes opened, "
+            f"{len(changed_lanes)} lanes updated)."
+        )
+        self._patch_state(
+            touched_users & citizens,
+            gone_owners={s.owner_id for s in gone_stars},
+            gone_lanes={
+                *gone_lanes,
+                *(
+                    self._pair(lane.star1_owner, lane.star2_owner)
+                    for lane in changed_lanes
+                ),
+            },
+            new_lanes=touched_lanes,
+        )
+
+    def _patch_state(
+        self,
+        touched_users: set[int],
+        gone_owners: set[int],
+        gone_lanes: set[tuple[int, int]],
+        new_lanes: list[GalaxyLane],
+    ) -> None:
+        """Patch the cached state of this galaxy after a refresh.
+
+        The state file isn't written again : call
+        [Galaxy.write_state_file][galaxy.models.Galaxy.write_state_file]
+        once the new state is committed.
+
+        Args:
+            touched_users: the citizens whose star must be (re)written in the state
+            gone_owners: the users whose star has been destroyed
+            gone_lanes: the ordered pairs of users whose link must be removed
+                (links of the destroyed stars are removed anyway)
+            new_lanes: the lanes whose link must be (re)written in the state.
+                Each lane must be annotated with `star1_owner` and `star2_owner`.
+        """
+        nodes = {
+            node["id"]: node
+            for node in self.state["nodes"]
+            if node["id"] not in gone_owners
+        }
+        stars = GalaxyStar.objects.filter(
+            galaxy=self, owner_id__in=touched_users
+        ).select_related("owner")
+        for star in stars:
+            nodes[star.owner_id] = StarDict(
+                id=star.owner_id, name=star.owner.get_display_name(), mass=star.mass
+            )
+        links = [
+            link
+            for link in self.state["links"]
+            if link["source"] not in gone_owners
+            and link["target"] not in gone_owners
+            and self._pair(link["source"], link["target"]) not in gone_lanes
+        ]
+        links.extend(
+            {
+                "source": lane.star1_owner,
+                "target": lane.star2_owner,
+                "value": lane.distance,
+            }
+            for lane in new_lanes
+        )
+        self.state = GalaxyDict(
+            nodes=sorted(nodes.values(), key=itemgetter("id")), links=links
+        )
+        self.save(update_fields=["state"])
+
     def make_state(self) -> None:
-        """Compute JSON structure to send to 3d-force-graph: https://github.com/vasturiano/3d-force-graph/."""
+        """Compute JSON structure to send to 3d-force-graph: https://github.com/vasturiano/3d-force-graph/.
+
+        Stars and lanes are fetched by chunks, to avoid loading
+        the whole galaxy as model instances.
+        The state is then also written as a gzipped file
+        (see [Galaxy.write_state_file][galaxy.models.Galaxy.write_state_file]).
+        """
         self.logger.info(
             "Caching current Galaxy state for a quicker display of the Empire's power."
         )
@@ -508,30 +859,117 @@ class Galaxy(models.Model):
             GalaxyStar.objects.filter(galaxy=self)
             .order_by("owner_id")
             .select_related("owner")
+            .only(
+                "mass",
+                "owner__first_name",
+                "owner__last_name",
+                "owner__nick_name",
+            )
         )
         lanes = (
             GalaxyLane.objects.filter(star1__galaxy=self)
             .order_by("star1")
-            .annotate(
-                star1_owner=F("star1__owner_id"), star2_owner=F("star2__owner_id")
-            )
+            .values_list("star1__owner_id", "star2__owner_id", "distance")
         )
-        json = GalaxyDict(
+        self.state = GalaxyDict(
             nodes=[
                 StarDict(
                     id=star.owner_id, name=star.owner.get_display_name(), mass=star.mass
                 )
-                for star in stars
+                for star in stars.iterator(chunk_size=self.STATE_CHUNK_SIZE)
             ],
             links=[
-                {
-                    "source": path.star1_owner,
-                    "target": path.star2_owner,
-                    "value": path.distance,
-                }
-                for path in lanes
+                {"source": star1_owner, "target": star2_owner, "value": distance}
+                for star1_owner, star2_owner, distance in lanes.iterator(
+                    chunk_size=self.STATE_CHUNK_SIZE
+                )
             ],
         )
-        self.state = json
+        self.write_state_file()
         self.save()
         self.logger.info(f"{self} is now ready!")
+
+    def write_state_file(self) -> None:
+        """Write the state of this galaxy in a gzipped json file.
+
+        The name of the file is the hash of its content,
+        which makes it usable as an ETag by the views serving it.
+        The previous state file, if any, is deleted
+        once the current transaction is committed,
+        because the committed galaxy still points to it until then.
+
+        Warning:
+            This doesn't save the galaxy itself.
+            Don't forget to call `save()` afterward.
+        """
+        buffer = io.BytesIO()
+        # mtime=0 makes the compressed content only depend on the state
+        with (
+            gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as gz,
+            io.TextIOWrapper(gz, encoding="utf-8") as f,
+        ):
+            json.dump(self.state, f)
+        content = buffer.getvalue()
+        name = f"{hashlib.sha256(content).hexdigest()[:32]}.json.gz"
+        if self.state_file and Path(self.state_file.name).name == name:
+            return
+        old_file = self.state_file.name
+        self.state_file.save(name, ContentFile(content), save=False)
+        if old_file:
+            storage = self.state_file.storage
+            transaction.on_commit(partial(storage.delete, old_file))
+
+    @property
+    def state_etag(self) -> str | None:
+        """The ETag of the state of this galaxy, derived from the state file name."""
+        if not self.state_file:
+            return None
+        return f'"{Path(self.state_file.name).name.removesuffix(".json.gz")}"'
+
+    def get_neighbourhood(self, user_id: int, hops: int = 1) -> GalaxyDict:
+        """Get the part of the galaxy around the given citizen.
+
+        The result has the same structure as the [Galaxy.state][galaxy.models.Galaxy.state],
+        but only contains the stars which are at most `hops` lanes away
+        from the star of the given citizen, and the lanes between those stars.
+
+        This costs `hops + 2` db queries.
+
+        Raises:
+            GalaxyStar.DoesNotExist: if the given user isn't a citizen of this galaxy
+        """
+        if not self.stars.filter(owner_id=user_id).exists():
+            raise GalaxyStar.DoesNotExist
+        lanes = GalaxyLane.objects.filter(star1__galaxy=self)
+        citizens = {user_id}
+        frontier = {user_id}
+        for _hop in range(hops):
+            neighbours = lanes.filter(
+                Q(star1__owner_id__in=frontier) | Q(star2__owner_id__in=frontier)
+            ).values_list("star1__owner_id", "star2__owner_id")
+            frontier = {owner for pair in neighbours for owner in pair} - citizens
+            if not frontier:
+                break
+            citizens |= frontier
+        stars = (
+            self.stars.filter(owner_id__in=citizens)
+            .order_by("owner_id")
+            .select_related("owner")
+        )
+        lanes = (
+            lanes.filter(star1__owner_id__in=citizens, star2__owner_id__in=citizens)
+            .order_by("star1")
+            .values_list("star1__owner_id", "star2__owner_id", "distance")
+        )
+        return GalaxyDict(
+            nodes=[
+                StarDict(
+                    id=star.owner_id, name=star.owner.get_display_name(), mass=star.mass
+                )
+                for star in stars
+            ],
+            links=[
+                {"source": star1_owner, "target": star2_owner, "value": distance}
+                for star1_owner, star2_owner, distance in lanes
+            ],
+        )
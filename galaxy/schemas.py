@@ -0,0 +1,18 @@
+from ninja import Schema
+
+
+class GalaxyStarSchema(Schema):
+    id: int
+    name: str
+    mass: int
+
+
+class GalaxyLinkSchema(Schema):
+    source: int
+    target: int
+    value: int
+
+
+class GalaxySchema(Schema):
+    nodes: list[GalaxyStarSchema]
+    links: list[GalaxyLinkSchema]
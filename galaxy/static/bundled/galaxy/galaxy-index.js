@@ -7,7 +7,7 @@ import SpriteText from "three-spritetext";
 /**
  * @typedef GalaxyConfig
  * @property {number} nodeId id of the current user node
- * @property {string} dataUrl url to fetch the galaxy data from
+ * @property {string} dataUrl url to fetch the neighbourhood of the current user from
  **/
 
 /**
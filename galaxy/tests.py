@@ -21,16 +21,22 @@
 #
 #
 
+import gzip
 import json
+from datetime import date, timedelta
 from pathlib import Path
 
 import pytest
 from django.core.management import call_command
+from django.db.models import Q
 from django.test import TestCase
 from django.urls import reverse
+from django.utils.timezone import localdate
+from model_bakery import baker
 
+from club.models import Club, Membership
 from core.models import User
-from galaxy.models import Galaxy
+from galaxy.models import Galaxy, GalaxyLane
 
 
 # @pytest.mark.skip(reason="Galaxy is disabled for now")
@@ -145,14 +151,189 @@ class TestGalaxyModel(TestCase):
         self.maxDiff = None  # Yes, we want to see the diff if any
         self.assertDictEqual(expected_scores, computed_scores)
 
+    def test_relation_scores(self):
+        """Test that the scores computed for all users at once
+        are the same as the ones computed user by user.
+        """
+        users = list(User.objects.all())
+        with self.assertNumQueries(3):
+            scores = Galaxy.compute_relation_scores({u.id for u in users})
+        for i, user1 in enumerate(users):
+            family_scores = Galaxy.compute_user_family_score(user1)
+            picture_scores = Galaxy.compute_user_pictures_score(user1)
+            club_scores = Galaxy.compute_user_clubs_score(user1)
+            for user2 in users[i + 1 :]:
+                expected = (
+                    family_scores[user2.id],
+                    picture_scores[user2.id],
+                    club_scores[user2.id],
+                )
+                key = Galaxy._pair(user1.id, user2.id)
+                assert tuple(scores.get(key, (0, 0, 0))) == expected
+
+    def test_future_memberships(self):
+        """Test that the memberships which haven't started yet
+        don't change the lanes of the galaxy.
+        """
+        old_score = Galaxy.compute_relation_scores({self.skia.id, self.krophil.id})
+        key = Galaxy._pair(self.skia.id, self.krophil.id)
+        today = localdate()
+        # each one is a member of a club that the other will join soon,
+        # so that the future memberships are seen from both sides
+        for current, future in [(self.skia, self.krophil), (self.krophil, self.skia)]:
+            club = baker.make(Club)
+            baker.make(
+                Membership,
+                club=club,
+                user=current,
+                start_date=today - timedelta(days=400),
+                end_date=None,
+            )
+            baker.make(
+                Membership,
+                club=club,
+                user=future,
+                start_date=today + timedelta(days=20),
+                end_date=None,
+            )
+        users = list(User.objects.all())
+        scores = Galaxy.compute_clubs_scores({u.id for u in users})
+        assert scores[key] == old_score[key].clubs
+        for i, user1 in enumerate(users):
+            club_scores = Galaxy.compute_user_clubs_score(user1)
+            for user2 in users[i + 1 :]:
+                key12 = Galaxy._pair(user1.id, user2.id)
+                assert scores.get(key12, 0) == club_scores[user2.id]
+
+        galaxy = Galaxy.objects.create()
+        galaxy.rule(0)
+        lane = GalaxyLane.objects.get(
+            Q(star1__owner=self.skia, star2__owner=self.krophil)
+            | Q(star1__owner=self.krophil, star2__owner=self.skia)
+        )
+        assert lane.clubs == old_score[key].clubs
+        assert lane.distance == Galaxy.scale_distance(sum(old_score[key]))
+
     def test_rule(self):
         """Test on the default dataset generated by the `populate` command
         that the number of queries to rule the galaxy is stable.
         """
         galaxy = Galaxy.objects.create()
-        with self.assertNumQueries(36):
+        with self.assertNumQueries(15):
             galaxy.rule(0)  # We want everybody here
 
+    def test_refresh(self):
+        """Test that refreshing a galaxy gives the same result as ruling a new one."""
+        galaxy = Galaxy.objects.create()
+        galaxy.rule(0)
+        # krophil leaves the galaxy, sli gets a new godfather
+        # and loses one of the pictures they share with skia
+        self.krophil.pictures.all().delete()
+        self.sli.godfathers.add(self.root)
+        self.sli.pictures.filter(picture__people__user=self.skia).first().delete()
+        galaxy.refresh(0)
+
+        galaxy.refresh_from_db()
+        lanes = self._get_lanes(galaxy)
+        stars = set(galaxy.stars.values_list("owner_id", "mass"))
+        nodes = galaxy.state["nodes"]
+        links = {
+            (frozenset((link["source"], link["target"])), link["value"])
+            for link in galaxy.state["links"]
+        }
+        reference = Galaxy.objects.create()
+        reference.rule(0)
+        assert lanes == self._get_lanes(reference)
+        assert stars == set(reference.stars.values_list("owner_id", "mass"))
+        assert nodes == reference.state["nodes"]
+        assert links == {
+            (frozenset((link["source"], link["target"])), link["value"])
+            for link in reference.state["links"]
+        }
+
+    def test_state_file(self):
+        """Test that the state is also written in a gzipped file."""
+        galaxy = Galaxy.objects.create()
+        galaxy.rule(0)
+        with galaxy.state_file.open("rb") as f:
+            assert json.loads(gzip.decompress(f.read())) == galaxy.state
+        assert galaxy.state_etag is not None
+
+    def test_refresh_state_file(self):
+        """Test that the previous state file is deleted only on commit."""
+        galaxy = Galaxy.objects.create()
+        galaxy.rule(0)
+        old_file = galaxy.state_file.name
+        self.krophil.pictures.all().delete()
+        with self.captureOnCommitCallbacks() as callbacks:
+            galaxy.refresh(0)
+            assert galaxy.state_file.name != old_file
+            assert galaxy.state_file.storage.exists(old_file)
+        for callback in callbacks:
+            callback()
+        assert not galaxy.state_file.storage.exists(old_file)
+        galaxy.refresh_from_db()
+        with galaxy.state_file.open("rb") as f:
+            assert json.loads(gzip.decompress(f.read())) == galaxy.state
+
+    def test_neighbourhood(self):
+        """Test that the neighbourhood of a citizen contains only close citizens."""
+        galaxy = Galaxy.objects.create()
+        galaxy.rule(0)
+        self.client.force_login(self.root)
+        url = reverse("api:galaxy_neighbourhood", kwargs={"user_id": self.sli.id})
+        response = self.client.get(url, {"hops": 1})
+        assert response.status_code == 200
+        neighbourhood = response.json()
+        ids = {node["id"] for node in neighbourhood["nodes"]}
+        expected = {self.sli.id}
+        for link in galaxy.state["links"]:
+            if self.sli.id in (link["source"], link["target"]):
+                expected |= {link["source"], link["target"]}
+        assert ids == expected
+        assert all(
+            {link["source"], link["target"]} <= ids for link in neighbourhood["links"]
+        )
+
+        response = self.client.get(
+            reverse("api:galaxy_neighbourhood", kwargs={"user_id": self.com.id})
+        )
+        assert response.status_code == 404
+
+    @staticmethod
+    def _get_lanes(galaxy: Galaxy):
+        lanes = GalaxyLane.objects.filter(star1__galaxy=galaxy).values_list(
+            "star1__owner_id",
+            "star2__owner_id",
+            "distance",
+            "family",
+            "pictures",
+            "clubs",
+        )
+        return {(frozenset((u1, u2)), *values) for u1, u2, *values in lanes}
+
+
+def test_club_overlaps():
+    """Test that the sweep line finds all the overlapping memberships of a club."""
+    # today is the 1st January 2023
+    intervals = [
+        (1, date(2020, 1, 1), date(2021, 12, 31)),
+        (2, date(2020, 6, 1), date(2020, 6, 30)),
+        (1, date(2021, 1, 1), date(2022, 12, 31)),
+        (3, date(2021, 1, 1), date(2022, 12, 31)),
+        (6, date(2022, 1, 1), date(2023, 1, 1)),
+        (4, date(2023, 1, 1), date(2023, 6, 1)),
+        (5, date(2023, 3, 1), date(2023, 1, 1)),  # not started yet
+    ]
+    assert sorted(Galaxy._club_overlaps(intervals)) == [
+        (2, 1, 29),
+        (3, 1, 364),
+        (3, 1, 729),
+        (4, 6, 0),
+        (6, 1, 364),
+        (6, 3, 364),
+    ]
+
 
 @pytest.mark.slow
 # @pytest.mark.skip(reason="Galaxy is disabled for now")
@@ -175,6 +356,11 @@ class TestGalaxyView(TestCase):
             f'<a onclick="window.focusNode(window.getNodeFromId({user.id}))">Reset on {user}</a>',
             status_code=200,
         )
+        # only the neighbourhood of the citizen is loaded, not the whole galaxy
+        self.assertContains(
+            response,
+            reverse("api:galaxy_neighbourhood", kwargs={"user_id": user.id}),
+        )
 
     def test_page_not_citizen(self):
         """Test that trying to access the galaxy page of non-citizen users return a 404."""
@@ -183,6 +369,35 @@ class TestGalaxyView(TestCase):
         response = self.client.get(reverse("galaxy:user", args=[user.id]))
         assert response.status_code == 404
 
+    def test_compressed_galaxy_state(self):
+        """Test that the precompressed state is served with an ETag."""
+        self.client.force_login(self.root)
+        response = self.client.get(reverse("galaxy:data"), HTTP_ACCEPT_ENCODING="gzip")
+        assert response.headers["Content-Encoding"] == "gzip"
+        state = json.loads(gzip.decompress(b"".join(response.streaming_content)))
+        assert state == Galaxy.get_current_galaxy().state
+        etag = response.headers["ETag"]
+        response = self.client.get(
+            reverse("galaxy:data"), HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        assert response.status_code == 304
+
+        # the plain state is another representation, with another ETag
+        response = self.client.get(reverse("galaxy:data"), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
+        assert response.headers["ETag"] != etag
+        assert response.json() == state
+
+    def test_galaxy_state_gzip_refused(self):
+        """Test that the gzipped state isn't sent to clients which refuse gzip."""
+        self.client.force_login(self.root)
+        response = self.client.get(
+            reverse("galaxy:data"), HTTP_ACCEPT_ENCODING="br, gzip;q=0"
+        )
+        assert "Content-Encoding" not in response.headers
+        assert response.json() == Galaxy.get_current_galaxy().state
+
     def test_full_galaxy_state(self):
         """Test with a more complete galaxy.
 
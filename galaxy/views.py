@@ -23,7 +23,8 @@
 
 from django.db.models import Case, F, Q, Value, When
 from django.db.models.functions import Concat
-from django.http import Http404, JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import DetailView, View
 
@@ -92,6 +93,54 @@ class GalaxyUserView(CanViewMixin, UserTabsMixin, DetailView):
         return kwargs
 
 
+def _accepts_gzip(request) -> bool:
+    """Check if the `Accept-Encoding` header of the request allows gzip.
+
+    Codings with a quality value of 0 (like `gzip;q=0`) are refused.
+    """
+    qualities = {}
+    for coding in request.headers.get("Accept-Encoding", "").split(","):
+        name, *params = (part.strip() for part in coding.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _sep, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
 class GalaxyDataView(FormerSubscriberMixin, View):
+    """Serve the state of the current galaxy.
+
+    If the client accepts gzip, the precompressed state file is sent as is.
+    The response is tagged with an ETag, so that clients which already
+    have the current state don't download it again.
+    The gzipped and the plain states are different representations,
+    so they don't share the same ETag.
+    """
+
     def get(self, request, *args, **kwargs):
-        return JsonResponse(Galaxy.get_current_galaxy().state)
+        galaxy = Galaxy.get_current_galaxy()
+        if galaxy is None:
+            raise Http404
+        etag = galaxy.state_etag
+        use_gzip = etag is not None and _accepts_gzip(request)
+        if use_gzip:
+            etag = f'{etag.removesuffix('"')}-gz"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            if use_gzip:
+                response = FileResponse(
+                    galaxy.state_file.open("rb"), content_type="application/json"
+                )
+                response.headers["Content-Encoding"] = "gzip"
+            else:
+                response = JsonResponse(galaxy.state)
+        if etag:
+            response.headers["ETag"] = etag
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
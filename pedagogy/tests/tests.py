@@ -788,7 +788,9 @@ class TestUVCommentReportCreate(TestCase):
     def test_notifications(self):
         assert not self.tutu.notifications.filter(type="PEDAGOGY_MODERATION").exists()
         # Create a comment report
-        self.create_report_test("tutu", success=True)
+        # (the notifications are sent when the transaction is committed)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_report_test("tutu", success=True)
 
         # Check that a notification has been created for pedagogy admins
         assert self.tutu.notifications.filter(type="PEDAGOGY_MODERATION").exists()
@@ -798,7 +800,8 @@ class TestUVCommentReportCreate(TestCase):
             assert notif.user.is_in_group(pk=settings.SITH_GROUP_PEDAGOGY_ADMIN_ID)
 
         # Check that notifications are not duplicated if not viewed
-        self.create_report_test("tutu", success=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_report_test("tutu", success=True)
         assert self.tutu.notifications.filter(type="PEDAGOGY_MODERATION").count() == 1
 
         # Check that a new notification is created when the old one has been viewed
@@ -806,6 +809,7 @@ class TestUVCommentReportCreate(TestCase):
         notif.viewed = True
         notif.save()
 
-        self.create_report_test("tutu", success=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_report_test("tutu", success=True)
 
         assert self.tutu.notifications.filter(type="PEDAGOGY_MODERATION").count() == 2
@@ -23,7 +23,6 @@
 
 from django.conf import settings
 from django.contrib.auth.mixins import PermissionRequiredMixin
-from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.views.generic import (
@@ -36,6 +35,7 @@ from django.views.generic import (
 
 from core.auth.mixins import PermissionOrAuthorRequiredMixin
 from core.models import Notification, User
+from core.notifications import send_notifications
 from core.views import DetailFormView
 from pedagogy.forms import (
     UECommentForm,
@@ -156,18 +156,19 @@ class UECommentReportCreateView(PermissionRequiredMixin, CreateView):
     def form_valid(self, form):
         resp = super().form_valid(form)
         # Send a message to moderation admins
-        unread_notif_subquery = Notification.objects.filter(
-            user=OuterRef("pk"), type="PEDAGOGY_MODERATION", viewed=False
+        send_notifications(
+            (
+                Notification(
+                    user=user,
+                    url=reverse("pedagogy:moderation"),
+                    type="PEDAGOGY_MODERATION",
+                )
+                for user in User.objects.filter(
+                    groups__id__in=[settings.SITH_GROUP_PEDAGOGY_ADMIN_ID]
+                )
+            ),
+            unless_unread=True,
         )
-        for user in User.objects.filter(
-            ~Exists(unread_notif_subquery),
-            groups__id__in=[settings.SITH_GROUP_PEDAGOGY_ADMIN_ID],
-        ):
-            Notification.objects.create(
-                user=user,
-                url=reverse("pedagogy:moderation"),
-                type="PEDAGOGY_MODERATION",
-            )
 
         return resp
 
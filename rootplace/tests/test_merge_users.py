@@ -15,6 +15,7 @@
 from datetime import timedelta
 
 from django.conf import settings
+from django.db.models import Sum
 from django.test import TestCase
 from django.urls import reverse
 from django.utils.timezone import localtime, now
@@ -22,7 +23,7 @@ from model_bakery import baker
 
 from club.models import Club
 from core.models import Group, User
-from counter.models import Counter, Customer, Product, Refilling, Selling
+from counter.models import Counter, Customer, DailySales, Product, Refilling, Selling
 from rootplace.forms import MergeForm
 from subscription.models import Subscription
 
@@ -123,6 +124,7 @@ class TestMergeUser(TestCase):
             unit_price=2,
             quantity=4,
         ).save()
+        DailySales.update_from_sales(until=now())
         today = localtime(now()).date()
         # both subscriptions began last month and shall end in 5 months
         Subscription(
@@ -149,6 +151,10 @@ class TestMergeUser(TestCase):
         self.assertAlmostEqual(18, self.to_keep.customer.amount, delta=0.0001)
         assert self.to_keep.customer.buyings.count() == 2
         assert self.to_keep.customer.refillings.count() == 2
+        # the daily statistics of to_delete are given to to_keep
+        assert self.to_keep.customer.daily_sales.aggregate(res=Sum("quantity")) == {
+            "res": 6
+        }
         assert self.to_keep.is_subscribed
         # to_keep had 5 months of subscription remaining and received
         # 5 more months from to_delete, so he should be subscribed for 10 months
@@ -33,7 +33,7 @@ from django.views.generic.edit import CreateView, FormView
 
 from core.models import OperationLog, SithFile, User, UserBan
 from core.views import CanEditPropMixin
-from counter.models import Customer
+from counter.models import BalanceSnapshot, Customer, DailySales
 from forum.models import ForumMessageMeta
 from rootplace.forms import BanForm, MergeForm, SelectUserForm
 
@@ -122,7 +122,10 @@ def merge_users(u1: User, u2: User) -> User:
         c_dest, created = Customer.get_or_create(u1)
         c_src.refillings.update(customer=c_dest)
         c_src.buyings.update(customer=c_dest)
+        DailySales.objects.filter(customer=c_src).update(customer=c_dest)
         Customer.objects.filter(pk=c_dest.pk).update_amount()
+        # the operations have moved, so the previous snapshots are meaningless
+        BalanceSnapshot.objects.filter(customer__in=[c_src, c_dest]).delete()
         if created:
             # swap the account numbers, so that the user keep
             # the id he is accustomed to
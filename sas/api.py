@@ -1,7 +1,9 @@
+from functools import partial
 from typing import Any, Literal
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.urls import reverse
 from ninja import Body, File, Query
 from ninja.security import SessionAuth
@@ -20,8 +22,9 @@ from api.permissions import (
     IsRoot,
 )
 from core.models import Notification, User
+from core.notifications import send_notifications
 from core.schemas import UploadedImage
-from sas.models import Album, PeoplePictureRelation, Picture
+from sas.models import Album, AlbumVisibilityCache, PeoplePictureRelation, Picture
 from sas.schemas import (
     AlbumAutocompleteSchema,
     AlbumFilterSchema,
@@ -31,6 +34,7 @@ from sas.schemas import (
     PictureFilterSchema,
     PictureSchema,
 )
+from sas.tasks import generate_thumbnails
 
 IsSasAdmin = IsRoot | IsInGroup(settings.SITH_GROUP_SAS_ADMIN_ID)
 
@@ -127,9 +131,12 @@ class PicturesController(ControllerBase):
             new.moderator = user
         try:
             new.full_clean()
-            new.generate_thumbnails(save=True)
         except ValidationError as e:
             return self.create_response({"detail": dict(e)}, status_code=409)
+        new.save()
+        # Encoding the thumbnails takes time, so it's done in the background.
+        # Until then, a placeholder is displayed instead.
+        transaction.on_commit(partial(generate_thumbnails.delay, picture_id=new.id))
 
     @route.get(
         "/{picture_id}/identified",
@@ -160,17 +167,23 @@ class PicturesController(ControllerBase):
             PeoplePictureRelation(user=u, picture_id=picture_id) for u in identified
         ]
         PeoplePictureRelation.objects.bulk_create(relations)
-        for u in identified:
-            html_id = f"album-{picture.parent_id}"
-            url = reverse(
-                "sas:user_pictures", kwargs={"user_id": u.id}, fragment=html_id
-            )
-            Notification.objects.get_or_create(
-                user=u,
-                viewed=False,
-                type="NEW_PICTURES",
-                defaults={"url": url, "param": picture.parent.name},
-            )
+        AlbumVisibilityCache.invalidate([picture.parent_id, picture.parent.parent_id])
+        send_notifications(
+            (
+                Notification(
+                    user=u,
+                    url=reverse(
+                        "sas:user_pictures",
+                        kwargs={"user_id": u.id},
+                        fragment=f"album-{picture.parent_id}",
+                    ),
+                    type="NEW_PICTURES",
+                    param=picture.parent.name,
+                )
+                for u in identified
+            ),
+            unless_unread=True,
+        )
 
     @route.delete("/{picture_id}", permissions=[IsSasAdmin])
     def delete_picture(self, picture_id: int):
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class SasConfig(AppConfig):
+    name = "sas"
+    verbose_name = "SAS"
+
+    def ready(self):
+        import sas.signals  # noqa F401
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from sas.models import Album, Picture
+from sas.tasks import generate_thumbnails
+
+
+class Command(BaseCommand):
+    """Generate again the thumbnails of all the pictures of some albums.
+
+    The pictures of the sub-albums are included.
+    A task is queued for each picture,
+    so that the celery workers can share the work between them.
+    """
+
+    help = "Generate again the thumbnails and compressed images of SAS albums"
+
+    def add_arguments(self, parser):
+        parser.add_argument("album_ids", nargs="+", type=int)
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only generate the thumbnails of the pictures which have none",
+        )
+
+    def handle(self, *args, **options):
+        album_ids = options["album_ids"]
+        if Album.objects.filter(id__in=album_ids).count() != len(set(album_ids)):
+            raise CommandError("Some of the given albums don't exist")
+        pictures = Picture.objects.filter(
+            ancestor_links__ancestor_id__in=album_ids
+        ).distinct()
+        if options["missing"]:
+            pictures = pictures.filter(Q(thumbnail="") | Q(thumbnail=None))
+        picture_ids = list(pictures.values_list("id", flat=True))
+        for picture_id in picture_ids:
+            generate_thumbnails.delay(picture_id=picture_id)
+        self.stdout.write(f"Generation of {len(picture_ids)} thumbnails queued")
@@ -15,10 +15,13 @@
 
 from __future__ import annotations
 
+import itertools
 from pathlib import Path
-from typing import ClassVar, Self
+from typing import TYPE_CHECKING, ClassVar, Self
+from uuid import uuid4
 
 from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
 from django.core.cache import cache
 from django.core.files.base import ContentFile
 from django.db import models
@@ -27,8 +30,16 @@ from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from PIL import Image
 
-from core.models import Notification, SithFile, User
-from core.utils import resize_image
+from core.models import Notification, SithFile, TreeQuerySet, User
+from core.utils import (
+    cache_set_many_if_committed,
+    invalidate_now_and_on_commit,
+    resize_image,
+    resize_image_many,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
 
 
 class SasFile(SithFile):
@@ -46,26 +57,29 @@ class SasFile(SithFile):
         ]
 
     def can_be_viewed_by(self, user):
+        """Check if the user can view this file.
+
+        This gives the same result as the `viewable_by` queryset methods,
+        but without querying the file again :
+        the visibility for subscribers is given by the fields of the file,
+        and the visibility for non-subscribers by the
+        [AlbumVisibilityCache][sas.models.AlbumVisibilityCache].
+        """
         if user.is_anonymous:
             return False
-        cache_key = (
-            f"sas:{self._meta.model_name}_viewable_by_{user.id}_in_{self.parent_id}"
-        )
-        viewable: list[int] | None = cache.get(cache_key)
-        if viewable is None:
-            viewable = list(
-                self.__class__.objects.filter(parent_id=self.parent_id)
-                .viewable_by(user)
-                .values_list("pk", flat=True)
-            )
-            cache.set(cache_key, viewable, timeout=10)
-        return self.id in viewable
+        if user.was_subscribed and (self.is_moderated or self.owner_id == user.id):
+            return True
+        if user.has_perm("sas.moderate_sasfile"):
+            return True
+        if user.was_subscribed:
+            return False
+        return user.id in AlbumVisibilityCache.get(self.parent_id).get(self.id, ())
 
     def can_be_edited_by(self, user):
         return user.has_perm("sas.change_sasfile")
 
 
-class PictureQuerySet(models.QuerySet):
+class PictureQuerySet(TreeQuerySet):
     def viewable_by(self, user: User) -> Self:
         """Filter the pictures that this user can view.
 
@@ -98,6 +112,9 @@ class Picture(SasFile):
         )
 
     def get_download_compressed_url(self):
+        if not self.compressed:
+            # the compressed version is still being generated
+            return self.get_download_url()
         return reverse(
             "sas:download_compressed",
             kwargs={"picture_id": self.id},
@@ -105,6 +122,9 @@ class Picture(SasFile):
         )
 
     def get_download_thumb_url(self):
+        if not self.thumbnail:
+            # the thumbnail is still being generated
+            return staticfiles_storage.url("core/img/sas.jpg")
         return reverse(
             "sas:download_thumb",
             kwargs={"picture_id": self.id},
@@ -141,9 +161,8 @@ class Picture(SasFile):
         new_extension_name = str(Path(self.name).with_suffix(".webp"))
         file = resize_image(img, max(img.size), extension, optimize=False)
         self.file.save(self.name, file, save=False)
-        thumbnail = resize_image(img, 200, "webp")
+        compressed, thumbnail = resize_image_many(img, [1200, 200], "webp")
         self.thumbnail.save(new_extension_name, thumbnail, save=False)
-        compressed = resize_image(img, 1200, "webp")
         self.compressed.save(new_extension_name, compressed, save=save)
         # once the new images have been saved, delete the previous ones.
         # The deletion of old files is done after, so that if anything goes
@@ -161,7 +180,7 @@ class Picture(SasFile):
         self.generate_thumbnails(img=img, save=True)
 
 
-class AlbumQuerySet(models.QuerySet):
+class AlbumQuerySet(TreeQuerySet):
     def viewable_by(self, user: User) -> Self:
         """Filter the albums that this user can view.
 
@@ -284,6 +303,97 @@ class PeoplePictureRelation(models.Model):
         return f"Moderation request by {self.user.get_short_name()} - {self.picture}"
 
 
+class AlbumVisibilityCache:
+    """The users identified on the content of SAS albums.
+
+    Subscribers can see the moderated files and the files they own,
+    which can be checked on the files themselves,
+    and moderators can see everything.
+    But non-subscribers can only see the pictures they are identified on,
+    and the albums containing such pictures.
+    Checking that would require a query for each file,
+    so for each album, the users identified
+    on each of its children are computed once and cached.
+    Thus, browsing an album costs a constant number of queries.
+
+    The cache of an album is versioned,
+    and the version is renewed each time a picture of the album
+    is uploaded, moderated or deleted, and each time someone
+    is identified or unidentified on one of its pictures.
+
+    Warning:
+        The cache is invalidated by signals (see `sas/signals.py`).
+        If you create or delete identifications with a bulk operation,
+        call [invalidate][sas.models.AlbumVisibilityCache.invalidate] yourself.
+    """
+
+    TIMEOUT: ClassVar[int] = 24 * 60 * 60
+    """How long (in seconds) the identifications of an album may be cached."""
+
+    @staticmethod
+    def _version_key(album_id: int) -> str:
+        return f"sas:album:{album_id}:visibility_version"
+
+    @classmethod
+    def get(cls, album_id: int) -> dict[int, set[int]]:
+        """Get the users identified on the children of the given album.
+
+        Returns:
+            A dict mapping the id of each picture and sub-album
+            to the ids of the users identified on it
+            (or on one of its pictures, for the sub-albums).
+            Only moderated pictures are taken into account.
+        """
+        version_key = cls._version_key(album_id)
+        version = cache.get(version_key)
+        if version is None:
+            version = uuid4().hex
+            cache.set(version_key, version, timeout=None)
+        key = f"sas:album:{album_id}:visibility:{version}"
+        identified = cache.get(key)
+        if identified is not None:
+            return identified
+        identified = {}
+        relations = PeoplePictureRelation.objects.filter(picture__is_moderated=True)
+        for file_id, user_id in [
+            *relations.filter(picture__parent_id=album_id).values_list(
+                "picture_id", "user_id"
+            ),
+            *relations.filter(picture__parent__parent_id=album_id).values_list(
+                "picture__parent_id", "user_id"
+            ),
+        ]:
+            identified.setdefault(file_id, set()).add(user_id)
+        cache_set_many_if_committed({key: identified}, timeout=cls.TIMEOUT)
+        return identified
+
+    @classmethod
+    def invalidate(cls, album_ids: Iterable[int | None]):
+        """Invalidate the cache of the given albums."""
+        album_ids = set(album_ids) - {None}
+        if not album_ids:
+            return
+
+        def renew_versions():
+            cache.set_many(
+                {cls._version_key(pk): uuid4().hex for pk in album_ids}, timeout=None
+            )
+
+        invalidate_now_and_on_commit(renew_versions)
+
+    @classmethod
+    def invalidate_pictures(cls, picture_ids: Iterable[int]):
+        """Invalidate the cache of the albums containing the given pictures.
+
+        The parent of each album is also invalidated,
+        because the visibility of an album depends on its pictures.
+        """
+        parents = SithFile.objects.filter(id__in=picture_ids).values_list(
+            "parent_id", "parent__parent_id"
+        )
+        cls.invalidate(itertools.chain.from_iterable(parents))
+
+
 class PictureModerationRequest(models.Model):
     """A request to remove a Picture from the SAS."""
 
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from sas.models import AlbumVisibilityCache, PeoplePictureRelation, Picture
+
+
+@receiver(post_save, sender=Picture, dispatch_uid="sas_picture_saved")
+@receiver(pre_delete, sender=Picture, dispatch_uid="sas_picture_deleted")
+def picture_changed(sender, instance: Picture, **kwargs):
+    """Invalidate the visibility of the album of a picture uploaded,
+    moderated or deleted.
+    """
+    AlbumVisibilityCache.invalidate_pictures([instance.id])
+
+
+@receiver(
+    post_save, sender=PeoplePictureRelation, dispatch_uid="sas_identification_saved"
+)
+@receiver(
+    post_delete, sender=PeoplePictureRelation, dispatch_uid="sas_identification_deleted"
+)
+def identification_changed(sender, instance: PeoplePictureRelation, **kwargs):
+    AlbumVisibilityCache.invalidate_pictures([instance.picture_id])
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from sas.models import Picture
+
+
+@shared_task
+def generate_thumbnails(*, picture_id: int, **kwargs):
+    """Generate the thumbnail and the compressed version of a picture.
+
+    See [Picture.generate_thumbnails][sas.models.Picture.generate_thumbnails].
+    """
+    picture = Picture.objects.filter(id=picture_id).first()
+    if picture is None:
+        # the picture has been deleted in the meantime
+        return
+    picture.generate_thumbnails(save=True)
@@ -3,13 +3,14 @@ from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import transaction
+from django.templatetags.static import static
 from django.test import Client, TestCase
 from django.urls import reverse
 from model_bakery import baker
 from model_bakery.recipe import Recipe
 
 from core.baker_recipes import old_subscriber_user, subscriber_user
-from core.models import Group, SithFile, User
+from core.models import Group, Notification, SithFile, User
 from core.utils import RED_PIXEL_PNG
 from sas.baker_recipes import picture_recipe
 from sas.models import Album, PeoplePictureRelation, Picture, PictureModerationRequest
@@ -209,6 +210,24 @@ class TestPictureRelation(TestSas):
         data = {user["user"]["id"] for user in response.json()}
         assert data == {self.user_a.id, self.user_b.id, self.user_c.id}
 
+    def test_identify_users_notifications(self):
+        """Test that the newly identified users are notified only once."""
+        picture = self.album_a.children_pictures.first()
+        users = subscriber_user.make(_quantity=3)
+        baker.make(Notification, user=users[0], type="NEW_PICTURES", viewed=False)
+        self.client.force_login(self.user_a)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                f"/api/sas/picture/{picture.id}/identified",
+                [u.id for u in users],
+                content_type="application/json",
+            )
+        assert response.status_code == 200
+        notifs = Notification.objects.filter(type="NEW_PICTURES", user__in=users)
+        assert sorted(notifs.values_list("user_id", flat=True)) == sorted(
+            u.id for u in users
+        )
+
 
 class TestPictureModeration(TestSas):
     @classmethod
@@ -270,7 +289,7 @@ class TestAlbumSearch(TestSas):
 
 
 @pytest.mark.django_db
-def test_upload_picture(client: Client):
+def test_upload_picture(client: Client, django_capture_on_commit_callbacks):
     sas = SithFile.objects.get(pk=settings.SITH_SAS_ROOT_DIR_ID)
     album = baker.make(Album, is_in_sas=True, parent=sas, name="test album")
     user = baker.make(User, is_superuser=True)
@@ -278,15 +297,23 @@ def test_upload_picture(client: Client):
     img = SimpleUploadedFile(
         name="img.png", content=RED_PIXEL_PNG, content_type="image/png"
     )
-    res = client.post(
-        reverse("api:upload_picture"), {"album_id": album.id, "picture": img}
-    )
+    with django_capture_on_commit_callbacks() as callbacks:
+        res = client.post(
+            reverse("api:upload_picture"), {"album_id": album.id, "picture": img}
+        )
     assert res.status_code == 200
     picture = Picture.objects.filter(parent_id=album.id).first()
     assert picture is not None
     assert picture.name == "img.png"
     assert picture.owner == user
     assert picture.file.name == "SAS/test album/img.png"
+    # the thumbnails are generated after the response, in a celery task
+    assert not picture.thumbnail
+    assert picture.get_download_thumb_url() == static("core/img/sas.jpg")
+    assert picture.get_download_compressed_url() == picture.get_download_url()
+    for callback in callbacks:
+        callback()
+    picture.refresh_from_db()
     assert picture.compressed.name == ".compressed/SAS/test album/img.webp"
     assert picture.thumbnail.name == ".thumbnails/SAS/test album/img.webp"
 
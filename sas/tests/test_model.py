@@ -1,16 +1,20 @@
 from io import BytesIO
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
 from model_bakery import baker
 from PIL import Image
 
 from core.baker_recipes import old_subscriber_user, subscriber_user
 from core.models import User
-from sas.baker_recipes import picture_recipe
-from sas.models import PeoplePictureRelation, Picture
+from sas.baker_recipes import album_recipe, picture_recipe
+from sas.models import Album, PeoplePictureRelation, Picture
 
 
 class TestPictureQuerySet(TestCase):
@@ -52,6 +56,74 @@ class TestPictureQuerySet(TestCase):
         assert pictures == [self.pictures[1]]
 
 
+@pytest.mark.django_db
+class TestCanBeViewedBy:
+    @pytest.fixture
+    def album(self) -> Album:
+        album = album_recipe.make()
+        picture_recipe.make(parent=album, _quantity=3)
+        return album
+
+    def test_same_as_queryset(self, album: Album):
+        """Test that `can_be_viewed_by` agrees with `viewable_by`."""
+        pictures = list(album.children_pictures.order_by("id"))
+        pictures[0].is_moderated = False
+        pictures[0].save()
+        user = baker.make(User)
+        user.pictures.create(picture=pictures[0])
+        user.pictures.create(picture=pictures[1])
+        users = [
+            baker.make(User, is_superuser=True),
+            subscriber_user.make(),
+            old_subscriber_user.make(),
+            user,
+            baker.make(User),
+        ]
+        for user in users:
+            viewable = set(Picture.objects.viewable_by(user))
+            for picture in Picture.objects.filter(parent=album):
+                assert picture.can_be_viewed_by(user) == (picture in viewable)
+            assert album.can_be_viewed_by(user) == Album.objects.viewable_by(
+                user
+            ).contains(album)
+
+    def test_invalidation(self, album: Album):
+        """Test that identifications and moderation invalidate the cache."""
+        user = baker.make(User)
+        picture = album.children_pictures.first()
+        assert not picture.can_be_viewed_by(user)
+        assert not album.can_be_viewed_by(user)
+        relation = user.pictures.create(picture=picture)
+        assert picture.can_be_viewed_by(user)
+        assert album.can_be_viewed_by(user)
+        picture.is_moderated = False
+        picture.save()
+        assert not picture.can_be_viewed_by(user)
+        assert not album.can_be_viewed_by(user)
+        picture.is_moderated = True
+        picture.save()
+        relation.delete()
+        assert not picture.can_be_viewed_by(user)
+        assert not album.can_be_viewed_by(user)
+
+    def test_num_queries(self, album: Album, django_assert_num_queries):
+        """Test that checking the pictures of an album costs no query once cached."""
+        user = baker.make(User)
+        for picture in album.children_pictures.all():
+            user.pictures.create(picture=picture)
+        pictures = list(album.children_pictures.all())
+        user = User.objects.get(id=user.id)
+        user.groups_snapshot  # noqa: B018 (load the snapshot and permissions)
+        user.has_perm("sas.moderate_sasfile")
+        connection = transaction.get_connection()
+        # the cache is disabled inside transactions,
+        # which is the case of every test
+        with patch.object(connection, "in_atomic_block", new=False):
+            assert pictures[0].can_be_viewed_by(user)
+        with django_assert_num_queries(0):
+            assert all(p.can_be_viewed_by(user) for p in pictures)
+
+
 @pytest.mark.django_db
 def test_identifications_viewable_by_user():
     picture = baker.make(Picture)
@@ -105,3 +177,20 @@ def test_generate_thumbnail(save, initially_saved, pass_img_kwarg):
     assert new_img.get_flattened_data() == image.get_flattened_data()
     assert Image.open(picture.thumbnail).size == (200, 100)
     assert Image.open(picture.compressed).size == (1200, 600)
+
+
+@pytest.mark.django_db
+def test_generate_thumbnails_command():
+    albums = [baker.make(Album, parent_id=settings.SITH_SAS_ROOT_DIR_ID)]
+    albums.append(baker.make(Album, parent=albums[0]))
+    pictures = [
+        picture_recipe.make(parent=albums[0]),
+        picture_recipe.make(parent=albums[1]),
+        picture_recipe.make(parent=baker.make(Album)),
+    ]
+    with patch("sas.tasks.generate_thumbnails.delay") as mocked:
+        call_command("generate_thumbnails", str(albums[0].id))
+    assert {c.kwargs["picture_id"] for c in mocked.call_args_list} == {
+        pictures[0].id,
+        pictures[1].id,
+    }
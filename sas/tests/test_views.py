@@ -12,8 +12,10 @@
 # OR WITHIN THE LOCAL FILE "LICENSE"
 #
 #
+from io import BytesIO
 from typing import Callable, Literal
 from unittest.mock import patch
+from zipfile import ZipFile
 
 import pytest
 from bs4 import BeautifulSoup
@@ -29,7 +31,7 @@ from pytest_django.asserts import assertHTMLEqual, assertInHTML, assertRedirects
 from core.baker_recipes import old_subscriber_user, subscriber_user
 from core.models import Group, User
 from core.utils import RED_PIXEL_PNG
-from sas.baker_recipes import picture_recipe
+from sas.baker_recipes import album_recipe, picture_recipe
 from sas.models import Album, Picture
 
 # Create your tests here.
@@ -332,7 +334,9 @@ class TestSasModeration(TestCase):
         assert self.pictures[1].moderation_requests.count() == 1
         assert self.pictures[1].moderation_requests.first().reason == message
 
-        # test that the user cannot ask for moderation twice
+        # test that the user cannot ask for moderation twice,
+        # even once the picture has been moderated again
+        Picture.objects.filter(id=self.pictures[1].id).update(is_moderated=True)
         res = self.client.post(url, data={"reason": message})
         assert res.status_code == 200
         assert self.pictures[1].moderation_requests.count() == 1
@@ -375,3 +379,68 @@ class TestUserPicture:
             )
         )
         assert response.status_code == status
+
+
+@pytest.mark.django_db
+class TestPicturesDownload:
+    @pytest.fixture
+    def albums(self) -> list[Album]:
+        albums = album_recipe.make(_quantity=2)
+        for album in albums:
+            picture_recipe.make(
+                parent=album,
+                file=ContentFile(name="img.png", content=RED_PIXEL_PNG),
+                _quantity=2,
+            )
+        return albums
+
+    def test_download_album(self, client: Client, albums: list[Album]):
+        """Test that the pictures of an album the user can see are downloaded."""
+        pictures = list(albums[0].children_pictures.order_by("date"))
+        pictures[0].is_moderated = False
+        pictures[0].save()
+        client.force_login(subscriber_user.make())
+        res = client.get(
+            reverse("sas:album_download", kwargs={"album_id": albums[0].id})
+        )
+        assert res.status_code == 200
+        assert res["Content-Type"] == "application/zip"
+        archive = ZipFile(BytesIO(b"".join(res.streaming_content)))
+        assert archive.namelist() == [
+            f"IMG_{pictures[1].id}_{pictures[1].date:%Y_%m_%d_%H_%M_%S}.png"
+        ]
+        assert archive.read(archive.namelist()[0]) == RED_PIXEL_PNG
+
+    def test_download_album_permission_denied(self, client: Client, albums):
+        client.force_login(baker.make(User))
+        res = client.get(
+            reverse("sas:album_download", kwargs={"album_id": albums[0].id})
+        )
+        assert res.status_code == 403
+
+    def test_download_user_pictures(self, client: Client, albums: list[Album]):
+        """Test that users can download the pictures they are identified on."""
+        user = subscriber_user.make()
+        pictures = [a.children_pictures.first() for a in albums]
+        for picture in pictures:
+            user.pictures.create(picture=picture)
+        client.force_login(user)
+        url = reverse("sas:user_pictures_download", kwargs={"user_id": user.id})
+        res = client.get(url)
+        assert res.status_code == 200
+        archive = ZipFile(BytesIO(b"".join(res.streaming_content)))
+        assert archive.namelist() == [
+            f"{p.parent.name}/IMG_{p.id}_{p.date:%Y_%m_%d_%H_%M_%S}.png"
+            for p in pictures
+        ]
+        res = client.get(url, query_params={"album_id": albums[1].id})
+        archive = ZipFile(BytesIO(b"".join(res.streaming_content)))
+        assert len(archive.namelist()) == 1
+        assert archive.namelist()[0].startswith(f"{albums[1].name}/")
+
+    def test_download_user_pictures_permission_denied(self, client: Client):
+        client.force_login(subscriber_user.make())
+        url = reverse(
+            "sas:user_pictures_download", kwargs={"user_id": subscriber_user.make().id}
+        )
+        assert client.get(url).status_code == 403
@@ -17,6 +17,7 @@ from django.urls import path
 
 from sas.views import (
     AlbumCreateFragment,
+    AlbumDownloadView,
     AlbumEditView,
     AlbumView,
     ModerationView,
@@ -24,6 +25,7 @@ from sas.views import (
     PictureEditView,
     PictureView,
     SASMainView,
+    UserPicturesDownloadView,
     UserPicturesView,
     send_album,
     send_compressed,
@@ -37,6 +39,11 @@ urlpatterns = [
     path("album/<int:album_id>/", AlbumView.as_view(), name="album"),
     path("album/<int:album_id>/edit/", AlbumEditView.as_view(), name="album_edit"),
     path("album/<int:album_id>/preview/", send_album, name="album_preview"),
+    path(
+        "album/<int:album_id>/download/",
+        AlbumDownloadView.as_view(),
+        name="album_download",
+    ),
     path("picture/<int:picture_id>/", PictureView.as_view(), name="picture"),
     path(
         "picture/<int:picture_id>/edit/", PictureEditView.as_view(), name="picture_edit"
@@ -56,5 +63,10 @@ urlpatterns = [
     path(
         "user/<int:user_id>/pictures/", UserPicturesView.as_view(), name="user_pictures"
     ),
+    path(
+        "user/<int:user_id>/pictures/download/",
+        UserPicturesDownloadView.as_view(),
+        name="user_pictures_download",
+    ),
     path("fragment/album-create", AlbumCreateFragment.as_view(), name="album_create"),
 ]
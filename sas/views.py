@@ -12,23 +12,27 @@
 # OR WITHIN THE LOCAL FILE "LICENSE"
 #
 #
+from collections.abc import Iterable
+from pathlib import Path
 from typing import Any
 
 from django.conf import settings
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.core.exceptions import PermissionDenied
 from django.db.models import Count, OuterRef, Subquery
-from django.http import Http404, HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.utils.safestring import SafeString
-from django.views.generic import CreateView, DetailView, TemplateView
+from django.utils.translation import gettext as _
+from django.views.generic import CreateView, DetailView, TemplateView, View
+from django.views.generic.detail import SingleObjectMixin
 from django.views.generic.edit import FormView, UpdateView
 
 from core.auth.mixins import CanEditMixin, CanViewMixin
 from core.models import SithFile, User
 from core.views import UseFragmentsMixin
-from core.views.files import FileView, send_file
+from core.views.files import FileView, send_file, send_zip
 from core.views.mixins import FragmentMixin, FragmentRenderer
 from core.views.user import UserTabsMixin
 from sas.forms import (
@@ -119,6 +123,46 @@ def send_thumb(request, picture_id):
     return send_file(request, picture_id, Picture, "thumbnail")
 
 
+def send_pictures_zip(
+    pictures: Iterable[Picture], filename: str, *, by_album: bool = False
+) -> StreamingHttpResponse:
+    """Send a ZIP archive of the full-size version of the given pictures.
+
+    Args:
+        pictures: the pictures to put in the archive
+        filename: the name of the archive
+        by_album: if True, put the pictures in a directory named after their album.
+            In this case, the albums should have been fetched with the pictures.
+    """
+
+    def get_name(picture: Picture) -> str:
+        name = f"IMG_{picture.id}_{picture.date:%Y_%m_%d_%H_%M_%S}"
+        name += Path(picture.file.name).suffix
+        if by_album:
+            return f"{picture.parent.name}/{name}"
+        return name
+
+    return send_zip(
+        ((get_name(p), p.file, p.date) for p in pictures),
+        filename,
+    )
+
+
+class AlbumDownloadView(CanViewMixin, SingleObjectMixin, View):
+    """Download all the pictures of an album the user can view, as a ZIP archive."""
+
+    model = Album
+    pk_url_kwarg = "album_id"
+
+    def get(self, request, *args, **kwargs):
+        pictures = (
+            Picture.objects.filter(parent=self.object)
+            .viewable_by(request.user)
+            .order_by("date")
+        )
+        return send_pictures_zip(pictures, f"{self.object.name}.zip")
+
+
 class AlbumView(CanViewMixin, UseFragmentsMixin, DetailView):
     model = Album
     # exclude the SAS from the album accessible with this view
@@ -185,6 +229,35 @@ class UserPicturesView(UserTabsMixin, CanViewMixin, DetailView):
     ).all()
 
 
+class UserPicturesDownloadView(SingleObjectMixin, View):
+    """Download the pictures of the user, as a ZIP archive.
+
+    The pictures are grouped by album.
+    If an `album_id` is given in the query parameters,
+    only the pictures of this album are downloaded.
+    """
+
+    model = User
+    pk_url_kwarg = "user_id"
+
+    def get(self, request, *args, **kwargs):
+        user = self.get_object()
+        if request.user.id != user.id:
+            raise PermissionDenied
+        pictures = (
+            Picture.objects.filter(people__user=user)
+            .viewable_by(request.user)
+            .select_related("parent")
+            .order_by("parent_id", "date")
+        )
+        if "album_id" in request.GET:
+            try:
+                pictures = pictures.filter(parent_id=int(request.GET["album_id"]))
+            except ValueError as e:
+                raise Http404 from e
+        return send_pictures_zip(pictures, f"{_('Pictures')}.zip", by_album=True)
+
+
 # Admin views
 
 
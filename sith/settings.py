@@ -358,6 +358,16 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_BROKER_URL = env.str("TASK_BROKER_URL")
 CELERY_RESULT_BACKEND = "django-db"
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+CELERY_BEAT_SCHEDULE = {
+    "update-daily-stats": {
+        "task": "counter.tasks.update_daily_stats",
+        "schedule": timedelta(minutes=10),
+    },
+    "close-inactive-permanencies": {
+        "task": "counter.tasks.close_inactive_permanencies",
+        "schedule": timedelta(minutes=1),
+    },
+}
 
 # Below this line, only Sith-specific variables are defined
 
@@ -582,6 +592,18 @@ SITH_SUBSCRIPTIONS = {
 # Minutes to timeout the logged barmen
 SITH_BARMAN_TIMEOUT = 30
 
+# time during which the html of a rendered markdown text is kept in cache
+SITH_MARKDOWN_CACHE_TIMEOUT = timedelta(days=7)
+# rendered texts longer than this (in characters) are not cached
+SITH_MARKDOWN_CACHE_MAX_SIZE = 100_000
+# maximum number of texts that can be rendered with a single api call
+SITH_MARKDOWN_BATCH_MAX_SIZE = 100
+
+# time during which the PDF of an eticket is kept in cache
+SITH_ETICKET_CACHE_TIMEOUT = timedelta(days=7)
+# PDF bigger than this (in bytes) are not cached
+SITH_ETICKET_CACHE_MAX_SIZE = 1_000_000
+
 # Minutes to delete the last operations
 SITH_LAST_OPERATIONS_LIMIT = 10
 
@@ -677,6 +699,7 @@ if DEBUG:
 
 if TESTING:
     CAPTCHA_TEST_MODE = True
+    CELERY_TASK_ALWAYS_EAGER = True  # run the tasks synchronously
     PASSWORD_HASHERS = [  # not secure, but faster password hasher
         "django.contrib.auth.hashers.MD5PasswordHasher",
     ]
@@ -86,9 +86,6 @@ class Subscription(models.Model):
         # as an old subscriber.
         self.member.groups.add(settings.SITH_GROUP_OLD_SUBSCRIBERS_ID)
         self.member.make_home()
-        # now that the user is an old subscriber, change the cached
-        # property accordingly
-        self.member.__dict__["was_subscribed"] = True
         super().save()
 
     def get_absolute_url(self):